@@ -0,0 +1,82 @@
+#! /usr/bin/env python
+import os
+import sys
+import threading
+import time
+
+from log_calls import log_calls, record_history
+
+
+def usage():
+    """Usage: <path>/bench_threads.py [-h] [calls-per-thread]
+       Calls a decorated function from 1, 2, 4 and 8 threads at once,
+       and writes the throughput (calls per second, all threads together)
+       for each number of threads, of a function decorated with
+       record_history, log_calls (writing to os.devnull), and log_calls
+       with enabled=False.
+       Per-thread stats shards mean the threads don't contend on
+       shared counters; throughput can scale with the number of threads
+       only on an interpreter without a GIL (free-threaded builds).
+       calls-per-thread defaults to 20000.
+       -h     Display this message."""
+    exit(usage.__doc__)
+
+
+def make_functions(file):
+    @record_history()
+    def recorded(x):
+        return x
+
+    @log_calls(file=file)
+    def logged(x):
+        return x
+
+    @log_calls(enabled=False)
+    def disabled(x):
+        return x
+
+    return dict(record_history=recorded, log_calls=logged, disabled=disabled)
+
+
+def throughput(f, n_threads, n_calls):
+    barrier = threading.Barrier(n_threads + 1)
+
+    def work():
+        barrier.wait()
+        for i in range(n_calls):
+            f(i)
+
+    threads = [threading.Thread(target=work) for _ in range(n_threads)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    assert f.stats.num_calls_total == n_threads * n_calls
+    return n_threads * n_calls / elapsed
+
+
+def main():
+    n_calls = 20000
+    if len(sys.argv) > 1:
+        if sys.argv[1].upper().startswith("-H"):
+            usage()     # exits
+        n_calls = int(sys.argv[1])
+
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print("Python %s, GIL %s" % (sys.version.split()[0], "enabled" if gil else "disabled"))
+    print("%-16s %8s %14s %8s" % ('function', 'threads', 'calls/sec', 'speedup'))
+    with open(os.devnull, 'w') as devnull:
+        for name in make_functions(devnull):
+            base = None
+            for n_threads in (1, 2, 4, 8):
+                f = make_functions(devnull)[name]      # fresh stats each time
+                rate = throughput(f, n_threads, n_calls)
+                base = base or rate
+                print("%-16s %8d %14.0f %7.2fx" % (name, n_threads, rate, rate / base))
+
+
+if __name__ == '__main__':
+    main()
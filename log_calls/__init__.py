@@ -1,5 +1,8 @@
 from .log_calls import log_calls, __version__, __author__
 from .record_history import record_history
+from .sinks import LogSink, QueueSink, BufferedFileSink
+from .history_log import HistoryLogWriter, HistoryLogReader
+from .aggregate import StatsSnapshot, StatsCollector, snapshot_all
 
 # tests
 from .deco_settings import DecoSetting, DecoSettingsMapping
@@ -7,6 +10,9 @@ from .proxy_descriptors import install_proxy_descriptor, ClassInstanceAttrProxy
 
 __all__ = [
     'log_calls', 'record_history', '__version__', '__author__',
+    'LogSink', 'QueueSink', 'BufferedFileSink',
+    'HistoryLogWriter', 'HistoryLogReader',
+    'StatsSnapshot', 'StatsCollector', 'snapshot_all',
     'difference_update',
     'DecoSetting', 'DecoSettingsMapping',
     'install_proxy_descriptor', 'ClassInstanceAttrProxy',
@@ -0,0 +1,155 @@
+__author__ = "Brian O'Neill"  # BTO
+__version__ = '0.2.2'
+__doc__ = """
+Stats of decorated functions across processes.
+
+Each process has its own decorators, so `stats` only reflect the calls
+made in that process. A StatsSnapshot (see shards.py) is a picklable copy
+of a function's stats -- counts, elapsed times, histogram, running stats,
+and optionally history -- made by stats.snapshot(); snapshots of the same
+function from different processes merge.
+
+snapshot_all() returns snapshots of every decorated function in the
+process, keyed (and merged) by prefixed function name.
+
+StatsCollector collects the snapshots of worker processes, sent over a
+pipe (a multiprocessing SimpleQueue) when each worker exits, and whenever
+it calls send_snapshots(); a background thread reads them as they arrive.
+collector.merged() merges the latest snapshots of each worker, and those
+of the collecting process, per prefixed function name:
+
+    with StatsCollector() as collector:
+        with ProcessPoolExecutor(initializer=collector.initializer,
+                                 initargs=collector.initargs) as pool:
+            results = list(pool.map(work, items))
+    stats = collector.merged()          # {prefixed name: StatsSnapshot}
+    stats['work'].num_calls_logged, stats['work'].latency_percentile(99)
+
+For a multiprocessing.Process or Pool, pass the same initializer and
+initargs (call init_worker(*collector.initargs) first thing in a Process's
+target). A worker's snapshots are cumulative, so each replaces the previous
+one from the same process. init_worker clears the stats a worker inherits
+from its parent (with the fork start method), so they aren't counted twice;
+a worker keeps its history in memory, never writing to its parent's
+history_spill_file or history log.
+Leaving the `with` (or calling close()) waits until everything sent so far
+has been read, so call it after the workers have exited.
+"""
+import multiprocessing
+import multiprocessing.util
+import os
+import threading
+
+from .log_calls import _deco_base
+from .shards import StatsSnapshot
+
+__all__ = ['StatsSnapshot', 'StatsCollector', 'snapshot_all',
+           'init_worker', 'send_snapshots']
+
+
+def snapshot_all(history=False):
+    """Dict mapping the prefixed name of each decorated function in this
+    process to a StatsSnapshot of its stats (merged, if several functions
+    have the same prefixed name). history: as for stats.snapshot."""
+    snaps = {}
+    for deco in list(_deco_base._decorated):
+        snap = deco.snapshot(history)
+        if snap.name in snaps:
+            snaps[snap.name].merge(snap)
+        else:
+            snaps[snap.name] = snap
+    return snaps
+
+
+# (queue, history) of this process's collector, if it's a worker
+_worker = None
+
+
+def init_worker(queue, history=False):
+    """Make this process a worker of the StatsCollector whose queue is
+    queue: clear the stats of decorated functions it already has (leaving
+    the parent's spill files and history logs alone), and send snapshots
+    of all of them to the collector when it exits.
+    Use as the initializer of a process pool (see module docstring)."""
+    global _worker
+    for deco in list(_deco_base._decorated):
+        deco._reset_in_worker()
+    _worker = (queue, history)
+    # multiprocessing runs these as a worker process exits (atexit doesn't)
+    multiprocessing.util.Finalize(None, send_snapshots, exitpriority=100)
+
+
+def send_snapshots():
+    """Send snapshots of this worker's stats, as of now, to its collector.
+    Does nothing in a process that init_worker hasn't made a worker."""
+    if _worker:
+        queue, history = _worker
+        queue.put((os.getpid(), snapshot_all(history)))
+
+
+class StatsCollector():
+    """Collects StatsSnapshots from worker processes (see module docstring).
+
+        history:    as for stats.snapshot -- what history the workers send
+        context:    multiprocessing context of the workers (default: the
+                    default context)
+    """
+    def __init__(self, history=False, context=None):
+        self.history = history
+        self.queue = (context or multiprocessing).SimpleQueue()
+        self._latest = {}           # pid -> {prefixed name: StatsSnapshot}
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read, daemon=True,
+                                        name='log_calls StatsCollector')
+        self._reader.start()
+
+    @property
+    def initializer(self):
+        return init_worker
+
+    @property
+    def initargs(self):
+        return (self.queue, self.history)
+
+    def _read(self):
+        while True:
+            msg = self.queue.get()
+            if msg is None:
+                return
+            pid, snaps = msg
+            with self._lock:
+                self._latest[pid] = snaps
+
+    @property
+    def pids(self):
+        """Ids of the workers that have sent snapshots"""
+        with self._lock:
+            return set(self._latest)
+
+    def merged(self, include_local=True):
+        """Dict mapping prefixed function names to StatsSnapshots that merge
+        the latest snapshots from each worker, and, if include_local, the
+        stats of this process."""
+        with self._lock:
+            per_process = list(self._latest.values())
+        if include_local:
+            per_process.append(snapshot_all(self.history))
+        merged = {}
+        for snaps in per_process:
+            for name, snap in snaps.items():
+                if name not in merged:
+                    merged[name] = StatsSnapshot(name)
+                merged[name].merge(snap)
+        return merged
+
+    def close(self):
+        """Read everything sent so far, then stop reading."""
+        if self._reader.is_alive():
+            self.queue.put(None)
+            self._reader.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
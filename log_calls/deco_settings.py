@@ -73,14 +73,18 @@ class DecoSetting():
     context contains these keys:
         decorator
         settings      # of decorator
+        final_settings  # dict: final values of settings for this call
         indent
         prefixed_fname
         output_fname
         fparams
+        param_layout  # helpers.ParamLayout of fparams
         argcount
         argnames      # argcount-long
         argvals       # argcount-long
         varargs
+        varargs_name
+        kwargs_name
         explicit_kwargs
         implicit_kwargs
         defaulted_kwargs
@@ -96,6 +100,7 @@ class DecoSetting():
                           ' ==> '.join(context['call_list'])))
     context adds these keys:
         elapsed_secs
+        elapsed_ns    # int
         timestamp
         retval
     """
@@ -258,6 +263,15 @@ class DecoSettingsMapping():
         self.deco_class = deco_class
         class_settings_dict = self._deco_class_settings_dict
 
+        # Bumped by every __setitem__ (hence by update), so that clients
+        # can cache things derived from the settings, and know when
+        # to recompute them.
+        self._version = 0
+        # Cache for resolve_all, remade when _version changes
+        self._resolve_all_version = None
+        self._direct_final_values = None
+        self._indirect_settings = None
+
         # Insert values in the proper order - as given by caller,
         # both visible and not visible ones.
         self._tagged_values_dict = OrderedDict()    # stores pairs inserted by __setitem__
@@ -325,6 +339,7 @@ class DecoSettingsMapping():
                              % (key, self._tagged_values_dict[key][1]))
         if not allow_indirect:
             self._tagged_values_dict[key] = False, value
+            self._version += 1      # after the write: see resolve_all
             return
 
         # Detect fixup direct/static values, except for final_type == str
@@ -346,6 +361,7 @@ class DecoSettingsMapping():
                     value = value[:-1]
 
         self._tagged_values_dict[key] = indirect, value
+        self._version += 1
 
     def __getitem__(self, key):
         """You can only get visible settings."""
@@ -442,8 +458,49 @@ class DecoSettingsMapping():
             return di_val
 
         # di_val designates a (potential) f-keyword
-
-        setting_info = self._deco_class_settings_dict[name]
+        return self._indirect_final_value(
+            self._deco_class_settings_dict[name], di_val, dicts, fparams)
+
+    def resolve_all(self, *dicts, fparams) -> dict:
+        """Return a dict mapping the name of every setting, visible or not,
+        to its final value, as get_final_value would return it for
+        the same *dicts and fparams -- but in a single pass over
+        just the settings that have indirect values.
+        If no setting has an indirect value, the same dict is returned
+        every time, until the settings change (as per self._version).
+        Callers must not alter the returned dict.
+        """
+        # Read the version before the values: if a setting changes while
+        # the cache is being built, it's stamped with the old version,
+        # and rebuilt on the next call, never the other way round.
+        version = self._version
+        if self._resolve_all_version != version:
+            direct_final_values = {}
+            indirect_settings = []
+            for name, (indirect, di_val) in self._tagged_values_dict.items():
+                if indirect:
+                    indirect_settings.append(
+                        (name, self._deco_class_settings_dict[name], di_val))
+                else:
+                    direct_final_values[name] = di_val
+            self._direct_final_values = direct_final_values
+            self._indirect_settings = tuple(indirect_settings)
+            self._resolve_all_version = version
+
+        if not self._indirect_settings:
+            return self._direct_final_values
+
+        final_values = self._direct_final_values.copy()
+        for name, setting_info, di_val in self._indirect_settings:
+            final_values[name] = self._indirect_final_value(
+                                    setting_info, di_val, dicts, fparams)
+        return final_values
+
+    @staticmethod
+    def _indirect_final_value(setting_info, di_val, dicts, fparams):
+        """Final value of the setting described by setting_info,
+        whose indirect value is di_val, a (potential) f-keyword.
+        dicts, fparams: as for get_final_value."""
         final_type = setting_info.final_type
         default = setting_info.default
         allow_falsy = setting_info.allow_falsy
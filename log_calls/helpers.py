@@ -1,11 +1,18 @@
 __author__ = 'brianoneill'
 
+from collections import OrderedDict
+import logging
+import sys
+
 __all__ = [
     'difference_update',
     'is_keyword_param',
     'get_args_pos',
     'get_args_kwargs_param_names',
-    'dict_to_sorted_str'
+    'dict_to_sorted_str',
+    'logger_will_emit',
+    'ParamLayout',
+    'OverheadSampler',
 ]
 
 
@@ -170,6 +177,228 @@ def dict_to_sorted_str(d):
     return ret
 
 
+def logger_will_emit(logger, level) -> bool:
+    """Return True iff a record of the given level logged with logger
+    would be handled by some handler -- i.e. iff logger is enabled for level,
+    and some handler that would see the record (on logger or an ancestor
+    it propagates to, or logging.lastResort if there are none) has a level
+    <= level. (Handler filters aren't consulted.)
+
+    >>> lgr = logging.getLogger('helpers_doctest')
+    >>> lgr.setLevel(logging.INFO)
+    >>> logger_will_emit(lgr, logging.DEBUG)
+    False
+    >>> logger_will_emit(lgr, logging.INFO)     # no handlers: lastResort
+    False
+    >>> logger_will_emit(lgr, logging.WARNING)
+    True
+    >>> h = logging.NullHandler(level=logging.ERROR)
+    >>> lgr.addHandler(h); lgr.propagate = False
+    >>> logger_will_emit(lgr, logging.WARNING), logger_will_emit(lgr, logging.ERROR)
+    (False, True)
+    >>> lgr.removeHandler(h); lgr.propagate = True
+    """
+    if not logger.isEnabledFor(level):
+        return False
+    found_handlers = False
+    curr = logger
+    while curr:
+        for handler in curr.handlers:
+            found_handlers = True
+            if level >= handler.level:
+                return True
+        if not curr.propagate:
+            break
+        curr = curr.parent
+    if found_handlers:
+        return False
+    return bool(logging.lastResort) and level >= logging.lastResort.level
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+# helper class(es)
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+class ParamLayout():
+    """The layout of the parameters of a function f, computed once from
+    fparams = inspect.signature(f).parameters, so that the arguments
+    of each call to f can be classified with a few tuple slices and
+    dict lookups, instead of with inspect.Signature.bind.
+
+    Attributes:
+        fparams:       inspect.signature(f).parameters
+        names:         tuple of all parameter names, in order
+        pos_names:     tuple of names of the parameters that can be passed
+                       positionally (before any *args), in order
+        varargs_name:  name of the *args parameter, or None
+        kwargs_name:   name of the **kwargs parameter, or None
+        varargs_pos:   position of *args in names, or -1 (cf. get_args_pos)
+        kwonly:        frozenset of names of keyword-only parameters
+        kw_names:      tuple of names of the parameters that can be passed
+                       by keyword (not positional-only, not * or **), in order
+        defaults:      OrderedDict of (name, default value) for parameters
+                       that have defaults, in order
+
+    Doctests:
+    >>> import inspect
+    >>> def f(a, b, *args, x=1, y, **kwargs): pass
+    >>> layout = ParamLayout(inspect.signature(f).parameters)
+    >>> layout.names
+    ('a', 'b', 'args', 'x', 'y', 'kwargs')
+    >>> layout.pos_names, layout.varargs_name, layout.kwargs_name, layout.varargs_pos
+    (('a', 'b'), 'args', 'kwargs', 2)
+    >>> sorted(layout.kwonly), layout.kw_names
+    (['x', 'y'], ('a', 'b', 'x', 'y'))
+    >>> layout.defaults
+    OrderedDict([('x', 1)])
+    """
+    def __init__(self, fparams):
+        self.fparams = fparams
+        self.names = tuple(fparams)
+        self.varargs_name, self.kwargs_name = get_args_kwargs_param_names(fparams)
+        self.varargs_pos = get_args_pos(fparams)
+
+        pos_names = []
+        kw_names = []
+        kwonly = set()
+        self.defaults = OrderedDict()
+        # (name, default, position or sys.maxsize, can be passed by keyword)
+        defaults_table = []
+        for name, param in fparams.items():
+            kind = param.kind
+            if kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD):
+                pos = len(pos_names)
+                pos_names.append(name)
+            else:
+                pos = sys.maxsize
+            if kind in (param.POSITIONAL_OR_KEYWORD, param.KEYWORD_ONLY):
+                kw_names.append(name)
+            if kind == param.KEYWORD_ONLY:
+                kwonly.add(name)
+            if param.default is not param.empty:
+                self.defaults[name] = param.default
+                defaults_table.append(
+                    (name, param.default, pos, kind != param.POSITIONAL_ONLY))
+
+        self.pos_names = tuple(pos_names)
+        self.kw_names = tuple(kw_names)
+        self.kwonly = frozenset(kwonly)
+        self._kw_names_set = frozenset(kw_names)
+        self._defaults_table = tuple(defaults_table)
+
+    def classify(self, args, kwargs) -> tuple:
+        """Classify the arguments of the call f(*args, **kwargs).
+        Return tuple:
+            (argcount, argnames, argvals, varargs,
+             explicit_kwargs, defaulted_kwargs, implicit_kwargs)
+        where
+            argcount:         number of args that bind to positional params
+                              (= varargs_pos if f has *args, else len(args))
+            argnames, argvals: names and values of the positional args
+                              bound to named params (same length)
+            varargs:          tuple of positional args caught by *args
+            explicit_kwargs:  OrderedDict of args passed by keyword to
+                              named params, in order of params
+            defaulted_kwargs: OrderedDict of params not passed, which have
+                              defaults, mapped to those defaults
+            implicit_kwargs:  dict of keyword args caught by **kwargs
+        The call is assumed to be valid; if it isn't, calling f will say so.
+
+        Doctests:
+        >>> import inspect
+        >>> def f(a, b=2, *args, x=1, **kwargs): pass
+        >>> layout = ParamLayout(inspect.signature(f).parameters)
+        >>> layout.classify((0,), {})
+        (2, ['a'], (0,), (), OrderedDict(), OrderedDict([('b', 2), ('x', 1)]), {})
+        >>> layout.classify((0, 1, 2, 3), {'x': 5, 'z': 6})
+        (2, ['a', 'b'], (0, 1), (2, 3), OrderedDict([('x', 5)]), OrderedDict(), {'z': 6})
+        >>> layout.classify((0,), {'b': 4})
+        (2, ['a'], (0,), (), OrderedDict([('b', 4)]), OrderedDict([('x', 1)]), {})
+        >>> def g(a, b=2): pass
+        >>> ParamLayout(inspect.signature(g).parameters).classify((7, 8), {})
+        (2, ['a', 'b'], (7, 8), (), OrderedDict(), OrderedDict(), {})
+        """
+        nargs = len(args)
+        npos = len(self.pos_names)
+        if self.varargs_name:
+            argcount = self.varargs_pos
+            varargs = args[npos:]
+        else:
+            argcount = nargs
+            varargs = ()
+        argvals = args[:npos]
+        argnames = list(self.pos_names[:len(argvals)])
+
+        if kwargs:
+            explicit_kwargs = OrderedDict(
+                [(k, kwargs[k]) for k in self.kw_names if k in kwargs])
+            implicit_kwargs = {k: v for k, v in kwargs.items()
+                               if k not in explicit_kwargs}
+        else:
+            explicit_kwargs = OrderedDict()
+            implicit_kwargs = {}
+
+        defaulted_kwargs = OrderedDict(
+            [(name, default)
+             for (name, default, pos, kwable) in self._defaults_table
+             if pos >= nargs and not (kwable and name in kwargs)]
+        )
+        return (argcount, argnames, argvals, varargs,
+                explicit_kwargs, defaulted_kwargs, implicit_kwargs)
+
+
+class OverheadSampler():
+    """Decides which calls to log, so that the overhead of logging them
+    stays within a budget: a fraction of the decorated function's own time.
+
+    Running averages (exponentially weighted) of the elapsed time of f and
+    of the decorator's overhead, over the calls that were logged, give
+    the rate: budget * avg elapsed / avg overhead, between min_rate and 1.
+    admit() spreads the admitted calls evenly: it keeps a running credit,
+    adding rate to it on every call and admitting one when it reaches 1.
+
+    >>> sampler = OverheadSampler()
+    >>> sampler.update(0.01, elapsed_ns=1000, overhead_ns=40)
+    >>> sampler.rate
+    0.25
+    >>> [sampler.admit() for _ in range(8)]
+    [False, False, False, True, False, False, False, True]
+    >>> sampler.update(0.01, elapsed_ns=1000, overhead_ns=5)     # cheaper now
+    >>> round(sampler.rate, 3)
+    0.274
+    """
+    min_rate = 0.001
+    smoothing = 0.1     # weight of each new measurement in the averages
+
+    def __init__(self):
+        self.rate = 1.0
+        self._credit = 0.0
+        self._avg_elapsed = None
+        self._avg_overhead = None
+
+    def admit(self) -> bool:
+        self._credit += self.rate
+        if self._credit >= 1.0:
+            self._credit -= 1.0
+            return True
+        return False
+
+    def update(self, budget, elapsed_ns, overhead_ns):
+        """Account for a logged call: f took elapsed_ns, the decorator
+        overhead_ns more; budget: overhead allowed, as a fraction of f's time."""
+        if self._avg_elapsed is None:
+            self._avg_elapsed = elapsed_ns
+            self._avg_overhead = overhead_ns
+        else:
+            w = self.smoothing
+            self._avg_elapsed += w * (elapsed_ns - self._avg_elapsed)
+            self._avg_overhead += w * (overhead_ns - self._avg_overhead)
+        if self._avg_overhead <= 0:
+            self.rate = 1.0
+        else:
+            self.rate = max(self.min_rate,
+                            min(1.0, budget * self._avg_elapsed / self._avg_overhead))
+
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
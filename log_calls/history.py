@@ -0,0 +1,598 @@
+__author__ = "Brian O'Neill"  # BTO
+__version__ = '0.2.2'
+__doc__ = """
+Storage for the call history of a decorated function.
+
+CallHistory keeps records column by column: call numbers, elapsed times
+and timestamps in typed arrays; function names, caller chains and argument
+names as ids into tables of distinct values; each call's arguments as one
+compact tuple. With max_history > 0, the columns are allocated up front
+and used as a ring buffer. CallRecords are made only when records are read.
+The tables of distinct values are rebuilt from the records in memory when
+one of them outgrows those records (by a factor of interned_slack, as old
+records are overwritten or deleted), so that they stay bounded too.
+
+Optionally, with max_history > 0, records pushed out of memory are "spilled"
+to a file instead of discarded: appended to it as JSON Lines, one object
+per record. The history then consists of the spilled records followed by
+those in memory, and reading it reads the file. The file is only ever
+appended to, so that what an earlier run spilled is still there for a
+post-mortem (that isn't part of the new history); clear() -- e.g. by
+clear_history -- truncates it. Exports that read every column (e.g.
+history_as_DataFrame) read the file once, within exporting().
+
+Spilled records come back as JSON leaves them: values that JSON can't
+represent are their reprs (strings); tuples, including those nested
+in values, are lists; dict keys are strings. A record that JSON can't
+encode at all (e.g. an argument that's a dict with tuple keys, or a
+circular list) is spilled with every argument value and the retval
+as reprs. Argument values and varargs are tuples again, and the
+kwargs, dicts.
+
+Records of calls to generator functions also have the number of items
+the generator yielded and the time it took to yield the first one;
+for other calls, those fields are None.
+
+HistorySampler decides which calls get recorded, when history is sampled.
+"""
+from array import array
+from collections import namedtuple, OrderedDict
+from contextlib import contextmanager
+import datetime
+import itertools
+import json
+import os
+import random
+
+__all__ = ['CallRecord', 'CallHistory', 'HistorySampler']
+
+
+CallRecord = namedtuple(
+    "CallRecord",
+    (
+        'call_num',
+        'argnames', 'argvals',
+        'varargs',
+        'explicit_kwargs', 'defaulted_kwargs', 'implicit_kwargs',
+        'retval',
+        'elapsed_secs',
+        'timestamp',
+        'prefixed_func_name',
+        # caller_chain: list of fn names, the last possibly a "prefixed name".
+        # From most-recent (immediate caller) to least-recent if len > 1.
+        'caller_chain',
+        # Generator functions only (otherwise None):
+        # number of items yielded, and seconds until the first was
+        'items_yielded',
+        'first_item_secs',
+    ),
+    defaults=(None, None)
+)
+
+
+def _safe_repr(value):
+    """repr(value), or a placeholder if that raises."""
+    try:
+        return repr(value)
+    except Exception:
+        return '<%s object (repr failed)>' % type(value).__name__
+
+
+def _record_with_reprs(rec):
+    """CallRecord rec with its argument values and retval replaced by
+    their reprs (as in spill files that can't represent them, and history
+    logs), so that it can be pickled or serialized."""
+    return rec._replace(
+        argvals=tuple(_safe_repr(v) for v in rec.argvals),
+        varargs=tuple(_safe_repr(v) for v in rec.varargs),
+        explicit_kwargs=OrderedDict((k, _safe_repr(v)) for k, v in rec.explicit_kwargs.items()),
+        defaulted_kwargs=OrderedDict((k, _safe_repr(v)) for k, v in rec.defaulted_kwargs.items()),
+        implicit_kwargs={k: _safe_repr(v) for k, v in rec.implicit_kwargs.items()},
+        retval=_safe_repr(rec.retval))
+
+
+def _make_record(tables, call_num, elapsed, timestamp,
+                 name_id, chain_id, argnames_id, args, retval, gen_stats):
+    """A CallRecord from the values of a record's columns (in the order
+    of CallHistory._record_columns), whose ids index tables, the triple
+    of _Interned (names, chains, argnames)."""
+    names, chains, argnames = tables
+    argvals, varargs, explicit, defaulted, implicit = args
+    items_yielded, first_item_secs = gen_stats or (None, None)
+    return CallRecord(
+        call_num,
+        list(argnames.values[argnames_id]),
+        argvals,
+        varargs,
+        OrderedDict(explicit), OrderedDict(defaulted), dict(implicit),
+        retval,
+        elapsed,
+        timestamp,
+        prefixed_func_name=names.values[name_id],
+        caller_chain=list(chains.values[chain_id]),
+        items_yielded=items_yielded,
+        first_item_secs=first_item_secs)
+
+
+class _TimestampFormatter():
+    """Callable that formats epoch times as '%x %X.%f' (local time),
+    running strftime only when the second changes from the previous call --
+    consecutive records are mostly in the same second."""
+    def __init__(self):
+        self._second = None
+        self._prefix = None
+
+    def __call__(self, ts):
+        dt = datetime.datetime.fromtimestamp(ts)
+        whole = dt.replace(microsecond=0)
+        if whole != self._second:
+            self._second = whole
+            self._prefix = whole.strftime('%x %X')
+        return '%s.%06d' % (self._prefix, dt.microsecond)
+
+
+class _Interned():
+    """Table of distinct (hashable) values; each value's id is its index."""
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def id(self, value):
+        id_ = self.ids.get(value)
+        if id_ is None:
+            id_ = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return id_
+
+
+class CallHistory():
+    """Columnar call history. (See module docstring.)
+
+        maxlen:     if > 0, keep only the most recent maxlen records in
+                    memory; otherwise, keep them all.
+        spill_file: if maxlen > 0 and this is a path, append records pushed
+                    out of memory to that file, so that they remain part of
+                    the history; records already in the file aren't part
+                    of it (until clear() truncates the file).
+
+    Iterating yields CallRecords, oldest first, whose `timestamp` fields
+    are raw epoch times (floats); the column accessors (call_nums,
+    elapsed_secs, timestamps, retvals, ...) return values in the same order.
+    """
+    _num_columns = ('_call_nums', '_elapsed', '_timestamps',
+                    '_name_ids', '_chain_ids', '_argnames_ids')
+    _num_typecodes = ('q', 'd', 'd', 'i', 'i', 'i')
+    # Columns of ids, and the _Interned tables they index
+    _interned_columns = (('_name_ids', '_names'),
+                         ('_chain_ids', '_chains'),
+                         ('_argnames_ids', '_argnames'))
+    # Compact the tables when one has more values than this many times
+    # the number of records in memory, or 64 if that's more
+    interned_slack = 2
+
+    def __init__(self, maxlen=0, spill_file=None):
+        self.maxlen = maxlen if maxlen > 0 else 0
+        self.spill_file = spill_file if self.maxlen else None
+        self._spill_fp = None
+        # Within exporting(), the spilled records, read once
+        self._spilled_cache = None
+        # This history's records start at this offset of the spill file,
+        # after any records spilled before, e.g. by an earlier run
+        self._spill_offset = 0
+        self._spill_newline = False     # whether to end a partial last line
+        if self.spill_file and os.path.exists(self.spill_file):
+            with open(self.spill_file, 'rb') as fp:
+                fp.seek(0, os.SEEK_END)
+                self._spill_offset = fp.tell()
+                if self._spill_offset:
+                    fp.seek(-1, os.SEEK_END)
+                    self._spill_newline = fp.read(1) != b'\n'
+        self._reset()
+
+    def clear(self):
+        """Remove all records, and truncate the spill file, if any."""
+        if self.spill_file:
+            self.close()
+            open(self.spill_file, 'w').close()
+        self._spill_offset = 0
+        self._spill_newline = False
+        self._reset()
+
+    def _reset(self):
+        self._num_spilled = 0
+        n = self.maxlen
+        for attr, typecode in zip(self._num_columns, self._num_typecodes):
+            col = array(typecode)
+            if n:
+                col.frombytes(bytes(n * col.itemsize))
+            setattr(self, attr, col)
+        self._args = [None] * n
+        self._retvals = [None] * n
+        # (items_yielded, first_item_secs), or None if not a generator
+        self._gen_stats = [None] * n
+        self._names = _Interned()
+        self._chains = _Interned()
+        self._argnames = _Interned()
+        self._len = 0
+        self._next = 0      # slot of next record, if maxlen
+
+    def __len__(self):
+        return self._num_spilled + self._len
+
+    def _spill(self, i):
+        """Append the record in slot i to the spill file. Never raises:
+        if JSON can't encode the record as it is (non-str dict keys,
+        circular containers, a failing repr, ...), it's written with all
+        its argument values and retval as reprs; if the file can't be
+        written, the record is dropped."""
+        rec = self._record_at(i)
+        try:
+            line = json.dumps(rec._asdict(), default=repr)
+        except Exception:
+            line = json.dumps(_record_with_reprs(rec)._asdict())
+        try:
+            if not self._spill_fp:
+                self._spill_fp = open(self.spill_file, 'a', encoding='utf-8')
+            if self._spill_newline:
+                self._spill_fp.write('\n')
+                self._spill_offset += 1
+                self._spill_newline = False
+            self._spill_fp.write(line + '\n')
+        except OSError:
+            return
+        self._num_spilled += 1
+
+    def close(self):
+        """Close the spill file, if it's open. (Reading or appending
+        reopens it.)"""
+        if self._spill_fp:
+            self._spill_fp.close()
+            self._spill_fp = None
+
+    def _spilled_records(self, start=0, stop=None):
+        """Return an iterator of the spilled records [start:stop]
+        (0 <= start <= stop), as CallRecords. The spill file is flushed
+        now, and read as the iterator is."""
+        stop = self._num_spilled if stop is None else stop
+        if start >= stop:
+            return iter(())
+        if self._spill_fp:
+            self._spill_fp.flush()
+        return self._read_spilled(start, stop, self._spill_offset)
+
+    def _read_spilled(self, start, stop, offset):
+        """Generate the records [start:stop] of the spill file, whose
+        first record is at offset, as CallRecords."""
+        with open(self.spill_file, 'rb') as fp:
+            fp.seek(offset)
+            for n, line in enumerate(fp):
+                if n >= stop:
+                    break
+                if n < start:
+                    continue
+                d = json.loads(line.decode('utf-8'), object_pairs_hook=OrderedDict)
+                yield CallRecord(
+                    d['call_num'],
+                    d['argnames'], tuple(d['argvals']),
+                    tuple(d['varargs']),
+                    d['explicit_kwargs'], d['defaulted_kwargs'],
+                    dict(d['implicit_kwargs']),
+                    d['retval'],
+                    d['elapsed_secs'],
+                    d['timestamp'],
+                    prefixed_func_name=d['prefixed_func_name'],
+                    caller_chain=d['caller_chain'],
+                    items_yielded=d.get('items_yielded'),
+                    first_item_secs=d.get('first_item_secs'))
+
+    def append(self, call_num,
+               argnames, argvals,
+               varargs,
+               explicit_kwargs, defaulted_kwargs, implicit_kwargs,
+               retval,
+               elapsed_secs,
+               timestamp_secs,
+               prefixed_func_name,
+               caller_chain,
+               items_yielded=None,
+               first_item_secs=None):
+        args = (tuple(argvals), tuple(varargs),
+                tuple(explicit_kwargs.items()),
+                tuple(defaulted_kwargs.items()),
+                tuple(implicit_kwargs.items()))
+        row = (call_num, elapsed_secs, timestamp_secs,
+               self._names.id(prefixed_func_name),
+               self._chains.id(tuple(caller_chain)),
+               self._argnames.id(tuple(argnames)))
+        gen_stats = (None if items_yielded is None else
+                     (items_yielded, first_item_secs))
+        if self.maxlen:
+            i = self._next
+            if self.spill_file and self._len == self.maxlen:
+                self._spill(i)
+            for attr, value in zip(self._num_columns, row):
+                getattr(self, attr)[i] = value
+            self._args[i] = args
+            self._retvals[i] = retval
+            self._gen_stats[i] = gen_stats
+            self._next = (i + 1) % self.maxlen
+            if self._len < self.maxlen:
+                self._len += 1
+        else:
+            for attr, value in zip(self._num_columns, row):
+                getattr(self, attr).append(value)
+            self._args.append(args)
+            self._retvals.append(retval)
+            self._gen_stats.append(gen_stats)
+            self._len += 1
+
+        limit = self.interned_slack * max(self._len, 64)
+        if (len(self._names.values) > limit or len(self._chains.values) > limit
+                or len(self._argnames.values) > limit):
+            self._compact()
+
+    def _compact(self):
+        """Rebuild the _Interned tables with just the values that records
+        in memory use, and renumber their ids."""
+        for ids_attr, table_attr in self._interned_columns:
+            ids = getattr(self, ids_attr)
+            values = getattr(self, table_attr).values
+            table = _Interned()
+            for j in range(self._len):
+                ids[j] = table.id(values[ids[j]])
+            setattr(self, table_attr, table)
+
+    def delete(self, i):
+        """Delete the i-th oldest record. Only for unbounded histories
+        (maxlen <= 0), which are never spilled."""
+        assert not self.maxlen
+        for attr in self._num_columns:
+            del getattr(self, attr)[i]
+        del self._args[i]
+        del self._retvals[i]
+        del self._gen_stats[i]
+        self._len -= 1
+
+    def _slot(self, i):
+        """Storage index of the i-th oldest record, 0 <= i < len(self)."""
+        if self.maxlen and self._len == self.maxlen:
+            return (self._next + i) % self.maxlen
+        return i
+
+    @contextmanager
+    def exporting(self):
+        """Within this, the column accessors read the spill file (if any)
+        just once between them, rather than each reading it."""
+        self._spilled_cache = self._spilled()
+        try:
+            yield self
+        finally:
+            self._spilled_cache = None
+
+    def _spilled(self):
+        """The spilled records, as an unbounded CallHistory."""
+        if self._spilled_cache is not None:
+            return self._spilled_cache
+        spilled = CallHistory()
+        for rec in self._spilled_records():
+            spilled.append(*rec)
+        return spilled
+
+    def _ordered(self, attr):
+        """The values of column attr (e.g. '_elapsed'), oldest first:
+        those of spilled records, if any, then those of records in memory.
+        Not for columns of ids (see _ordered_codes)."""
+        values = self._in_memory(attr)
+        if self._num_spilled:
+            values = self._spilled()._ordered(attr) + values
+        return values
+
+    def _in_memory(self, attr, lo=0, hi=None):
+        """The values of column attr of the records in memory [lo:hi]
+        (0 <= lo <= hi <= self._len), oldest first."""
+        col = getattr(self, attr)
+        hi = self._len if hi is None else hi
+        if self.maxlen and self._len == self.maxlen:
+            # Slots of a full ring start at self._next, and wrap around
+            lo, hi = lo + self._next, hi + self._next
+            if hi <= self.maxlen:
+                return col[lo:hi]
+            if lo >= self.maxlen:
+                return col[lo - self.maxlen:hi - self.maxlen]
+            return col[lo:] + col[:hi - self.maxlen]
+        return col[lo:hi]
+
+    def _ordered_codes(self, attr, table):
+        """Pair (codes, values): the ids in column attr (e.g. '_name_ids'),
+        oldest first as in _ordered, and the list of values they index --
+        those of self's _Interned table `table`, followed by any values
+        of spilled records that aren't in it. The table itself is left
+        as it is."""
+        own = getattr(self, table)
+        values = list(own.values)
+        if not self._num_spilled:
+            return self._in_memory(attr), values
+        spilled = self._spilled()
+        extra = {}
+        remap = []
+        for value in getattr(spilled, table).values:
+            id_ = own.ids.get(value)
+            if id_ is None:
+                id_ = extra.get(value)
+                if id_ is None:
+                    id_ = extra[value] = len(values)
+                    values.append(value)
+            remap.append(id_)
+        head = spilled._ordered(attr)
+        head = array(head.typecode, (remap[id_] for id_ in head))
+        return head + self._in_memory(attr), values
+
+    def call_nums(self):
+        return self._ordered('_call_nums')
+
+    def elapsed_secs(self):
+        return self._ordered('_elapsed')
+
+    def timestamps(self):
+        """Raw epoch times of calls"""
+        return self._ordered('_timestamps')
+
+    def retvals(self):
+        return self._ordered('_retvals')
+
+    def generator_columns(self):
+        """Pair of lists (items_yielded, first_item_secs), oldest first."""
+        gen_stats = self._ordered('_gen_stats')
+        return ([None if gs is None else gs[0] for gs in gen_stats],
+                [None if gs is None else gs[1] for gs in gen_stats])
+
+    def prefixed_func_name_codes(self):
+        """Pair (codes, names): the id of each record's prefixed_func_name,
+        oldest first, and the names those ids index."""
+        return self._ordered_codes('_name_ids', '_names')
+
+    def caller_chain_codes(self):
+        """Pair (codes, chains): the id of each record's caller_chain,
+        oldest first, and the chains (tuples) those ids index."""
+        return self._ordered_codes('_chain_ids', '_chains')
+
+    def arg_columns(self, param_layout):
+        """OrderedDict mapping each parameter name in param_layout.names
+        to the list of its values in the records, oldest first:
+        the *varargs parameter's values are tuples, the **kwargs
+        parameter's are dicts (the implicit kwargs); others' are the
+        arguments as passed or defaulted (None if absent)."""
+        varargs_name = param_layout.varargs_name
+        kwargs_name = param_layout.kwargs_name
+        columns = OrderedDict((name, []) for name in param_layout.names)
+        argnames_ids, argnames = self._ordered_codes('_argnames_ids', '_argnames')
+        all_args = self._ordered('_args')
+        for argnames_id, args in zip(argnames_ids, all_args):
+            argvals, varargs, explicit, defaulted, implicit = args
+            vals = dict(zip(argnames[argnames_id], argvals))
+            vals.update(explicit)
+            vals.update(defaulted)
+            for name, column in columns.items():
+                if name == varargs_name:
+                    column.append(varargs)
+                elif name == kwargs_name:
+                    column.append(dict(implicit))
+                else:
+                    column.append(vals.get(name))
+        return columns
+
+    def record(self, i):
+        """The i-th oldest record (in memory), as a CallRecord
+        (raw timestamp)."""
+        return self._record_at(self._slot(i))
+
+    # The columns of a record, in the order _make_record takes them
+    _record_columns = ('_call_nums', '_elapsed', '_timestamps',
+                       '_name_ids', '_chain_ids', '_argnames_ids',
+                       '_args', '_retvals', '_gen_stats')
+
+    def _record_at(self, j):
+        """The record in slot j, as a CallRecord."""
+        return _make_record((self._names, self._chains, self._argnames),
+                            *(getattr(self, attr)[j] for attr in self._record_columns))
+
+    def records(self, start=None, stop=None):
+        """Generate records[start:stop] (oldest first) as CallRecords,
+        spilled records included."""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        if start < self._num_spilled:
+            yield from self._spilled_records(start, min(stop, self._num_spilled))
+        for i in range(max(start - self._num_spilled, 0), stop - self._num_spilled):
+            yield self.record(i)
+
+    def records_snapshot(self, start=None, stop=None):
+        """Return an iterator of records[start:stop] as of now, whatever
+        is appended, compacted or cleared later. Only copies of the
+        columns of the records in memory are made now -- typed arrays,
+        and lists of references to their arguments and retvals -- and
+        the current _Interned tables kept (compaction replaces them);
+        CallRecords are made as it's iterated. Spilled records, which
+        stay put in the file (until clear()), are read as it's iterated."""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        n = self._num_spilled
+        spilled = self._spilled_records(min(start, n), min(stop, n))
+        lo, hi = max(start - n, 0), max(stop - n, 0)
+        columns = [self._in_memory(attr, lo, hi) for attr in self._record_columns]
+        tables = (self._names, self._chains, self._argnames)
+        in_memory = (_make_record(tables, *row) for row in zip(*columns))
+        return itertools.chain(spilled, in_memory)
+
+    def __iter__(self):
+        return self.records()
+
+
+class HistorySampler():
+    """Which logged calls to record in history, given a history_sample
+    setting `sample`:
+
+        None, 0 or 1:   every call
+        int n > 1:      every n-th call: the 1st, (n+1)-th, (2n+1)-th, ...
+        float 0<p<1:    each call, with probability p
+        'reservoir':    a uniform random sample of all calls so far,
+                        of max_history records ("Algorithm R"), kept in
+                        an unbounded (never spilled) CallHistory, from
+                        which admit_record() evicts records at random.
+
+    All but a reservoir sample are decided as a call starts (admit_call),
+    so that a call that won't be recorded needn't make a record; a
+    reservoir sample, as records go into history (admit_record).
+
+    Raises ValueError for any other value, or for 'reservoir' with
+    max_history <= 0.
+    """
+    RESERVOIR = 'reservoir'
+
+    def __init__(self, sample, max_history=0):
+        self.sample = sample
+        self.every = self.probability = self.reservoir_size = None
+        if sample is None or (type(sample) is int and sample in (0, 1)):
+            pass
+        elif type(sample) is int and sample > 1:
+            self.every = sample
+        elif type(sample) is float and 0.0 < sample <= 1.0:
+            if sample < 1.0:
+                self.probability = sample
+        elif sample == self.RESERVOIR:
+            if max_history <= 0:
+                raise ValueError("history_sample='reservoir' requires max_history > 0")
+            self.reservoir_size = max_history
+        else:
+            raise ValueError("history_sample must be None, an int >= 0, a float "
+                             "in (0, 1], or 'reservoir', not %r" % (sample,))
+        self._random = random.random
+        self._randrange = random.randrange
+
+    def admit(self, call_num, hist):
+        """Return True if the call_num-th logged call (1-based) should be
+        appended to CallHistory hist: admit_call, then admit_record."""
+        return self.admit_call(call_num) and self.admit_record(call_num, hist)
+
+    def admit_call(self, call_num):
+        """Return True if the call_num-th logged call (1-based) should be
+        recorded, as far as can be told when it starts: always, for a
+        reservoir (see admit_record)."""
+        if self.every:
+            return call_num % self.every == 1
+        if self.probability:
+            return self._random() < self.probability
+        return True
+
+    def admit_record(self, call_num, hist):
+        """Return True if the record of the call_num-th logged call, which
+        admit_call admitted, should be appended to CallHistory hist. Only a
+        reservoir may say no; if it says yes, a record is first evicted from
+        hist to make room, if need be."""
+        if self.reservoir_size:
+            if len(hist) < self.reservoir_size:
+                return True
+            j = self._randrange(call_num)
+            if j < self.reservoir_size:
+                hist.delete(j)
+                return True
+            return False
+        return True
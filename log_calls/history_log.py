@@ -0,0 +1,255 @@
+__author__ = "Brian O'Neill"  # BTO
+__version__ = '0.2.2'
+__doc__ = """
+A binary file format for call history, for dumps that are too big to
+parse as CSV: HistoryLogWriter appends records to a history log,
+HistoryLogReader maps one into memory and exposes its columns without
+copying them.
+
+A history log is two files:
+
+    <path>          header, then fixed-size records
+    <path>.strings  the string table: one JSON-encoded str per line;
+                    a string's id is its line number (0-based)
+
+The header is the magic bytes MAGIC, then the length (uint32, little-endian)
+of a JSON object describing the record layout:
+    {"columns": [[name, struct format char], ...], "record_size": int}
+padded with spaces to a multiple of 8 bytes. Records follow, packed,
+little-endian, with the columns in order (see COLUMNS):
+
+    call_num        int64
+    elapsed_secs    float64
+    timestamp       float64     epoch seconds
+    prefixed_fname  uint32      string id
+    caller_chain    uint32      string id of the JSON list of names
+    args            uint32      string id of a JSON object:
+                                {"argnames": [...], "argvals": [reprs],
+                                 "varargs": [reprs], "explicit_kwargs": {k: repr},
+                                 "defaulted_kwargs": {k: repr},
+                                 "implicit_kwargs": {k: repr}}
+    retval          uint32      string id of its repr
+    items_yielded   int64       generator functions only, else -1
+    first_item_secs float64     generator functions only, else NaN
+
+A reader takes the columns from the header, so it can read logs written
+without the last two (as CallRecords with None for those fields).
+Function names and caller chains are interned -- each distinct one is
+stored once -- up to HistoryLogWriter.intern_limit of them, after which
+new ones are stored every time they occur. The args and retval strings,
+mostly different in each record, are always stored anew.
+"""
+from array import array
+from collections import OrderedDict
+import json
+import math
+import mmap
+import os
+import struct
+
+from .history import CallRecord, _safe_repr
+
+__all__ = ['HistoryLogWriter', 'HistoryLogReader']
+
+
+MAGIC = b'LCHLOG\x00\x01'
+
+COLUMNS = (
+    ('call_num',        'q'),
+    ('elapsed_secs',    'd'),
+    ('timestamp',       'd'),
+    ('prefixed_fname',  'I'),
+    ('caller_chain',    'I'),
+    ('args',            'I'),
+    ('retval',          'I'),
+    ('items_yielded',   'q'),
+    ('first_item_secs', 'd'),
+)
+_STRING_COLUMNS = ('prefixed_fname', 'caller_chain', 'args', 'retval')
+
+_record_struct = struct.Struct('<' + ''.join(code for _, code in COLUMNS))
+
+
+def _strings_path(path):
+    return path + '.strings'
+
+
+class HistoryLogWriter():
+    """Writes a history log at path (replacing any existing one).
+    (See module docstring.)"""
+    # Interned strings are kept in memory, so there's a limit to them
+    intern_limit = 4096
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self._string_ids = {}       # interned strings
+        self._num_strings = 0
+        self._file = open(self.path, 'wb')
+        self._strings_file = open(_strings_path(self.path), 'w', encoding='utf-8')
+        header = json.dumps({'columns': COLUMNS,
+                             'record_size': _record_struct.size}).encode('ascii')
+        header += b' ' * (-(len(MAGIC) + 4 + len(header)) % 8)
+        self._file.write(MAGIC + struct.pack('<I', len(header)) + header)
+
+    def _string_id(self, s):
+        """Add s to the string table, and return its id."""
+        self._strings_file.write(json.dumps(s) + '\n')
+        self._num_strings += 1
+        return self._num_strings - 1
+
+    def _interned_string_id(self, s):
+        id_ = self._string_ids.get(s)
+        if id_ is None:
+            id_ = self._string_id(s)
+            if len(self._string_ids) < self.intern_limit:
+                self._string_ids[s] = id_
+        return id_
+
+    def append(self, call_num,
+               argnames, argvals,
+               varargs,
+               explicit_kwargs, defaulted_kwargs, implicit_kwargs,
+               retval,
+               elapsed_secs,
+               timestamp_secs,
+               prefixed_func_name,
+               caller_chain,
+               items_yielded=None,
+               first_item_secs=None):
+        args = json.dumps(OrderedDict((
+            ('argnames', list(argnames)),
+            ('argvals', [_safe_repr(v) for v in argvals]),
+            ('varargs', [_safe_repr(v) for v in varargs]),
+            ('explicit_kwargs', OrderedDict((k, _safe_repr(v)) for k, v in explicit_kwargs.items())),
+            ('defaulted_kwargs', OrderedDict((k, _safe_repr(v)) for k, v in defaulted_kwargs.items())),
+            ('implicit_kwargs', OrderedDict((k, _safe_repr(v)) for k, v in implicit_kwargs.items())),
+        )))
+        self._file.write(_record_struct.pack(
+            call_num, elapsed_secs, timestamp_secs,
+            self._interned_string_id(prefixed_func_name),
+            self._interned_string_id(json.dumps(list(caller_chain))),
+            self._string_id(args),
+            self._string_id(_safe_repr(retval)),
+            -1 if items_yielded is None else items_yielded,
+            math.nan if first_item_secs is None else first_item_secs))
+
+    def flush(self):
+        """Make what's been appended visible to readers opened afterwards."""
+        self._strings_file.flush()
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._strings_file.close()
+            self._file.close()
+
+
+class HistoryLogReader():
+    """Reads a history log, mapped into memory. (See module docstring.)
+
+    column(name) returns the values of a column as a NumPy array that views
+    the mapped file (no copy) if NumPy is available, otherwise as a list.
+    Such arrays remain valid after close(): the file stays mapped until
+    they're garbage collected.
+    records_view is a memoryview of the records region as a whole.
+    Iterating, or record(i), gives CallRecords, in which argument values
+    and retval are reprs and timestamp is epoch seconds. Strings are read
+    from the string table (also mapped) as they're needed.
+    Use as a context manager, or call close().
+    """
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        with open(self.path, 'rb') as fp:
+            self._mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError("%s is not a log_calls history log" % self.path)
+        header_len, = struct.unpack_from('<I', self._mmap, len(MAGIC))
+        self._offset = len(MAGIC) + 4 + header_len
+        header = json.loads(self._mmap[len(MAGIC) + 4:self._offset].decode('ascii'))
+        self.columns = tuple((name, code) for name, code in header['columns'])
+        self.record_size = header['record_size']
+        self._struct = struct.Struct('<' + ''.join(code for _, code in self.columns))
+        self._len = (len(self._mmap) - self._offset) // self.record_size
+        self.records_view = memoryview(self._mmap)[
+            self._offset:self._offset + self._len * self.record_size]
+        self._strings_mmap = None
+        self._string_offsets = None     # where each string starts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._strings_mmap is not None:
+            self._strings_mmap.close()
+        try:
+            self.records_view.release()
+            self._mmap.close()
+        except BufferError:
+            # Arrays from column() still view the mapping;
+            # it's unmapped when they're garbage collected.
+            pass
+
+    def __len__(self):
+        return self._len
+
+    def column(self, name):
+        index = [col_name for col_name, _ in self.columns].index(name)
+        try:
+            import numpy as np
+        except ImportError:
+            return [values[index] for values in self._struct.iter_unpack(self.records_view)]
+        dtype = np.dtype([(col_name, '<' + code) for col_name, code in self.columns])
+        return np.frombuffer(self.records_view, dtype=dtype)[name]
+
+    def _index_strings(self):
+        """Map the string table, and find where each string starts."""
+        self._string_offsets = array('q')
+        with open(_strings_path(self.path), 'rb') as fp:
+            if os.fstat(fp.fileno()).st_size:
+                self._strings_mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        strings = self._strings_mmap
+        start = 0
+        while strings is not None and start < len(strings):
+            self._string_offsets.append(start)
+            start = strings.find(b'\n', start) + 1
+            if not start:       # a partial last line
+                break
+
+    def string(self, id_):
+        """The string with id id_ in the string table."""
+        if self._string_offsets is None:
+            self._index_strings()
+        start = self._string_offsets[id_]
+        end = self._strings_mmap.find(b'\n', start)
+        return json.loads(self._strings_mmap[start:end if end >= 0 else None].decode('utf-8'))
+
+    def record(self, i):
+        """The i-th record, as a CallRecord."""
+        if not 0 <= i < self._len:
+            raise IndexError("record index out of range")
+        values = dict(zip((name for name, _ in self.columns),
+                          self._struct.unpack_from(self.records_view, i * self.record_size)))
+        args = json.loads(self.string(values['args']), object_pairs_hook=OrderedDict)
+        items_yielded = values.get('items_yielded', -1)
+        first_item_secs = values.get('first_item_secs', math.nan)
+        return CallRecord(
+            values['call_num'],
+            args['argnames'], tuple(args['argvals']),
+            tuple(args['varargs']),
+            args['explicit_kwargs'], args['defaulted_kwargs'],
+            dict(args['implicit_kwargs']),
+            self.string(values['retval']),
+            values['elapsed_secs'],
+            values['timestamp'],
+            prefixed_func_name=self.string(values['prefixed_fname']),
+            caller_chain=json.loads(self.string(values['caller_chain'])),
+            items_yielded=None if items_yielded < 0 else items_yielded,
+            first_item_secs=None if math.isnan(first_item_secs) else first_item_secs)
+
+    def __iter__(self):
+        for i in range(self._len):
+            yield self.record(i)
@@ -1,12 +1,13 @@
 __author__ = "Brian O'Neill"  # BTO
-__version__ = '0.2.1'
+__version__ = '0.2.2'
 __doc__ = """
 Configurable decorator for debugging and profiling that writes
 caller name(s), args+values, function return values, execution time,
 number of call, to stdout or to a logger. log_calls can track
 call history and provide it in CSV format.
-NOTE: CPython only -- this uses internals of stack frames
-      which may well differ in other interpreters.
+NOTE: Call chains name the undecorated functions between decorated ones
+      using sys._getframe, a CPython implementation detail; elsewhere,
+      they skip straight to the nearest enabled decorated caller.
 See docs/log_calls.md for details, usage info and examples.
 
 Argument logging is based on the Python 2 decorator:
@@ -17,17 +18,32 @@ import inspect
 from functools import wraps, partial
 import logging
 import sys
+import contextvars
+import csv
+from fnmatch import fnmatchcase
 import io   # so we can refer to io.TextIOBase
+import itertools
+import math
+import os
+import threading
 import time
-import datetime
-from collections import namedtuple, OrderedDict, deque
+import weakref
+from collections import namedtuple, OrderedDict
 
 from .deco_settings import DecoSetting, DecoSettingsMapping
 from .helpers import (difference_update, prefix_multiline_str,
                       is_keyword_param,
-                      get_args_pos, get_args_kwargs_param_names,
-                      dict_to_sorted_str)
+                      dict_to_sorted_str,
+                      logger_will_emit,
+                      ParamLayout,
+                      OverheadSampler)
 from .proxy_descriptors import ClassInstanceAttrProxy
+from .history import (CallRecord, CallHistory, HistorySampler, _TimestampFormatter,
+                      _record_with_reprs)
+from .history_log import HistoryLogWriter
+from .shards import ShardedStats, StatsSnapshot
+from .report import ProfileReport
+from .sinks import LogSink
 
 __all__ = ['log_calls', 'record_history', '__version__', '__author__']
 
@@ -35,22 +51,85 @@ __all__ = ['log_calls', 'record_history', '__version__', '__author__']
 #------------------------------------------------------------------------------
 # log_calls
 #------------------------------------------------------------------------------
-CallRecord = namedtuple(
-    "CallRecord",
-    (
-        'call_num',
-        'argnames', 'argvals',
-        'varargs',
-        'explicit_kwargs', 'defaulted_kwargs', 'implicit_kwargs',
-        'retval',
-        'elapsed_secs',
-        'timestamp',
-        'prefixed_func_name',
-        # caller_chain: list of fn names, the last possibly a "prefixed name".
-        # From most-recent (immediate caller) to least-recent if len > 1.
-        'caller_chain',
-    )
-)
+# sys._getframe is a CPython implementation detail; without it,
+# call chains just end at the nearest enabled decorated caller.
+_getframe = getattr(sys, '_getframe', None)
+
+class _ActiveCall():
+    """An entry on the stack of active calls of a deco class.
+    frame: of the wrapper that made the call (None if no sys._getframe);
+           set to None when the call ends, so that contexts copied during
+           the call (e.g. by tasks it created), which have the entry on
+           their stacks, don't keep the frame, and its locals, alive
+    name: prefixed function name, plus " [n]" if its call number is logged
+    indent_level: the extra indent level of the call
+    parent: the entry for the enclosing active call, or None"""
+    __slots__ = ('frame', 'name', 'indent_level', 'parent')
+
+    def __init__(self, frame, name, indent_level, parent):
+        self.frame = frame
+        self.name = name
+        self.indent_level = indent_level
+        self.parent = parent
+
+def _task_name(frame):
+    """If frame is the event loop's, running an asyncio task (whose
+    coroutine is the callee of frame), return '<' + the task's name + '>';
+    otherwise None.
+    That's the frame of the Handle._run that calls a (C) task's step,
+    or of a (pure Python) task's step method itself -- not of any other
+    asyncio code, e.g. asyncio.wait_for awaiting a coroutine."""
+    module = frame.f_globals.get('__name__')
+    name = frame.f_code.co_name
+    if not ((module == 'asyncio.events' and name == '_run')
+            or (module == 'asyncio.tasks' and name.startswith('__step'))):
+        return None
+    asyncio = sys.modules['asyncio']
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:        # no running event loop
+        return None
+    return '<%s>' % task.get_name() if task else None
+
+
+def _name_matches(name, include, exclude):
+    """True iff name matches include -- a name or fnmatch-style pattern,
+    or an iterable of them; None means any name but a __dunder__ one --
+    and doesn't match exclude (likewise; None matches nothing)."""
+    def matches(patterns):
+        if isinstance(patterns, str):
+            patterns = (patterns,)
+        return any(fnmatchcase(name, pattern) for pattern in patterns)
+
+    if include is None:
+        if name.startswith('__') and name.endswith('__'):
+            return False
+    elif not matches(include):
+        return False
+    return exclude is None or not matches(exclude)
+
+
+# Spill files and history logs a worker process inherited from its parent,
+# kept (unused) for the life of the worker; see _deco_base._reset_in_worker
+_inherited_files = []
+
+
+# What a wrapper's logged call carries from _begin_call to _post_call.
+# final_settings: final values of the settings for the call
+# active: its _ActiveCall, which stack_token is the token of pushing
+# context: None if there are no handlers to call
+# budget: the overhead budget, if any; t_start: when the wrapper was entered
+# sample_rate: the overhead sampler's rate when it admitted the call (else 1.0)
+_LoggedCall = namedtuple('_LoggedCall', ('call_num', 'final_settings',
+                                         'active', 'stack_token', 'context',
+                                         'logging_fn', 'can_indent', 'global_indent',
+                                         'post_call_plan', 'budget', 't_start',
+                                         'sample_rate'))
+
+# Return values of these types are summarized in stats.retval_stats.
+# (Exact types: not bool, not subclasses; and only values that are
+# finite as floats -- not nan, infinities, or ints too big for a float.)
+_numeric_types = frozenset((int, float))
 
 
 #-----------------------------------------------------------------------------
@@ -58,14 +137,18 @@ CallRecord = namedtuple(
 # The `context` arg for pre_call_handler methods has these keys:
 #     decorator
 #     settings      # of decorator
+#     final_settings  # dict: final values of settings for this call
 #     indent
 #     prefixed_fname
 #     output_fname
 #     fparams
+#     param_layout  # ParamLayout of fparams
 #     argcount
 #     argnames      # argcount-long
 #     argvals       # argcount-long
 #     varargs
+#     varargs_name
+#     kwargs_name
 #     explicit_kwargs
 #     implicit_kwargs
 #     defaulted_kwargs
@@ -96,8 +179,7 @@ class DecoSettingArgs(DecoSetting):
             return None
 
         # Make msg
-        args_sep = context['settings'].get_final_value(
-                    'args_sep', context['kwargs'], fparams=context['fparams'])
+        args_sep = context['final_settings']['args_sep']
         indent = context['indent']
 
         # ~Kludge / incomplete treatment of seps that contain \n
@@ -114,13 +196,14 @@ class DecoSettingArgs(DecoSetting):
 
         args_vals = list(zip(context['argnames'], context['argvals']))
 
+        layout = context['param_layout']
         if context['varargs']:
-            args_vals.append( ("[*]%s" % context['varargs_name'], context['varargs']) )
+            args_vals.append( ("[*]%s" % layout.varargs_name, context['varargs']) )
 
         args_vals.extend( context['explicit_kwargs'].items() )
 
         if context['implicit_kwargs']:
-            args_vals.append( ("[**]%s" % context['kwargs_name'],  context['implicit_kwargs']) )
+            args_vals.append( ("[**]%s" % layout.kwargs_name,  context['implicit_kwargs']) )
 
         if args_vals:
             #msg += args_sep.join('%s=%r' % pair for pair in args_vals)
@@ -146,6 +229,7 @@ class DecoSettingArgs(DecoSetting):
 # DecoSetting subclasses with post-call handlers.
 # The `context` for post_call_handler methods has these additional keys:
 #     elapsed_secs
+#     elapsed_ns    # int
 #     timestamp
 #     retval
 #-----------------------------------------------------------------------------
@@ -169,8 +253,12 @@ class DecoSettingElapsed(DecoSetting):
         super().__init__(name, bool, False, allow_falsy=True, **kwargs)
 
     def post_call_handler(self, context: dict):
-        return (context['indent'] +
-                "elapsed time: %f [secs]" % context['elapsed_secs'])
+        msg = "elapsed time: %f [secs]" % context['elapsed_secs']
+        if context.get('items_yielded') is not None:
+            msg += ", items yielded: %d" % context['items_yielded']
+            if context['first_item_secs'] is not None:
+                msg += ", first after: %f [secs]" % context['first_item_secs']
+        return context['indent'] + msg
 
 
 class DecoSettingExit(DecoSetting):
@@ -184,11 +272,16 @@ class DecoSettingExit(DecoSetting):
 
 
 class DecoSettingHistory(DecoSetting):
+    # Its handler records, and writes nothing: it's called even when
+    # no messages are being written (cf. _deco_base._get_call_plan).
+    returns_msg = False
+
     def __init__(self, name, **kwargs):
         super().__init__(name, bool, False, allow_falsy=True, **kwargs)
 
     def post_call_handler(self, context: dict):
         context['decorator']._add_to_history(
+            context['call_num'],
             context['argnames'],
             context['argvals'],
             context['varargs'],
@@ -199,7 +292,9 @@ class DecoSettingHistory(DecoSetting):
             elapsed_secs=context['elapsed_secs'],
             timestamp_secs=context['timestamp'],
             prefixed_func_name=context['prefixed_fname'],
-            caller_chain=context['call_list']
+            caller_chain=context['call_list'],
+            items_yielded=context.get('items_yielded'),
+            first_item_secs=context.get('first_item_secs')
         )
         return None
 
@@ -216,9 +311,11 @@ class _deco_base():
     The wrapper of the wrapped function collects a lot of information,
     saved in a dict `context`, which is passed to the handlers.
     This and derived decorators take various keyword arguments, same as settings keys.
-    Every parameter except prefix and max_history can take two kinds of values,
-    direct and indirect. Briefly, if the value of any of those parameters
-    is a string that ends in in '=', then it's treated as the name of a keyword
+    Every parameter except prefix, max_history, history_spill_file,
+    history_sample and overhead_budget can take two kinds of values,
+    direct and indirect.
+    Briefly, if the value of any of
+    those parameters is a string that ends in in '=', then it's treated as the name of a keyword
     arg of the wrapped function, and its value when that function is called is
     the final, indirect value of the decorator's parameter (for that call).
     See deco_settings.py docstring for details.
@@ -246,6 +343,27 @@ class _deco_base():
         max_history:       An int. value >  0 --> store at most value-many records,
                                                   oldest records overwritten;
                                    value <= 0 --> unboundedly many records are stored.
+        history_spill_file: None, or a path. If max_history > 0, records pushed out
+                           of memory are appended to this file (JSON Lines) rather
+                           than discarded, and remain part of the history. Records
+                           already in the file (e.g. from an earlier run) are kept,
+                           but aren't part of it; clear_history truncates the file.
+                           (Default: None)
+        history_sample:    Which logged calls to record: None, 0 or 1 --> all of them;
+                           an int n > 1 --> every n-th; a float p < 1 --> each with
+                           probability p; 'reservoir' --> a uniform random sample of
+                           max_history records of all calls. Call counts and elapsed
+                           time are still for all logged calls. (Default: None)
+        overhead_budget:   None, or a float: the fraction of the function's own time
+                           that logging (and recording) it may add, e.g. 0.01. Calls
+                           are then logged at a rate adapted to keep within that,
+                           stats.sample_rate; the rest are only counted, in
+                           num_calls_total. Other stats and history are of logged
+                           calls; stats.elapsed_secs_estimated reweights their elapsed
+                           time by 1/sample_rate, for all calls. (Default: None)
+        record_retval_stats: If true, keep stats.retval_stats, a running summary of
+                           the return values of logged calls that are ints or floats.
+                           (Default: False)
     """
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     # sentinels, for identifying functions on the calls stack
@@ -269,6 +387,118 @@ class _deco_base():
     # placeholder! set_class_sentinels called from __init__
     _sentinels = None
 
+    # Every instance (of any deco class) that has decorated a function,
+    # while that function's wrapper exists (see aggregate.py, report.py)
+    _decorated = weakref.WeakSet()
+
+    @classmethod
+    def decorated_functions(cls):
+        """List of all functions decorated by cls (or a subclass) that
+        still exist -- the wrappers, which have the `stats` attribute --
+        sorted by prefixed name."""
+        decos = sorted((deco for deco in list(_deco_base._decorated)
+                        if isinstance(deco, cls)),
+                       key=lambda deco: deco.prefix + deco.f.__name__)
+        wrappers = (deco._wrapper_ref() for deco in decos)
+        return [wrapper for wrapper in wrappers if wrapper is not None]
+
+    @staticmethod
+    def report(sort_by='elapsed_secs', prefix=None, module=None, top=None):
+        """A report.ProfileReport on every decorated function (whatever
+        decorated it): their calls and elapsed times, ranked by sort_by --
+        one of 'elapsed_secs' (total, the default), 'num_calls_total',
+        'num_calls_logged', 'mean_secs', 'p99_secs', 'max_secs'.
+        prefix: only functions whose prefixed names start with this;
+        module: only functions in this module or its submodules;
+        top: only this many, from the top."""
+        return ProfileReport.from_decorators(list(_deco_base._decorated), sort_by=sort_by,
+                                             prefix=prefix, module=module, top=top)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    # decorating many functions at once
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    @classmethod
+    def instrument_class(cls, klass, include=None, exclude=None, **settings):
+        """Decorate the methods defined in class klass -- functions,
+        staticmethods and classmethods -- with cls and settings, in place.
+        They all share one settings object, so changing a setting of
+        one changes it for all; each has its own stats. Their prefix is
+        the prefix setting (default '') + klass.__qualname__ + '.', less
+        any '<locals>.' in it (for a class defined in a function).
+        include, exclude: a name or fnmatch-style pattern, or an iterable
+        of them; only methods whose names match include (default: all but
+        __dunder__ methods) and don't match exclude are decorated. Methods
+        that are already decorated (by any deco class) are left as they are.
+        Return the shared settings (a DecoSettingsMapping)."""
+        qualname = '.'.join(part for part in klass.__qualname__.split('.')
+                            if part != '<locals>')
+        return cls._instrument(klass, qualname + '.', include, exclude, settings,
+                               lambda f: True)
+
+    @classmethod
+    def instrument_module(cls, module, include=None, exclude=None, **settings):
+        """As instrument_class, for the functions defined in module (not
+        those it imports); their prefix is the prefix setting + the module's
+        __name__ + '.'. Only functions called through the module's namespace
+        (e.g. as module.f(), or from within module) are logged: a name
+        imported from module before this is still bound to the undecorated
+        function."""
+        return cls._instrument(module, module.__name__ + '.', include, exclude, settings,
+                               lambda f: f.__module__ == module.__name__)
+
+    @classmethod
+    def _instrument(cls, owner, name_prefix, include, exclude, settings, is_own):
+        if settings.get('history_spill_file'):
+            raise ValueError("functions decorated together can't share a history_spill_file")
+        settings['prefix'] = settings.get('prefix', '') + name_prefix
+        # Makes (and validates) the settings that all the decorators share
+        shared = cls(**settings)._settings_mapping
+        for name, attr in list(vars(owner).items()):
+            if not _name_matches(name, include, exclude):
+                continue
+            is_descriptor = isinstance(attr, (staticmethod, classmethod))
+            f = attr.__func__ if is_descriptor else attr
+            if (not inspect.isfunction(f)
+                    or isinstance(getattr(f, 'stats', None), ClassInstanceAttrProxy)
+                    or not is_own(f)):
+                continue
+            wrapper = cls._with_settings(shared, settings['prefix'])(f)
+            setattr(owner, name, type(attr)(wrapper) if is_descriptor else wrapper)
+        return shared
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    # stack of active calls, for call chains
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    @classmethod
+    def set_class_call_stack(cls):
+        """ 'virtual', called from __init__.
+        Each enabled call to a function decorated by cls pushes an _ActiveCall
+        onto a stack held in a context variable, so every thread (and every
+        asyncio task) has a stack of its own. Disabled calls push nothing.
+        """
+        return contextvars.ContextVar(cls.__name__ + '_active_calls',
+                                      default=None)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    # clock used to time calls
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    _clock_ns = staticmethod(time.perf_counter_ns)
+
+    @classmethod
+    def set_clock(cls, clock_ns=None):
+        """Time calls to functions decorated by cls (or its subclasses,
+        unless they set their own) with clock_ns, a callable of no arguments
+        that returns an int number of nanoseconds from a monotonic clock.
+        None: go back to time.perf_counter_ns, the default.
+        Timestamps of calls are always wall-clock time, from time.time()."""
+        cls._clock_ns = staticmethod(clock_ns or time.perf_counter_ns)
+
+    # placeholders! set from __init__
+    _active_calls = None
+    # code object of wrapped fn |-> its prefixed name, held weakly,
+    # so that it doesn't keep functions' code alive
+    _prefixed_names_by_code = None
+
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     # # *** DecoSettingsMapping "API" --
     # # (1) initialize: Subclasses must call register_class_settings
@@ -292,12 +522,27 @@ class _deco_base():
         'num_calls_logged',
         'num_calls_total',
         'elapsed_secs_logged',
+        'elapsed_ns_logged',
+        'elapsed_secs_estimated',
+        'sample_rate',
+        'latency_histogram',
+        'elapsed_stats',
+        'retval_stats',
+        'items_yielded',
+        'first_item_stats',
+        'items_per_sec',
         'history',
         'history_as_csv',
         'history_as_DataFrame',
     )
     _method_descriptor_names = (
         'clear_history',
+        'iter_history_csv',
+        'write_history_csv',
+        'start_history_log',
+        'stop_history_log',
+        'latency_percentile',
+        'snapshot',
     )
 
     @classmethod
@@ -319,25 +564,102 @@ class _deco_base():
         return cls._method_descriptor_names
 
     # A few generic properties, internal logging, and exposed
-    # as descriptors on the stats (ClassInstanceAttrProxy) obj
+    # as descriptors on the stats (ClassInstanceAttrProxy) obj.
+    # These combine the per-thread shards of the stats
+    # (see shards.py for what that means for concurrent reads).
     @property
     def num_calls_logged(self):
-        return self._num_calls_logged
+        return self._shards.sum('num_calls_logged')
 
     @property
     def num_calls_total(self):
         """All calls, logged and not logged"""
-        return self._num_calls_total
+        return self._shards.sum('num_calls_total')
 
     @property
     def elapsed_secs_logged(self):
         # REDONE: This value is accumulated for logged calls
         # whether or not history is being recorded.
-        return self._elapsed_secs_logged
+        return self._shards.sum('elapsed_ns_logged') / 1e9
+
+    @property
+    def elapsed_ns_logged(self):
+        """elapsed_secs_logged as an exact int number of nanoseconds
+        (as measured by the class's clock -- see set_clock)"""
+        return self._shards.sum('elapsed_ns_logged')
+
+    @property
+    def elapsed_secs_estimated(self):
+        """Estimated elapsed time of all enabled calls, logged or not:
+        with an overhead_budget, each logged call counts 1/sample_rate
+        times (its rate when it was admitted). Without one, it's
+        elapsed_secs_logged. (The other stats, and history, are of
+        the logged calls only: an unbiased sample if f's elapsed time
+        doesn't drift with the rate.)"""
+        return self._shards.sum('elapsed_ns_estimated') / 1e9
+
+    @property
+    def latency_histogram(self):
+        """metrics.LatencyHistogram of the elapsed times of logged calls, in ns"""
+        return self._shards.merged('latency')
+
+    @property
+    def elapsed_stats(self):
+        """metrics.RunningStats of the elapsed times of logged calls, in seconds"""
+        return self._shards.merged('elapsed_stats')
+
+    @property
+    def retval_stats(self):
+        """metrics.RunningStats of the return values of logged calls
+        that returned an int or a float (a finite one, as a float),
+        made while record_retval_stats was true"""
+        return self._shards.merged('retval_stats')
+
+    @property
+    def items_yielded(self):
+        """Total number of items yielded by logged calls to a generator
+        function (or async generator function) that have finished"""
+        return self._shards.sum('items_yielded')
+
+    @property
+    def first_item_stats(self):
+        """metrics.RunningStats of the time, in seconds, from the start of
+        each logged call of a generator function to its first item"""
+        return self._shards.merged('first_item_stats')
+
+    @property
+    def items_per_sec(self):
+        """Throughput of a generator function: items_yielded per second
+        of elapsed_secs_logged (time spent in the generator itself); None
+        if there's no elapsed time yet"""
+        elapsed_ns = self._shards.sum('elapsed_ns_logged')
+        return self.items_yielded / (elapsed_ns / 1e9) if elapsed_ns else None
+
+    def latency_percentile(self, q):
+        """Elapsed time, in seconds, within which q percent of logged calls
+        completed (0 <= q <= 100), to within the precision of
+        latency_histogram; None if there have been no logged calls."""
+        ns = self._shards.merged('latency').percentile(q)
+        return None if ns is None else ns / 1e9
+
+    @property
+    def sample_rate(self):
+        """Fraction of enabled calls being logged: 1.0, unless there's
+        an overhead_budget, in which case it's adjusted as calls are made."""
+        settings = self._settings_mapping
+        if 'overhead_budget' in settings and settings['overhead_budget']:
+            return self._overhead_sampler.rate
+        return 1.0
 
     @property
     def history(self):
-        return tuple(self._call_history)
+        # Records are stored with raw epoch timestamps (see _add_to_history);
+        # format them now.
+        format_timestamp = _TimestampFormatter()
+        with self._history_lock:
+            self._merge_history()
+            return tuple(rec._replace(timestamp=format_timestamp(rec.timestamp))
+                         for rec in self._call_history)
 
     @property
     def history_as_csv(self):
@@ -352,22 +674,55 @@ class _deco_base():
             timestamp       (format somehow? what is it anyway)
             function (it's a name/str)
         """
-        csv_sep = '|'
-        all_args = list(self.f_params)
-        varargs_name, kwargs_name = get_args_kwargs_param_names(self.f_params)
-
-        csv = ''
-
-        # Write column headings line (append to csv str)
+        return ''.join(self.iter_history_csv())
+
+    # Format of history csv: '|'-separated, with csv's usual quoting
+    # of fields that contain '|', '"' or newlines.
+    _csv_format = dict(delimiter='|', lineterminator='\n')
+
+    def iter_history_csv(self, start=None, stop=None):
+        """Generate the lines of history_as_csv (with newlines): the column
+        headings, then one line per record in history[start:stop]."""
+        buf = io.StringIO()
+        writer = csv.writer(buf, **self._csv_format)
+        for row in self._history_csv_rows(start, stop):
+            writer.writerow(row)
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+
+    def write_history_csv(self, fp, start=None, stop=None):
+        """Write history_as_csv, or just the records in history[start:stop]
+        (plus the column headings), to the text file fp, a row at a time.
+        fp should be opened with newline=''."""
+        with self._history_lock:
+            csv.writer(fp, **self._csv_format).writerows(
+                self._history_csv_rows(start, stop))
+
+    def _history_csv_rows(self, start, stop):
+        """Generate the rows of history csv, as lists of strs: those of
+        the records in history when this starts. (Records made later, in
+        other threads while this is suspended, aren't included.)"""
+        with self._history_lock:
+            self._merge_history()
+            records = self._call_history.records_snapshot(start, stop)
+        layout = self.f_param_layout
+        all_args = layout.names
+        varargs_name, kwargs_name = layout.varargs_name, layout.kwargs_name
+
+        # Column headings
         fields = ['call_num']
         fields.extend(all_args)
-        fields.extend(['retval', 'elapsed_secs', 'timestamp', 'prefixed_fname', 'caller_chain'])
+        fields.extend(['retval', 'elapsed_secs'])
+        if self.f_is_generator:
+            fields.extend(['items_yielded', 'first_item_secs'])
+        fields.extend(['timestamp', 'prefixed_fname', 'caller_chain'])
         # 0.2.1 - use str not repr, get rid of quotes around column names
-        csv = csv_sep.join(map(str, fields))
-        csv += '\n'
+        yield fields
 
-        # Write data lines
-        for rec in self._call_history:
+        # Data rows
+        format_timestamp = _TimestampFormatter()
+        for rec in records:
             fields = [str(rec.call_num)]
             # Do arg vals.
             # make dict of ALL args/vals
@@ -388,14 +743,13 @@ class _deco_base():
             # and now the remaining fields
             fields.append(repr(rec.retval))
             fields.append(str(rec.elapsed_secs))
-            fields.append(rec.timestamp)        # it already IS a formatted str
+            if self.f_is_generator:
+                fields.append(str(rec.items_yielded))
+                fields.append(str(rec.first_item_secs))
+            fields.append(format_timestamp(rec.timestamp))
             fields.append(repr(rec.prefixed_func_name))
             fields.append(repr(rec.caller_chain))
-
-            csv += csv_sep.join(fields)
-            csv += '\n'
-
-        return csv
+            yield fields
 
     @property
     def history_as_DataFrame(self):
@@ -404,35 +758,174 @@ class _deco_base():
         except ImportError:
             return None
 
-        import io
-        df = pd.DataFrame.from_csv(io.StringIO(self.history_as_csv),
-                                   sep='|',
-                                   infer_datetime_format=True)
+        import numpy as np
+        # Built from the columns of history, not from history_as_csv:
+        # arguments and retval are the original objects, elapsed_secs
+        # is float64, timestamp is datetime64[ns] (UTC), and prefixed_fname
+        # and caller_chain are categoricals.
+        with self._history_lock:
+            self._merge_history()
+            with self._call_history.exporting() as hist:
+                return self._history_DataFrame(pd, np, hist)
+
+    def _history_DataFrame(self, pd, np, hist):
+        """history_as_DataFrame of CallHistory hist."""
+        data = OrderedDict(hist.arg_columns(self.f_param_layout))
+        data['retval'] = hist.retvals()
+        if not len(hist):
+            # No values to infer dtypes from: don't let pandas guess float64
+            for name in data:
+                data[name] = np.array([], dtype=object)
+        data['elapsed_secs'] = np.frombuffer(hist.elapsed_secs(), dtype=np.float64)
+        if self.f_is_generator:
+            items_yielded, first_item_secs = hist.generator_columns()
+            data['items_yielded'] = pd.array(items_yielded, dtype='Int64')
+            data['first_item_secs'] = np.array(
+                [np.nan if secs is None else secs for secs in first_item_secs],
+                dtype=np.float64)
+        # (pandas may pick another resolution, e.g. for no timestamps)
+        data['timestamp'] = pd.to_datetime(
+            np.frombuffer(hist.timestamps(), dtype=np.float64), unit='s'
+        ).astype('datetime64[ns]')
+        codes, names = hist.prefixed_func_name_codes()
+        data['prefixed_fname'] = pd.Categorical.from_codes(
+            np.asarray(codes, dtype=np.int64), categories=names)
+        codes, chains = hist.caller_chain_codes()
+        data['caller_chain'] = pd.Categorical.from_codes(
+            np.asarray(codes, dtype=np.int64),
+            categories=[repr(list(chain)) for chain in chains])
+
+        df = pd.DataFrame(data,
+                          index=pd.Index(np.frombuffer(hist.call_nums(), dtype=np.int64),
+                                         name='call_num'))
         return df
 
     def _make_call_history(self):
-        return deque(maxlen=(self.max_history if self.max_history > 0 else None))
-
-    def clear_history(self, max_history=0):
-        """Using clear_history it's possible to change max_history"""
-        self._num_calls_logged = 0
-        self._num_calls_total = 0
-
-        self._elapsed_secs_logged = 0.0
-
-        self.max_history = int(max_history)  # set before calling _make_call_history
+        # A reservoir sample bounds the history itself
+        maxlen = 0 if self._history_sampler.reservoir_size else self.max_history
+        return CallHistory(maxlen, self.history_spill_file)
+
+    def clear_history(self, max_history=0, history_sample=None):
+        """Using clear_history it's possible to change max_history
+        and history_sample. A history_spill_file is truncated.
+        Functions decorated together (see instrument_class) share those
+        settings, so the stats and history of all of them are cleared."""
+        # Validate before changing anything
+        HistorySampler(history_sample, int(max_history))
+        settings = self._settings_mapping
+        for deco in [self] + [deco for deco in list(_deco_base._decorated)
+                              if deco is not self and deco._settings_mapping is settings]:
+            deco._clear_history(int(max_history), history_sample)
+        settings.__setitem__('max_history', max_history, _force_mutable=True)
+        settings.__setitem__('history_sample', history_sample, _force_mutable=True)
+
+    def _clear_history(self, max_history, history_sample):
+        # Calls in progress in other threads may or may not be counted.
+        self._shards = ShardedStats()
+        self._call_numbers = itertools.count(1)
+
+        with self._history_lock:
+            self.max_history = max_history      # set before calling _make_call_history
+            self._history_sampler = HistorySampler(history_sample, max_history)   # ditto
+            self._call_history.clear()          # truncates a spill file
+            self._call_history.close()
+            self._call_history = self._make_call_history()
+
+    def _reset_in_worker(self):
+        """Start stats and history afresh in a worker process (see
+        aggregate.init_worker), which may have inherited them, and the
+        parent's open spill file and history log, by forking. Those files
+        still belong to the parent: they're neither truncated nor written
+        to, and the worker's history is kept in memory only."""
+        # Locks held by other threads of the parent stay held in a forked
+        # child, so these are replaced rather than acquired.
+        self._history_lock = threading.RLock()
+        self._shards = ShardedStats()
+        self._call_numbers = itertools.count(1)
+        # Closing the inherited files -- which garbage collection would do --
+        # would write the parent's buffered data to them a second time.
+        _inherited_files.append((self._call_history, self._history_log))
+        self._history_log = None
+        self.history_spill_file = None
+        self._history_sampler = HistorySampler(self._history_sampler.sample, self.max_history)
         self._call_history = self._make_call_history()
-        self._settings_mapping.__setitem__('max_history', max_history, _force_mutable=True)
-
-    def _add_call(self, *, logged):
-        self._num_calls_total += 1
-        if logged:
-            self._num_calls_logged += 1
 
-    def _add_to_elapsed(self, elapsed_secs):
-        self._elapsed_secs_logged += elapsed_secs
+    def snapshot(self, history=False):
+        """A shards.StatsSnapshot of these stats, which can be merged with
+        snapshots of the same function from other processes (see aggregate.py).
+        history: False -- no records; True -- all of history; an int n --
+        the last n records of history."""
+        snap = self._shards.merge_into(
+            StatsSnapshot(self.prefix + self.f.__name__, (os.getpid(),)))
+        if history:
+            with self._history_lock:
+                self._merge_history()
+                start = None if history is True else -int(history)
+                snap.history = [_record_with_reprs(rec)
+                                for rec in self._call_history.records(start)]
+        return snap
+
+    def start_history_log(self, path):
+        """From now on, also append every record added to history to
+        a binary history log at path (replacing any there); see history_log.py.
+        Stops writing to a previous history log, if any."""
+        self.stop_history_log()
+        with self._history_lock:
+            self._merge_history()
+            self._history_log = HistoryLogWriter(path)
+
+    def stop_history_log(self):
+        """Stop writing to the history log, and close it."""
+        with self._history_lock:
+            self._merge_history()
+            if self._history_log:
+                self._history_log.close()
+                self._history_log = None
+
+    def _get_call_plan(self, quiet, recorded=True) -> tuple:
+        """Return pair (pre-call handlers, post-call handlers) of tuples of
+        triples (setting name, handler method, is_indirect), for the handler
+        settings whose values are direct and true, or indirect. Handlers whose
+        settings are directly false are left out, so calls don't look at them.
+        quiet: True iff no messages will be written, in which case handlers
+        of DecoSettings whose returns_msg attribute is false (default: true)
+        are left out as well.
+        recorded: False iff the call won't be recorded in history (as per
+        HistorySampler.admit_call), in which case the handler of the
+        DecoSettingHistory is left out as well.
+        The plans are remade whenever the settings have changed since they
+        were last made."""
+        settings = self._settings_mapping
+        # Read once, before the plans are made from the settings (see
+        # DecoSettingsMapping.resolve_all)
+        version = settings._version
+        if self._call_plan_version != version:
+            self._call_plan = {
+                (q, r): (self._make_handler_plan(settings._pre_call_handlers,
+                                                 'pre_call_handler', q, r),
+                         self._make_handler_plan(settings._post_call_handlers,
+                                                 'post_call_handler', q, r))
+                for q in (False, True) for r in (False, True)
+            }
+            self._call_plan_version = version
+        return self._call_plan[quiet, recorded]
+
+    def _make_handler_plan(self, setting_names, handler_attr, quiet, recorded) -> tuple:
+        settings = self._settings_mapping
+        plan = []
+        for setting_name in setting_names:
+            indirect, value = settings._get_tagged_value(setting_name)
+            info = settings._get_DecoSetting(setting_name)
+            if quiet and getattr(info, 'returns_msg', True):
+                continue
+            if not recorded and isinstance(info, DecoSettingHistory):
+                continue
+            if indirect or value:
+                plan.append((setting_name, getattr(info, handler_attr), indirect))
+        return tuple(plan)
 
     def _add_to_history(self,
+                        call_num,
                         argnames, argvals,
                         varargs,
                         explicit_kwargs, defaulted_kwargs, implicit_kwargs,
@@ -440,31 +933,58 @@ class _deco_base():
                         elapsed_secs,
                         timestamp_secs,
                         prefixed_func_name,
-                        caller_chain
+                        caller_chain,
+                        items_yielded=None,
+                        first_item_secs=None
     ):
         """Only called for *logged* calls, with record_history true.
-        Call counters are already bumped."""
-        # Convert timestamp_secs to datetime
-        timestamp = datetime.datetime.fromtimestamp(timestamp_secs).\
-            strftime('%x %X.%f')    # or '%Y-%m-%d %I:%M:%S.%f %p'
+        Call counters are already bumped.
+        The record keeps timestamp_secs as is; it's formatted
+        only when history is read (see history._TimestampFormatter).
+        It waits in this thread's shard until the next _merge_history."""
 
         # argnames can contain keyword args (e.g. defaulted), so guard against that
         n = min(len(argnames), len(argvals))
         argnames = argnames[:n]
         argvals = argvals[:n]
 
-        self._call_history.append(
-                CallRecord(
-                    self._num_calls_logged,
-                    argnames, argvals,
-                    varargs,
-                    explicit_kwargs, defaulted_kwargs, implicit_kwargs,
-                    retval,
-                    elapsed_secs,
-                    timestamp,
-                    prefixed_func_name=prefixed_func_name,
-                    caller_chain=caller_chain)
-        )
+        record = (call_num,
+                  argnames, argvals,
+                  varargs,
+                  explicit_kwargs, defaulted_kwargs, implicit_kwargs,
+                  retval,
+                  elapsed_secs,
+                  timestamp_secs,
+                  prefixed_func_name,
+                  caller_chain,
+                  items_yielded,
+                  first_item_secs)
+        shards = self._shards
+        pending = shards.shard().pending
+        pending.append(record)
+        if (len(pending) >= shards.pending_limit
+                or shards.num_retired_pending() >= shards.pending_limit):
+            with self._history_lock:
+                self._merge_history()
+
+    def _merge_history(self):
+        """Move the records pending in all threads' shards into history
+        (and the history log, if any), in call number order. Records were
+        only made for calls that history_sample admitted as they started;
+        a reservoir sample picks among them now.
+        Never raises: the records are already drained, so a record the
+        history log can't take is left out of the log (only), rather than
+        losing the rest of them -- or failing a call that merges.
+        Call with self._history_lock held."""
+        hist = self._call_history
+        for record in self._shards.drain_pending():
+            if self._history_sampler.admit_record(record[0], hist):
+                hist.append(*record)
+                if self._history_log:
+                    try:
+                        self._history_log.append(*record)
+                    except Exception:
+                        pass
 
     # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
     # __init__, __call__
@@ -490,25 +1010,56 @@ class _deco_base():
             prefix=prefix,
             **other_values_dict
         )
+        self._init_state(prefix)
 
+    @classmethod
+    def _with_settings(cls, settings_mapping, prefix):
+        """An instance of cls whose settings are settings_mapping, shared
+        with others (see instrument_class); its stats are its own."""
+        deco = cls.__new__(cls)
+        deco._settings_mapping = settings_mapping
+        deco._init_state(prefix)
+        return deco
+
+    def _init_state(self, prefix):
+        """Set up everything but self._settings_mapping, which is set."""
+        settings = self._settings_mapping
         if not self.__class__._sentinels:
             self.__class__._sentinels = self.set_class_sentinels()
+        if not self.__class__._active_calls:
+            self.__class__._active_calls = self.set_class_call_stack()
+            self.__class__._prefixed_names_by_code = weakref.WeakKeyDictionary()
 
         self._stats = ClassInstanceAttrProxy(class_instance=self)
 
-        # Accessed by descriptors on the stats obj
-        self._num_calls_total = 0
-        self._num_calls_logged = 0
+        # Accessed by descriptors on the stats obj:
+        # counts, elapsed times (for logged calls only, accumulated
+        # even when record_history is false), and history records
+        # not yet merged, kept per thread (see shards.py)
+        self._shards = ShardedStats()
+        # Numbers of logged calls; next() is atomic
+        self._call_numbers = itertools.count(1)
+        # Held while merging records into history, and reading it
+        self._history_lock = threading.RLock()
         # max_history > 0 --> size of self._call_history; <= 0 --> unbounded
         # Set before calling _make_call_history
-        self.max_history = other_values_dict.get('max_history', 0)  # <-- Nota bene
+        self.max_history = settings._get_tagged_value('max_history')[1]  # <-- Nota bene
+        self.history_spill_file = settings._get_tagged_value('history_spill_file')[1]
+        self._history_sampler = HistorySampler(settings._get_tagged_value('history_sample')[1],
+                                               self.max_history)
         self._call_history = self._make_call_history()
+        # A HistoryLogWriter, while start_history_log is in effect
+        self._history_log = None
+        # Decides which calls to log when there's an overhead_budget
+        self._overhead_sampler = OverheadSampler()
 
-        # Accumulate this (for logged calls only)
-        # even when record_history is false:
-        self._elapsed_secs_logged = 0.0
+        # handlers to call, given the settings; see _get_call_plan
+        self._call_plan = None
+        self._call_plan_version = None
 
         self.f_params = None    # set properly by __call__
+        self.f_param_layout = None  # ditto
+        self.f_is_generator = None  # ditto
         self.f = None           # set properly by __call__
         self.prefix = prefix    # special case
 
@@ -516,61 +1067,345 @@ class _deco_base():
         """Because there are decorator arguments, __call__() is called
         only once, and it can take only a single argument: the function
         to decorate. The return value of __call__ is called subsequently.
-        So, this method *returns* the decorator proper."""
+        So, this method *returns* the decorator proper.
+        If f is a coroutine function, so is the wrapper returned."""
         # First, save prefix + function name for function f
         prefixed_fname = self.prefix + f.__name__
         # Might as well save f too
         self.f = f
         # in addition to its parameters
         self.f_params = inspect.signature(f).parameters
+        # and their layout, so calls needn't use Signature.bind
+        self.f_param_layout = ParamLayout(self.f_params)
+        # Calls to generator functions are timed, etc., differently
+        self.f_is_generator = (inspect.isgeneratorfunction(f)
+                               or inspect.isasyncgenfunction(f))
+        # so that call chains can name f by its frames' code
+        if hasattr(f, '__code__'):
+            self._prefixed_names_by_code[f.__code__] = prefixed_fname
+
+        if inspect.isgeneratorfunction(f):
+            @wraps(f)
+            def f_log_calls_wrapper_(*args, **kwargs):
+                """Wrapper around the generator function f: a generator that
+                delegates to f's (values sent, exceptions thrown and close()
+                are passed on). The call is logged when it's first advanced,
+                and completes when f's generator is exhausted or closed.
+                Its elapsed time is the time spent in f's generator, over all
+                resumptions; its retval, what that generator returned.
+                Items yielded and the time until the first (from the start
+                of the call) are recorded too."""
+                call = self._begin_call(prefixed_fname, args, kwargs)
+                if not call:
+                    return (yield from f(*args, **kwargs))
+
+                # Pushed again around each resumption of f's generator,
+                # so that the consumer of items doesn't run "inside" f.
+                self._active_calls.reset(call.stack_token)
+                active_calls = self._active_calls
+                clock_ns = self._clock_ns
+                timestamp = time.time()
+                t_call = clock_ns()
+                gen = f(*args, **kwargs)
+                elapsed_ns = items = 0
+                first_item_ns = retval = None
+                value = exc = None
+                try:
+                    while True:
+                        token = active_calls.set(call.active)
+                        t0 = clock_ns()
+                        try:
+                            item = gen.send(value) if exc is None else gen.throw(exc)
+                        except StopIteration as e:
+                            retval = e.value
+                            break
+                        finally:
+                            t1 = clock_ns()
+                            elapsed_ns += t1 - t0
+                            active_calls.reset(token)
+                        items += 1
+                        if first_item_ns is None:
+                            first_item_ns = t1 - t_call
+                        try:
+                            value, exc = (yield item), None
+                        except GeneratorExit:
+                            gen.close()
+                            break
+                        except BaseException as e:
+                            value, exc = None, e
+                finally:
+                    call.active.frame = None
+
+                self._post_call(call, retval, elapsed_ns, timestamp,
+                                items, first_item_ns)
+                return retval
+
+        elif inspect.isasyncgenfunction(f):
+            @wraps(f)
+            async def f_log_calls_wrapper_(*args, **kwargs):
+                """Wrapper around the async generator function f: an async
+                generator that delegates to f's (asend, athrow, aclose), and
+                is logged and recorded like the wrapper of a generator function.
+                Elapsed time includes time f's generator spends awaiting."""
+                call = self._begin_call(prefixed_fname, args, kwargs)
+                agen = f(*args, **kwargs)
+                value = exc = None
+                if not call:
+                    # Just delegate, as `yield from` would
+                    while True:
+                        try:
+                            if exc is None:
+                                item = await agen.asend(value)
+                            else:
+                                item = await agen.athrow(exc)
+                        except StopAsyncIteration:
+                            return
+                        try:
+                            value, exc = (yield item), None
+                        except GeneratorExit:
+                            await agen.aclose()
+                            return
+                        except BaseException as e:
+                            value, exc = None, e
+
+                self._active_calls.reset(call.stack_token)
+                active_calls = self._active_calls
+                clock_ns = self._clock_ns
+                timestamp = time.time()
+                t_call = clock_ns()
+                elapsed_ns = items = 0
+                first_item_ns = None
+                try:
+                    while True:
+                        token = active_calls.set(call.active)
+                        t0 = clock_ns()
+                        try:
+                            if exc is None:
+                                item = await agen.asend(value)
+                            else:
+                                item = await agen.athrow(exc)
+                        except StopAsyncIteration:
+                            break
+                        finally:
+                            t1 = clock_ns()
+                            elapsed_ns += t1 - t0
+                            active_calls.reset(token)
+                        items += 1
+                        if first_item_ns is None:
+                            first_item_ns = t1 - t_call
+                        try:
+                            value, exc = (yield item), None
+                        except GeneratorExit:
+                            await agen.aclose()
+                            break
+                        except BaseException as e:
+                            value, exc = None, e
+                finally:
+                    call.active.frame = None
+
+                self._post_call(call, None, elapsed_ns, timestamp, items, first_item_ns)
+
+        elif inspect.iscoroutinefunction(f):
+            @wraps(f)
+            async def f_log_calls_wrapper_(*args, **kwargs):
+                """Wrapper around the coroutine function f. Everything
+                happens when the coroutine it returns runs: the call is
+                logged from the awaiting task, and timed until f's
+                coroutine finishes, so elapsed time includes time spent
+                suspended, and retval is what awaiting f gives.
+                Call chains and indentation are per task (the stack of
+                active calls is in a context variable)."""
+                call = self._begin_call(prefixed_fname, args, kwargs)
+                if not call:
+                    return await f(*args, **kwargs)
+
+                clock_ns = self._clock_ns
+                try:
+                    timestamp = time.time()
+                    t0 = clock_ns()
+                    retval = await f(*args, **kwargs)
+                    elapsed_ns = clock_ns() - t0
+                finally:
+                    self._active_calls.reset(call.stack_token)
+                    call.active.frame = None
+
+                self._post_call(call, retval, elapsed_ns, timestamp)
+                return retval
+        else:
+            @wraps(f)
+            def f_log_calls_wrapper_(*args, **kwargs):
+                """Wrapper around the wrapped function f.
+                When this runs, f has been called, so we can now resolve
+                any indirect values for the settings/keyword-params
+                of log_calls, using info in kwargs and self.f_params."""
+                # *** Part of the DecoSettingsMapping "API" --
+                #     (4) using self._settings_mapping.resolve_all in wrapper
+                # [[[ This/these is/are 4th chronologically ]]]
+
+                # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+                # if nothing to do, hurry up & don't do it
+                # (see _begin_call).
+                # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+                call = self._begin_call(prefixed_fname, args, kwargs)
+                if not call:
+                    return f(*args, **kwargs)
+
+                # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+                # Call f(*args, **kwargs) and get its retval; time it.
+                # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+                # No dictionary overhead between timer start & stop.
+                # Wall-clock time of the call, for the record;
+                # elapsed time, in ns, from the (monotonic) clock.
+                clock_ns = self._clock_ns
+                try:
+                    timestamp = time.time()
+                    t0 = clock_ns()
+                    retval = f(*args, **kwargs)
+                    elapsed_ns = clock_ns() - t0
+                finally:
+                    self._active_calls.reset(call.stack_token)
+                    call.active.frame = None
+
+                self._post_call(call, retval, elapsed_ns, timestamp)
+                return retval
+
+        # Add a sentinel as an attribute to f_log_calls_wrapper_
+        # so we can in theory chase back to any previous log_calls-decorated fn
+        setattr(
+            f_log_calls_wrapper_,
+            self._sentinels['SENTINEL_ATTR'],
+            self._sentinels['SENTINEL_VAR']
+        )
+        # Add prefixed name of f as an attribute
+        setattr(
+            f,      # revert to f, after trying f_log_calls_wrapper_
+            self._sentinels['PREFIXED_NAME'],
+            prefixed_fname
+        )
+        # LATE ADDITION: A back-pointer
+        setattr(
+            f,
+            self._sentinels['WRAPPER_FN_OBJ'],
+            f_log_calls_wrapper_
+        )
+        setattr(
+            f_log_calls_wrapper_,
+            'stats',
+            self._stats
+        )
 
-        @wraps(f)
-        def f_log_calls_wrapper_(*args, **kwargs):
-            """Wrapper around the wrapped function f.
-            When this runs, f has been called, so we can now resolve
-            any indirect values for the settings/keyword-params
-            of log_calls, using info in kwargs and self.f_params."""
-            # *** Part of the DecoSettingsMapping "API" --
-            #     (4) using self._settings_mapping.get_final_value in wrapper
-            # [[[ This/these is/are 4th chronologically ]]]
-
-            # inner/local fn -- save a few cycles and character -
-            # we call this a lot (<= 9x).
-            def _get_final_value(setting_name):
-                "Use outer scope's kwargs and self.f_params"
-                return self._settings_mapping.get_final_value(
-                    setting_name, kwargs, fparams=self.f_params)
+        setattr(
+            f_log_calls_wrapper_,
+            self.__class__.__name__ + '_settings',
+            self._settings_mapping
+        )
 
-            # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-            # if nothing to do, hurry up & don't do it.
-            # NOTE: call_chain_to_next_log_calls_fn looks in stack frames
-            # to find these next 4 _xxx variables (really!)
-            # They must be set before calling f.
-            # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-            _do_it = _get_final_value('enabled')
-            # Bump call counters, before calling fn.
-            # Note: elapsed_secs not reflected yet of course
-            self._add_call(logged=_do_it)
-
-            _log_call_numbers = _get_final_value('log_call_numbers')
-            # counters just got bumped
-            _active_call_number = (self._stats.num_calls_logged
-                                   if _log_call_numbers else
-                                   0)
+        # For decorated_functions (weakly: the wrapper refers to self)
+        self._wrapper_ref = weakref.ref(f_log_calls_wrapper_)
+        _deco_base._decorated.add(self)
+        return f_log_calls_wrapper_
+
+    @classmethod
+    def get_logging_fn(cls, _get_final_value_fn) -> tuple:
+        return print, True
+
+    @staticmethod
+    def _write_msgs(logging_fn, can_indent, global_indent, msgs):
+        """Write msgs, indented by global_indent, using logging_fn.
+        If can_indent, logging_fn writes lines to a stream or sink,
+        so write all of msgs with one call; otherwise (a logger),
+        each message should be a record of its own."""
+        if can_indent:
+            logging_fn(prefix_multiline_str(global_indent, '\n'.join(msgs)))
+        else:
+            for msg in msgs:
+                logging_fn(msg)
+
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    # What the wrappers made by __call__ do for a logged call,
+    # before and after calling f
+    # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+    def _begin_call(self, prefixed_fname, args, kwargs):
+        """What a wrapper does first, on every call: count the call (in
+        this thread's shard), and decide whether to log it -- whether it's
+        enabled, and, if there's an overhead budget, whether the sampler
+        admits it. If so, return the _LoggedCall from _pre_call; if not,
+        None, having done nothing else: a disabled call costs one settings
+        lookup and a counter bump -- it neither resolves the other settings,
+        nor looks at the call stack, nor pushes onto it.
+        For a logged call, all final values come from one pass over
+        the indirect settings (none at all, if every setting is direct)."""
+        settings = self._settings_mapping
+        # Bump call counters (this thread's), before calling fn.
+        # Note: elapsed_secs not reflected yet of course
+        shard = self._shards.shard()
+        shard.num_calls_total += 1
+        if not settings.get_final_value('enabled', kwargs, fparams=self.f_params):
+            return None
+        # With an overhead budget, log only the calls the sampler admits;
+        # time what logging those costs, from here, to adjust its rate.
+        # (overhead_budget is never indirect.)
+        budget = settings._get_tagged_value('overhead_budget')[1]
+        t_start = self._clock_ns() if budget else None
+        sample_rate = 1.0
+        if budget:
+            sample_rate = self._overhead_sampler.rate
+            if not self._overhead_sampler.admit():
+                return None
+        final_settings = settings.resolve_all(kwargs, fparams=self.f_params)
+        return self._pre_call(prefixed_fname, final_settings, shard, args, kwargs,
+                              budget, t_start, sample_rate)
+
+    def _pre_call(self, prefixed_fname, final_settings, shard, args, kwargs,
+                  budget, t_start, sample_rate):
+        """Called by _begin_call (only), for a logged call, just before
+        the wrapper calls f: count the call, get its call chain, call the
+        pre-call handlers and write their messages, and push the call onto
+        the stack of active calls. Return a _LoggedCall, for _post_call."""
+        shard.num_calls_logged += 1
+        call_num = next(self._call_numbers)
+
+        log_call_numbers = final_settings['log_call_numbers']
+        call_number_str = ((' [%d]' % call_num)
+                           if log_call_numbers else '')
+        output_fname = prefixed_fname + call_number_str
+
+        # Get logging function IF ANY.
+        # Subclass can return None to suppress printed/logged output,
+        # as log_calls does if its logger wouldn't emit the messages.
+        # "can_indent" - in log_calls, True iff logging_fn does NOT use a Logger.
+        logging_fn, can_indent = self.get_logging_fn(final_settings.__getitem__)
+
+        # Whether the call will be recorded, as far as history_sample
+        # can tell now: if not, it makes no record (or call chain for one).
+        recorded = self._history_sampler.admit_call(call_num)
+
+        # Only handlers that can be enabled, as per the current settings;
+        # if no messages will be written, only those that don't write any;
+        # if the call won't be recorded, not the one that records it.
+        pre_call_plan, post_call_plan = self._get_call_plan(not logging_fn, recorded)
+        build_context = pre_call_plan or post_call_plan
+
+        if build_context:
             # Get list of callers up to & including first log_call's-deco'd fn
             # (or just caller, if no such fn)
             call_list, prev_indent_level = self.call_chain_to_next_log_calls_fn()
-
-            # Bump _extra_indent_level if last fn on call_list is deco'd AND enabled,
-            # o/w it's the _extra_indent_level which that fn 'inherited'.
-            # _extra_indent_level: prev_indent_level, or prev_indent_level + 1
-            do_indent = _get_final_value('indent')
-            _extra_indent_level = (prev_indent_level +
-                                   int(not not do_indent and not not _do_it))
-            # (_xxx variables set, ok to call f)
-            if not _do_it:
-                return f(*args, **kwargs)
-
+        else:
+            # Nothing to write or record: no call chain, context, or
+            # formatting, just the bookkeeping (the active call stack,
+            # elapsed time)
+            active = self._active_calls.get()
+            prev_indent_level = active.indent_level if active else -1
+
+        # Bump extra_indent_level if the fn is to be indented,
+        # o/w it's the extra_indent_level which this fn 'inherited'
+        # from the nearest enabled deco'd fn on the call chain.
+        # extra_indent_level: prev_indent_level, or prev_indent_level + 1
+        do_indent = final_settings['indent']
+        extra_indent_level = prev_indent_level + int(not not do_indent)
+
+        context = global_indent = None
+        if build_context:
             # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
             # Set up context, for pre-call handlers
             # (after calling f, add to it for post-call handlers)
@@ -579,8 +1414,11 @@ class _deco_base():
             context = {
                 'decorator': self,
                 'settings': self._settings_mapping,    # can use settings.deco_instance :|
+                'final_settings': final_settings,      # settings' final values for this call
                 'stats': self._stats,
                 'prefixed_fname': prefixed_fname,
+                'output_fname': output_fname,
+                'call_num': call_num,
                 'fparams': self.f_params,
                 'call_list': call_list,
                 'args': args,
@@ -591,218 +1429,162 @@ class _deco_base():
             indent = " " * 4
             context['indent'] = indent
 
-            # Get logging function IF ANY.
-            # Subclass can return None to suppress printed/logged output.
-            # "can_indent" - in log_calls, True iff logging_fn does NOT use a Logger.
-            logging_fn, can_indent = self.get_logging_fn(_get_final_value)
-
             # Only do global indentation for print, not for loggers
-            global_indent = ((_extra_indent_level * indent)
+            global_indent = ((extra_indent_level * indent)
                              * int(can_indent)
                             )
 
-            call_number_str = ((' [%d]' % _active_call_number)
-                               if _log_call_numbers else '')
-            context['output_fname'] = prefixed_fname + call_number_str
-
             # Gather all the things we need (for log output, & for history)
-            # Use inspect module's Signature.bind method.
-            # bound_args.arguments -- contains only explicitly bound arguments
-            bound_args = inspect.signature(f).bind(*args, **kwargs)
-            varargs_pos = get_args_pos(self.f_params)   # -1 if no *args in signature
-            argcount = varargs_pos if varargs_pos >= 0 else len(args)
-            context['argcount'] = argcount
-            # The first argcount-many things in bound_args
-            context['argnames'] = list(bound_args.arguments)[:argcount]
-            context['argvals'] = args[:argcount]
-
-            context['varargs'] = args[argcount:]
-            (context['varargs_name'],
-             context['kwargs_name']) = get_args_kwargs_param_names(self.f_params)
-
-            context['defaulted_kwargs'] = OrderedDict(
-                [(param.name, param.default) for param in self.f_params.values()
-                 if param.name not in bound_args.arguments
-                 and param.default != inspect._empty
-                ]
-            )
-            context['explicit_kwargs'] = OrderedDict(
-                [(k, kwargs[k]) for k in self.f_params
-                 if k in bound_args.arguments and k in kwargs]
-            )
-            context['implicit_kwargs'] = {
-                k: kwargs[k] for k in kwargs if k not in context['explicit_kwargs']
-            }
+            # The layout of f's parameters was worked out once, in __call__.
+            layout = self.f_param_layout
+            context['param_layout'] = layout
+            (context['argcount'],
+             context['argnames'],
+             context['argvals'],
+             context['varargs'],
+             context['explicit_kwargs'],
+             context['defaulted_kwargs'],
+             context['implicit_kwargs']) = layout.classify(args, kwargs)
+            context['varargs_name'] = layout.varargs_name
+            context['kwargs_name'] = layout.kwargs_name
 
             # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
             # Call pre-call handlers, collect nonempty return values
             # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
             pre_msgs = []
-            for setting_name in self._settings_mapping._pre_call_handlers:  # keys
-                if _get_final_value(setting_name):
-                    info = self._settings_mapping._get_DecoSetting(setting_name)
-                    msg = info.pre_call_handler(context)
+            for setting_name, handler, indirect in pre_call_plan:
+                if not indirect or final_settings[setting_name]:
+                    msg = handler(context)
                     if msg:
                         pre_msgs.append(msg)
 
             # Write pre-call messages
-            if logging_fn:
-                for msg in pre_msgs:
-                    logging_fn(prefix_multiline_str(global_indent, msg))
-
-            # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-            # Call f(*args, **kwargs) and get its retval; time it.
-            # Add timestamp, elapsed time and retval to context.
-            # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-            # No dictionary overhead between timer start & stop.
-            t0 = time.time()
-            retval = f(*args, **kwargs)
-            context['elapsed_secs'] = (time.time() - t0)
+            if logging_fn and pre_msgs:
+                self._write_msgs(logging_fn, can_indent, global_indent, pre_msgs)
+
+        # This call is now the innermost active one, for callees.
+        # Its frame is the wrapper's, which calls (or awaits) f.
+        active = _ActiveCall(_getframe(2) if _getframe else None,
+                             output_fname,
+                             extra_indent_level,
+                             self._active_calls.get())
+        stack_token = self._active_calls.set(active)
+        return _LoggedCall(call_num, final_settings, active, stack_token, context,
+                           logging_fn, can_indent, global_indent, post_call_plan,
+                           budget, t_start, sample_rate)
+
+    def _post_call(self, call, retval, elapsed_ns, timestamp,
+                   items_yielded=None, first_item_ns=None):
+        """Called by a wrapper (only), after f returns, with the _LoggedCall
+        from _begin_call: accumulate elapsed time and retval, and call the
+        post-call handlers (with timestamp, elapsed time and retval added
+        to the context) and write their messages.
+        For a generator function, also items_yielded, and first_item_ns,
+        the time until the first was (None if there wasn't one).
+        With an overhead budget, lastly tell the sampler what logging
+        the call cost (except for generators, sampled at the current rate).
+        The stats go to the shard of the thread that finishes the call --
+        a generator may be resumed, and finish, in another thread than
+        the one that started it."""
+        shard = self._shards.shard()
+        final_settings = call.final_settings
+        shard.add_elapsed(elapsed_ns, call.call_num, call.sample_rate)
+        if final_settings['record_retval_stats'] and type(retval) in _numeric_types:
+            try:
+                finite = math.isfinite(retval)
+            except OverflowError:       # an int too big for a float
+                finite = False
+            if finite:
+                shard.retval_stats.add(retval)
+        first_item_secs = None
+        if items_yielded is not None:
+            shard.items_yielded += items_yielded
+            if first_item_ns is not None:
+                first_item_secs = first_item_ns / 1e9
+                shard.first_item_stats.add(first_item_secs)
+
+        context = call.context
+        if context is not None:
+            context['elapsed_ns'] = elapsed_ns
+            context['elapsed_secs'] = elapsed_ns / 1e9
             context['retval'] = retval
-            context['timestamp'] = t0
-
-            self._add_to_elapsed(context['elapsed_secs'])
+            context['timestamp'] = timestamp
+            if items_yielded is not None:
+                context['items_yielded'] = items_yielded
+                context['first_item_secs'] = first_item_secs
 
             # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
             # Call post-call handlers, collect nonempty return values
             # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
             post_msgs = []
-            for setting_name in self._settings_mapping._post_call_handlers:  # keys
-                if _get_final_value(setting_name):
-                    info = self._settings_mapping._get_DecoSetting(setting_name)
-                    msg = info.post_call_handler(context)
+            for setting_name, handler, indirect in call.post_call_plan:
+                if not indirect or final_settings[setting_name]:
+                    msg = handler(context)
                     if msg:
                         post_msgs.append(msg)
 
             # Write post-call messages
-            if logging_fn:
-                for msg in post_msgs:
-                    logging_fn(prefix_multiline_str(global_indent, msg))
-
-            return retval
-
-        # Add a sentinel as an attribute to f_log_calls_wrapper_
-        # so we can in theory chase back to any previous log_calls-decorated fn
-        setattr(
-            f_log_calls_wrapper_,
-            self._sentinels['SENTINEL_ATTR'],
-            self._sentinels['SENTINEL_VAR']
-        )
-        # Add prefixed name of f as an attribute
-        setattr(
-            f,      # revert to f, after trying f_log_calls_wrapper_
-            self._sentinels['PREFIXED_NAME'],
-            prefixed_fname
-        )
-        # LATE ADDITION: A back-pointer
-        setattr(
-            f,
-            self._sentinels['WRAPPER_FN_OBJ'],
-            f_log_calls_wrapper_
-        )
-        setattr(
-            f_log_calls_wrapper_,
-            'stats',
-            self._stats
-        )
-
-        setattr(
-            f_log_calls_wrapper_,
-            self.__class__.__name__ + '_settings',
-            self._settings_mapping
-        )
-
-        return f_log_calls_wrapper_
+            if call.logging_fn and post_msgs:
+                self._write_msgs(call.logging_fn, call.can_indent, call.global_indent,
+                                 post_msgs)
 
-    @classmethod
-    def get_logging_fn(cls, _get_final_value_fn) -> tuple:
-        return print, True
+        if call.budget and items_yielded is None:
+            self._overhead_sampler.update(
+                call.budget, elapsed_ns, self._clock_ns() - call.t_start - elapsed_ns)
 
     @classmethod
     def call_chain_to_next_log_calls_fn(cls):
-        """Return list of callers (names) on the call chain
-        from caller of caller to first log_calls-deco'd function inclusive,
-        if any.  If there's no log_calls-deco'd function on the stack,
-        or anyway if none are discernible, return [caller_of_caller]."""
-        curr_frame = sys._getframe(2)   # caller-of-caller's frame
+        """Return pair (call_list, prev_indent_level):
+        call_list is the list of callers (names) on the call chain
+        from caller of caller to first enabled log_calls-deco'd function
+        inclusive, if any; prev_indent_level is the indent level of that
+        function, or -1. If there's no enabled log_calls-deco'd function
+        active, return [caller_of_caller], -1.
+
+        The enabled deco'd function, its (numbered) name and indent level
+        come from the stack of active calls, in O(1). Frames are used only
+        to name the functions called in between, which are read from code
+        objects only; if sys._getframe isn't available, those are omitted.
+        """
+        active = cls._active_calls.get()
+        if not _getframe:
+            return ([active.name] if active else ['?'],
+                    active.indent_level if active else -1)
+
+        curr_frame = _getframe(4)   # caller of the wrapper that called _begin_call
+        if not active:
+            return [_task_name(curr_frame) or curr_frame.f_code.co_name], -1
 
         call_list = []
-        prev_indent_level = -1
-
-        found = False
-        found_enabled = False
-        hit_bottom = False      # break both loops: reached <module>
-        while not found_enabled and not hit_bottom:
-            while 1:    # until found a deco'd fn or <module> reached
-                curr_funcname = curr_frame.f_code.co_name
-                if curr_funcname == 'f_log_calls_wrapper_':
-                    # Previous was decorated inner fn; don't add 'f_log_calls_wrapper_'
-                    # print("**** found f_log_calls_wrapper_, prev fn name =", call_list[-1])     # <<<DEBUG>>>
-                    # Fixup: get prefixed named of wrapped function
-                    inner_fn = curr_frame.f_locals['f']
-                    call_list[-1] = getattr(inner_fn,
-                                            cls._sentinels['PREFIXED_NAME'])
-                    wrapper_frame = curr_frame
-                    found = True
-                    break   # inner loop
-
-                call_list.append(curr_funcname)
-
-                if curr_funcname == '<module>':
-                    hit_bottom = True
-                    break   # inner loop
-
-                globs = curr_frame.f_back.f_globals
-                curr_fn = None
-                if curr_funcname in globs:
-                    wrapper_frame = curr_frame.f_back
-                    curr_fn = globs[curr_funcname]
-                # If curr_funcname is a decorated inner function,
-                # then it's not in globs. If it's called from outside
-                # it's enclosing function, it's caller is 'f_log_calls_wrapper_'
-                # so we'll see that on next iteration.
-                else:
-                    try:
-                        # if it's a decorated inner function that's called
-                        # by its enclosing function, detect that:
-                        locls = curr_frame.f_back.f_back.f_locals
-                    except AttributeError:  # "never happens"
-                        # print("**** %s not found (inner fn?)" % curr_funcname)       # <<<DEBUG>>>
-                        pass
-                    else:
-                        wrapper_frame = curr_frame.f_back
-                        if curr_funcname in locls:
-                            curr_fn = locls[curr_funcname]
-                            #   print("**** %s found in locls = curr_frame.f_back.f_back.f_locals, "
-                            #         "curr_frame.f_back.f_back.f_code.co_name = %s"
-                            #         % (curr_funcname, curr_frame.f_back.f_back.f_locals)) # <<<DEBUG>>>
-                if hasattr(curr_fn, cls._sentinels['SENTINEL_ATTR']):
-                    found = True
-                    break   # inner loop
-                curr_frame = curr_frame.f_back
-
-            # If found, then call_list[-1] is log_calls-wrapped
-            if found:
-                # look in stack frame (!) for
-                #   _do_it, _log_call_numbers, _active_call_number
-                enabled = wrapper_frame.f_locals['_do_it']
-                log_call_numbers = wrapper_frame.f_locals['_log_call_numbers']
-                active_call_number = wrapper_frame.f_locals['_active_call_number']
-                # only change prev_indent_level once, for nearest deco'd fn
-                if prev_indent_level < 0:
-                    prev_indent_level = wrapper_frame.f_locals['_extra_indent_level']
-                if enabled and log_call_numbers:
-                    call_list[-1] += " [" + str(active_call_number) + "]"
-                found_enabled = enabled     # done with outer loop too if enabled
-                if not enabled:
-                    curr_frame = curr_frame.f_back
-            else:   # not found
-                # if not found, truncate call_list to first element.
-                hit_bottom = True
-
-        if hit_bottom:
-            call_list = call_list[:1]
-        return call_list, prev_indent_level
+        stop_frame = active.frame
+        prev_code = None
+        while curr_frame is not None and curr_frame is not stop_frame:
+            task_name = _task_name(curr_frame)
+            if task_name:
+                # The bottom of an asyncio task's stack
+                call_list.append(task_name)
+                break
+            if stop_frame is not None and curr_frame.f_back is stop_frame:
+                # curr_frame is that of the active deco'd fn itself
+                break
+            curr_code = curr_frame.f_code
+            if curr_code.co_name == 'f_log_calls_wrapper_':
+                # Wrapper of a disabled deco'd fn (or of one deco'd by
+                # another deco class); previous fn was the decorated one,
+                # so use its prefixed name. Don't add 'f_log_calls_wrapper_'
+                if call_list:
+                    call_list[-1] = cls._prefixed_names_by_code.get(
+                                        prev_code, call_list[-1])
+            else:
+                call_list.append(curr_code.co_name)
+            prev_code = curr_code
+            curr_frame = curr_frame.f_back
+
+        # If curr_frame is None, or is the event loop's, active's frame
+        # isn't on this stack (e.g. we're in a task it spawned, maybe
+        # after it ended); the chain ends with it anyway.
+        call_list.append(active.name)
+        return call_list, active.indent_level
 
 
 class log_calls(_deco_base):
@@ -815,9 +1597,11 @@ class log_calls(_deco_base):
     "logs" means: prints to stdout, or, optionally, to a logger.
 
     The decorator takes various keyword arguments, all with sensible defaults.
-    Every parameter except prefix and max_history can take two kinds of values,
-    direct and indirect. Briefly, if the value of any of those parameters
-    is a string that ends in in '=', then it's treated as the name of a keyword
+    Every parameter except prefix, max_history, history_spill_file,
+    history_sample and overhead_budget can take two kinds of values,
+    direct and indirect.
+    Briefly, if the value of any of
+    those parameters is a string that ends in in '=', then it's treated as the name of a keyword
     arg of the wrapped function, and its value when that function is called is
     the final, indirect value of the decorator's parameter (for that call).
     See deco_settings.py docstring for details.
@@ -850,7 +1634,8 @@ class log_calls(_deco_base):
                            (if log_retval) and on exit (if log_exit). (Default: '')
         file:              If `logger` is `None`, a stream (an instance of type `io.TextIOBase`)
                            to which `log_calls` will print its messages. This value is
-                           supplied to the `file` keyword parameter of the `print` function.
+                           supplied to the `file` keyword parameter of the `print` function,
+                           unless it's a sink (sinks.LogSink), which is given whole messages.
                            (Default: sys.stdout)
         logger:            If not None (the default), a Logger which will be used
                            (instead of the print function) to write all messages.
@@ -863,11 +1648,33 @@ class log_calls(_deco_base):
         max_history:       An int. value >  0 --> store at most value-many records,
                                                   oldest records overwritten;
                                    value <= 0 --> unboundedly many records are stored.
+        history_spill_file: None, or a path. If max_history > 0, records pushed out
+                           of memory are appended to this file (JSON Lines) rather
+                           than discarded, and remain part of the history. Records
+                           already in the file (e.g. from an earlier run) are kept,
+                           but aren't part of it; clear_history truncates the file.
+                           (Default: None)
+        history_sample:    Which logged calls to record: None, 0 or 1 --> all of them;
+                           an int n > 1 --> every n-th; a float p < 1 --> each with
+                           probability p; 'reservoir' --> a uniform random sample of
+                           max_history records of all calls. Call counts and elapsed
+                           time are still for all logged calls. (Default: None)
+        overhead_budget:   None, or a float: the fraction of the function's own time
+                           that logging (and recording) it may add, e.g. 0.01. Calls
+                           are then logged at a rate adapted to keep within that,
+                           stats.sample_rate; the rest are only counted, in
+                           num_calls_total. Other stats and history are of logged
+                           calls; stats.elapsed_secs_estimated reweights their elapsed
+                           time by 1/sample_rate, for all calls. (Default: None)
+        record_retval_stats: If true, keep stats.retval_stats, a running summary of
+                           the return values of logged calls that are ints or floats.
+                           (Default: False)
     """
     # *** DecoSettingsMapping "API" --
     # (1) initialize: call register_class_settings
 
-    # allow indirection for all except prefix and max_history, which also isn't mutable
+    # allow indirection for all except prefix, max_history, history_spill_file,
+    # history_sample and overhead_budget; the *history* ones also aren't mutable
     _setting_info_list = (
         DecoSettingEnabled('enabled'),
         DecoSetting('args_sep',         str,            ', ',          allow_falsy=False),
@@ -883,6 +1690,10 @@ class log_calls(_deco_base):
         DecoSetting('loglevel',         int,            logging.DEBUG, allow_falsy=False),
         DecoSettingHistory('record_history'),
         DecoSetting('max_history',      int,            0,             allow_falsy=True, allow_indirect=False, mutable=False),
+        DecoSetting('history_spill_file', str,          None,          allow_falsy=True, allow_indirect=False, mutable=False),
+        DecoSetting('history_sample',   object,         None,          allow_falsy=True, allow_indirect=False, mutable=False),
+        DecoSetting('overhead_budget',  float,          None,          allow_falsy=True, allow_indirect=False),
+        DecoSetting('record_retval_stats', bool,        False,         allow_falsy=True),
     )
     DecoSettingsMapping.register_class_settings('log_calls',    # name of this class. DRY - oh well.
                                                 _setting_info_list)
@@ -902,6 +1713,10 @@ class log_calls(_deco_base):
                  loglevel=logging.DEBUG,
                  record_history=False,
                  max_history=0,
+                 history_spill_file=None,
+                 history_sample=None,
+                 overhead_budget=None,
+                 record_retval_stats=False,
     ):
         """(See class docstring)"""
         super().__init__(enabled=enabled,
@@ -918,11 +1733,16 @@ class log_calls(_deco_base):
                          loglevel=loglevel,
                          record_history=record_history,
                          max_history=max_history,
+                         history_spill_file=history_spill_file,
+                         history_sample=history_sample,
+                         overhead_budget=overhead_budget,
+                         record_retval_stats=record_retval_stats,
         )
 
     @classmethod
     def get_logging_fn(cls, _get_final_value_fn) -> tuple:
         """Return pair: logging_fn or None, paired with can_indent: bool.
+        logging_fn is None if the logger wouldn't emit messages at loglevel.
         cls: unused. Present so this method can be overridden."""
         outfile = _get_final_value_fn('file')
         if not outfile:
@@ -931,8 +1751,15 @@ class log_calls(_deco_base):
         logger = _get_final_value_fn('logger')
         loglevel = _get_final_value_fn('loglevel')
         # Establish logging function
-        logging_fn = (partial(logger.log, loglevel)
-                      if logger else
-                      lambda *pargs, **pkwargs: print(*pargs, file=outfile, flush=True, **pkwargs))
+        if logger:
+            if not logger_will_emit(logger, loglevel):
+                # Don't bother making messages that would be discarded
+                return None, False
+            logging_fn = partial(logger.log, loglevel)
+        elif isinstance(outfile, LogSink):
+            # A sink takes whole messages, and does its own flushing
+            logging_fn = outfile.write_message
+        else:
+            logging_fn = lambda *pargs, **pkwargs: print(*pargs, file=outfile, flush=True, **pkwargs)
         # Global indentation only for print, not for loggers
         return logging_fn, not logger
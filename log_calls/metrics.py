@@ -0,0 +1,253 @@
+__author__ = "Brian O'Neill"  # BTO
+__version__ = '0.2.2'
+__doc__ = """
+Fixed-memory aggregates of the calls to a decorated function, updated on
+every logged call, without history.
+
+LatencyHistogram: counts of elapsed times (in ns) in log-linear buckets,
+as in HdrHistogram: values below 2**precision each get a bucket; above
+that, each power of 2 is split into 2**(precision-1) equal buckets, so a
+bucket's width is at most 1/2**(precision-1) of its values. Percentiles
+come from the counts. Histograms merge, and serialize to bytes.
+
+RunningStats: count, min, max, mean, variance and last value of a stream
+of numbers, updated in O(1) per value (Welford's method).
+"""
+from array import array
+from itertools import repeat
+import math
+import struct
+
+__all__ = ['LatencyHistogram', 'RunningStats']
+
+
+class LatencyHistogram():
+    """Histogram of latencies, in ns. (See module docstring.)
+
+    >>> h = LatencyHistogram(precision=3)
+    >>> for ns in (1, 2, 3, 10, 100, 1000):
+    ...     h.record(ns)
+    >>> h.count, h.min_ns, h.max_ns
+    (6, 1, 1000)
+    >>> [h.percentile(q) for q in (0, 50, 80, 100)]
+    [1, 3, 111, 1000]
+    >>> list(h.buckets())[-2:]
+    [(96, 112, 1), (896, 1024, 1)]
+
+    Values in the same bucket are indistinguishable; a percentile
+    is the largest value in its bucket (but never more than max_ns).
+    """
+    _header = struct.Struct('<4sBQQQI')     # magic, precision, count, min, max, #buckets
+    _bucket = struct.Struct('<IQ')          # index, count
+    _magic = b'LCLH'
+
+    def __init__(self, precision=7):
+        if not 1 <= precision <= 16:
+            raise ValueError("precision must be between 1 and 16")
+        self.precision = precision
+        self._linear = 1 << precision       # values below this: exact
+        self._half = self._linear >> 1      # buckets per power of 2 above that
+        self.counts = array('Q')            # grows to the largest index used
+        self.count = 0
+        self.min_ns = None
+        self.max_ns = 0
+
+    def _index(self, ns):
+        if ns < self._linear:
+            return ns
+        e = ns.bit_length() - self.precision
+        return self._linear + (e - 1) * self._half + ((ns >> e) - self._half)
+
+    def _bounds(self, index):
+        """(lowest value, highest value + 1) of bucket index"""
+        if index < self._linear:
+            return index, index + 1
+        e, m = divmod(index - self._linear, self._half)
+        e += 1
+        m += self._half
+        return m << e, (m + 1) << e
+
+    def record(self, ns):
+        if ns < 0:
+            ns = 0
+        i = self._index(ns)
+        counts = self.counts
+        if i >= len(counts):
+            counts.extend(repeat(0, i + 1 - len(counts)))
+        counts[i] += 1
+        self.count += 1
+        if self.min_ns is None or ns < self.min_ns:
+            self.min_ns = ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def percentile(self, q):
+        """Latency, in ns, at or below which q percent of the recorded
+        latencies fall (0 <= q <= 100); None if nothing's been recorded."""
+        if not 0 <= q <= 100:
+            raise ValueError("q must be between 0 and 100")
+        if not self.count:
+            return None
+        if q == 0:
+            return self.min_ns
+        rank = math.ceil(q / 100 * self.count)
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return max(self.min_ns, min(self._bounds(i)[1] - 1, self.max_ns))
+        return self.max_ns
+
+    def buckets(self):
+        """Generate triples (low, high, count) for the nonempty buckets,
+        which hold the values v with low <= v < high."""
+        for i, c in enumerate(self.counts):
+            if c:
+                low, high = self._bounds(i)
+                yield low, high, c
+
+    def merge(self, other):
+        """Add the counts of other, a LatencyHistogram with the same
+        precision, to self."""
+        if other.precision != self.precision:
+            raise ValueError("can't merge histograms of different precisions")
+        if not other.count:
+            return
+        counts = self.counts
+        if len(other.counts) > len(counts):
+            counts.extend(repeat(0, len(other.counts) - len(counts)))
+        for i, c in enumerate(other.counts):
+            if c:
+                counts[i] += c
+        self.count += other.count
+        if self.min_ns is None or other.min_ns < self.min_ns:
+            self.min_ns = other.min_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+
+    def to_bytes(self):
+        """Serialized form: a header, then (index, count) of each nonempty bucket."""
+        nonempty = [(i, c) for i, c in enumerate(self.counts) if c]
+        parts = [self._header.pack(self._magic, self.precision, self.count,
+                                   self.min_ns or 0, self.max_ns, len(nonempty))]
+        parts.extend(self._bucket.pack(i, c) for i, c in nonempty)
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, precision, count, min_ns, max_ns, n = cls._header.unpack_from(data)
+        if magic != cls._magic:
+            raise ValueError("not a serialized LatencyHistogram")
+        hist = cls(precision)
+        for k in range(n):
+            i, c = cls._bucket.unpack_from(data, cls._header.size + k * cls._bucket.size)
+            if i >= len(hist.counts):
+                hist.counts.extend(repeat(0, i + 1 - len(hist.counts)))
+            hist.counts[i] = c
+        hist.count = count
+        hist.min_ns = min_ns if count else None
+        hist.max_ns = max_ns
+        return hist
+
+    def __eq__(self, other):
+        if not isinstance(other, LatencyHistogram):
+            return NotImplemented
+        return (self.precision == other.precision
+                and self.count == other.count
+                and self.min_ns == other.min_ns
+                and self.max_ns == other.max_ns
+                and list(self.buckets()) == list(other.buckets()))
+
+    def __repr__(self):
+        return "<LatencyHistogram: %d latencies, p50=%s ns, p99=%s ns>" % (
+            self.count, self.percentile(50), self.percentile(99))
+
+
+class RunningStats():
+    """Summary statistics of a stream of numbers, without keeping them.
+    (See module docstring.)
+
+    >>> rs = RunningStats()
+    >>> for x in (2, 4, 4, 4, 5, 5, 7, 9):
+    ...     rs.add(x)
+    >>> rs.count, rs.min, rs.max, rs.mean, rs.last
+    (8, 2, 9, 5.0, 9)
+    >>> rs.variance, rs.stdev       # population variance
+    (4.0, 2.0)
+    >>> rs.sample_variance == 32 / 7
+    True
+    >>> RunningStats().mean is None
+    True
+
+    Stats of separate streams merge:
+
+    >>> rs1, rs2 = RunningStats(), RunningStats()
+    >>> for x in (2, 4, 4, 4):
+    ...     rs1.add(x)
+    >>> for x in (5, 5, 7, 9):
+    ...     rs2.add(x)
+    >>> rs1.merge(rs2)
+    >>> (rs1.count, rs1.min, rs1.max, rs1.mean, rs1.variance, rs1.last)
+    (8, 2, 9, 5.0, 4.0, 9)
+    """
+    __slots__ = ('count', 'min', 'max', 'mean', 'last', '_m2')
+
+    def __init__(self):
+        self.count = 0
+        self.min = self.max = self.mean = self.last = None
+        self._m2 = 0.0      # sum of squared deviations from the mean
+
+    def add(self, x):
+        self.count += 1
+        self.last = x
+        if self.count == 1:
+            self.min = self.max = x
+            self.mean = float(x)
+            return
+        if x < self.min:
+            self.min = x
+        elif x > self.max:
+            self.max = x
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+    def merge(self, other):
+        """Combine the stats of other, a RunningStats, into self's, as if
+        other's values had been added after self's (Chan et al.'s method)."""
+        if not other.count:
+            return
+        if not self.count:
+            self.count, self.min, self.max = other.count, other.min, other.max
+            self.mean, self.last, self._m2 = other.mean, other.last, other._m2
+            return
+        n = self.count + other.count
+        delta = other.mean - self.mean
+        self._m2 += other._m2 + delta * delta * self.count * other.count / n
+        self.mean += delta * other.count / n
+        self.count = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.last = other.last
+
+    @property
+    def variance(self):
+        """Population variance; None if count is 0."""
+        return self._m2 / self.count if self.count else None
+
+    @property
+    def sample_variance(self):
+        """Sample variance; None if count < 2."""
+        return self._m2 / (self.count - 1) if self.count > 1 else None
+
+    @property
+    def stdev(self):
+        """Population standard deviation; None if count is 0."""
+        return math.sqrt(self.variance) if self.count else None
+
+    def as_dict(self):
+        return {'count': self.count, 'min': self.min, 'max': self.max,
+                'mean': self.mean, 'variance': self.variance, 'last': self.last}
+
+    def __repr__(self):
+        return "RunningStats(%s)" % ', '.join(
+            '%s=%r' % item for item in self.as_dict().items())
@@ -8,7 +8,8 @@ from .log_calls import _deco_base, DecoSettingHistory
 class record_history(_deco_base):
     """
     """
-    # allow indirection for all except prefix and max_history, which also isn't mutable
+    # allow indirection for all except prefix, max_history, history_spill_file,
+    # history_sample and overhead_budget; the *history* ones also aren't mutable
     _setting_info_list = (
         DecoSetting('log_call_numbers', bool, False,  allow_falsy=True, visible=False),
         DecoSetting('indent',           bool, False,  allow_falsy=True, visible=False),
@@ -16,14 +17,23 @@ class record_history(_deco_base):
         DecoSettingHistory('enabled'),  # alias "record_history" in log_calls
         DecoSetting('prefix',           str,  '',     allow_falsy=True, allow_indirect=False),
         DecoSetting('max_history',      int,  0,      allow_falsy=True, mutable=False),
+        DecoSetting('history_spill_file', str, None,  allow_falsy=True, allow_indirect=False, mutable=False),
+        DecoSetting('history_sample',   object, None, allow_falsy=True, allow_indirect=False, mutable=False),
+        DecoSetting('overhead_budget',  float, None,  allow_falsy=True, allow_indirect=False),
+        DecoSetting('record_retval_stats', bool, False, allow_falsy=True),
     )
     DecoSettingsMapping.register_class_settings('record_history',    # name of this class. DRY - oh well.
                                                 _setting_info_list)
 
-    def __init__(self, enabled=True, prefix='', max_history=0):
+    def __init__(self, enabled=True, prefix='', max_history=0, history_spill_file=None,
+                 history_sample=None, overhead_budget=None, record_retval_stats=False):
         super().__init__(enabled=enabled,
                          prefix=prefix,
                          max_history=max_history,
+                         history_spill_file=history_spill_file,
+                         history_sample=history_sample,
+                         overhead_budget=overhead_budget,
+                         record_retval_stats=record_retval_stats,
                          indent=False,              # p.i.t.a. that this is here :|
                          log_call_numbers=True,     # for call chain in history record
         )
@@ -0,0 +1,123 @@
+__author__ = "Brian O'Neill"  # BTO
+__version__ = '0.2.2'
+__doc__ = """
+A profile of all decorated functions, from their stats: which ones take
+the most time, are called most, are slowest on average or in the tail.
+
+    print(log_calls.report())                       # ranked by total time
+    log_calls.report(sort_by='p99_secs', module='myapp.db', top=10)
+    log_calls.report().as_DataFrame                 # needs pandas
+
+A ProfileReport is a sequence of ReportRows, one per decorated function,
+ranked (highest first) by one of the numeric columns; str() of it is a
+text table. Only logged calls are timed, so functions that have none
+have 0 total time and None for mean and p99.
+"""
+from collections import namedtuple
+
+__all__ = ['ReportRow', 'ProfileReport']
+
+
+ReportRow = namedtuple(
+    'ReportRow',
+    (
+        'name',                 # prefixed function name
+        'module',               # the function's __module__
+        'deco',                 # name of the decorator class
+        'num_calls_total',
+        'num_calls_logged',
+        'elapsed_secs',         # total, of logged calls
+        'mean_secs',
+        'p99_secs',
+        'max_secs',
+    )
+)
+
+
+class ProfileReport(tuple):
+    """Tuple of ReportRows, ranked. (See module docstring.)"""
+    sort_keys = ('elapsed_secs', 'num_calls_total', 'num_calls_logged',
+                 'mean_secs', 'p99_secs', 'max_secs')
+
+    _text_columns = (
+        # heading, field, format of values
+        ('function', 'name', '%s'),
+        ('calls', 'num_calls_total', '%d'),
+        ('logged', 'num_calls_logged', '%d'),
+        ('total secs', 'elapsed_secs', '%.6f'),
+        ('mean secs', 'mean_secs', '%.6f'),
+        ('p99 secs', 'p99_secs', '%.6f'),
+        ('module', 'module', '%s'),
+    )
+
+    @classmethod
+    def from_decorators(cls, decorators, sort_by='elapsed_secs',
+                        prefix=None, module=None, top=None):
+        """Report on the functions decorated by decorators (_deco_base
+        instances): those whose prefixed names start with prefix, if given,
+        and that are in module or its submodules, if given; ranked by
+        sort_by, one of sort_keys, highest first (ties by name); the first
+        top of them, if top is given."""
+        if sort_by not in cls.sort_keys:
+            raise ValueError("sort_by must be one of %s, not %r"
+                             % (', '.join(cls.sort_keys), sort_by))
+        rows = []
+        for deco in decorators:
+            if deco.f is None:
+                continue
+            row = cls._row(deco)
+            if prefix is not None and not row.name.startswith(prefix):
+                continue
+            if module is not None and not (row.module == module
+                                           or row.module.startswith(module + '.')):
+                continue
+            rows.append(row)
+        rows.sort(key=lambda row: row.name)
+        # None (no logged calls) ranks last
+        rows.sort(key=lambda row: (getattr(row, sort_by) is not None,
+                                   getattr(row, sort_by) or 0),
+                  reverse=True)
+        return cls(rows[:top] if top is not None else rows)
+
+    @staticmethod
+    def _row(deco):
+        snap = deco.snapshot()
+        return ReportRow(
+            name=snap.name,
+            module=getattr(deco.f, '__module__', None) or '?',
+            deco=type(deco).__name__,
+            num_calls_total=snap.num_calls_total,
+            num_calls_logged=snap.num_calls_logged,
+            elapsed_secs=snap.elapsed_secs_logged,
+            mean_secs=snap.elapsed_stats.mean,
+            p99_secs=snap.latency_percentile(99),
+            max_secs=snap.elapsed_stats.max)
+
+    def as_text(self):
+        """The report as a table, one line per row, after a line of headings."""
+        table = [[heading for heading, _, _ in self._text_columns]]
+        for row in self:
+            table.append(['-' if getattr(row, field) is None else fmt % getattr(row, field)
+                          for _, field, fmt in self._text_columns])
+        widths = [max(len(line[i]) for line in table)
+                  for i in range(len(self._text_columns))]
+        lines = []
+        for line in table:
+            # name and module left-justified, numbers right-justified
+            cells = [cell.ljust(w) if i in (0, len(widths) - 1) else cell.rjust(w)
+                     for i, (cell, w) in enumerate(zip(line, widths))]
+            lines.append('  '.join(cells).rstrip())
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.as_text()
+
+    @property
+    def as_DataFrame(self):
+        """The report as a pandas DataFrame indexed by name, or None if
+        pandas isn't available."""
+        try:
+            import pandas as pd
+        except ImportError:
+            return None
+        return pd.DataFrame.from_records(self, columns=ReportRow._fields, index='name')
@@ -0,0 +1,262 @@
+__author__ = "Brian O'Neill"  # BTO
+__version__ = '0.2.2'
+__doc__ = """
+Per-thread shards of a decorated function's statistics, so that calls
+from many threads neither lose updates nor wait on a lock.
+
+Each thread that calls a decorated function gets its own StatsShard,
+which only that thread updates: call counts, elapsed times, the latency
+histogram, running stats, items yielded (by generators), and the
+history records it has made but that haven't yet been merged into the
+function's history. ShardedStats holds the shards of one decorated
+function, and combines them when `stats` is read. A thread's first
+call registers its shard, under a lock; after that, calls take no lock,
+except to merge history (see below). Shards of threads that have
+finished are folded into one, whenever a thread registers its shard
+or stats are read, so that a program that runs each call in a new
+thread keeps no more shards than it has live threads.
+
+A StatsSnapshot is all the shards combined, as of some moment, with
+(optionally) history; snapshots from different processes merge (see
+aggregate.py).
+
+Consistency model
+-----------------
+* No updates are lost: every call is counted, timed and recorded
+  exactly once, whatever the number of threads (and with or without
+  the GIL).
+* Reading stats doesn't stop calls in other threads. A read made while
+  other threads are in calls sees each of those calls entirely, partly
+  or not at all -- e.g. num_calls_total may already count a call whose
+  elapsed time isn't yet in elapsed_secs_logged. Values read after the
+  calls have returned (e.g. after joining the threads that made them)
+  are exact.
+* Call numbers are unique, and increase in the order calls start.
+* A thread's history records are buffered in its shard, and merged into
+  the function's history, in call number order, when history is read
+  (or written to CSV, or cleared), and whenever a thread's buffer reaches
+  `pending_limit` records. Records made in other threads after a merge
+  go in at a later merge, so a call that returns late can follow calls
+  with higher numbers. History logs, and a reservoir sample
+  (history_sample='reservoir'), see records as they're merged; other
+  sampling is decided as calls start, and unsampled calls make no record.
+"""
+from collections import deque
+import threading
+
+from .metrics import LatencyHistogram, RunningStats
+
+__all__ = ['StatsShard', 'ShardedStats', 'StatsSnapshot']
+
+
+class StatsShard():
+    """One thread's share of a decorated function's statistics.
+    Only that thread updates it (see module docstring)."""
+    __slots__ = ('thread',
+                 'num_calls_total', 'num_calls_logged', 'last_call_num',
+                 'elapsed_ns_logged', 'elapsed_ns_estimated',
+                 'latency', 'elapsed_stats', 'retval_stats',
+                 'items_yielded', 'first_item_stats',
+                 'pending')
+
+    def __init__(self, thread=None):
+        self.thread = thread
+        self.num_calls_total = 0
+        self.num_calls_logged = 0
+        self.last_call_num = 0      # number of the latest logged call timed
+        self.elapsed_ns_logged = 0
+        self.elapsed_ns_estimated = 0.0     # of all enabled calls (see add_elapsed)
+        self.latency = LatencyHistogram()
+        self.elapsed_stats = RunningStats()
+        self.retval_stats = RunningStats()
+        self.items_yielded = 0
+        self.first_item_stats = RunningStats()
+        # History records (tuples, call number first) not yet merged.
+        # The owner appends, a merge pops: deques do both atomically.
+        self.pending = deque()
+
+    def add_elapsed(self, elapsed_ns, call_num, sample_rate=1.0):
+        """Account for a logged call, logged at sample_rate: it stands
+        for 1/sample_rate enabled calls in elapsed_ns_estimated."""
+        self.elapsed_ns_logged += elapsed_ns
+        self.elapsed_ns_estimated += elapsed_ns / sample_rate
+        self.latency.record(elapsed_ns)
+        self.elapsed_stats.add(elapsed_ns / 1e9)
+        self.last_call_num = call_num
+
+    def merge(self, other):
+        """Add other's counts and aggregates (not its pending records)
+        to self's. The `last` of the RunningStats is that of the shard
+        whose latest logged call has the higher number."""
+        self.num_calls_total += other.num_calls_total
+        self.num_calls_logged += other.num_calls_logged
+        self.elapsed_ns_logged += other.elapsed_ns_logged
+        self.elapsed_ns_estimated += other.elapsed_ns_estimated
+        self.latency.merge(other.latency)
+        self.items_yielded += other.items_yielded
+        for attr in ('elapsed_stats', 'retval_stats', 'first_item_stats'):
+            stats = getattr(self, attr)
+            last = stats.last
+            stats.merge(getattr(other, attr))
+            if last is not None and other.last_call_num < self.last_call_num:
+                stats.last = last
+        self.last_call_num = max(self.last_call_num, other.last_call_num)
+
+
+class ShardedStats():
+    """The StatsShards of one decorated function (see module docstring).
+
+    >>> stats = ShardedStats()
+    >>> shard = stats.shard()
+    >>> shard is stats.shard()
+    True
+    >>> def work():
+    ...     stats.shard().num_calls_total += 2
+    >>> t = threading.Thread(target=work); t.start(); t.join()
+    >>> shard.num_calls_total += 1
+    >>> stats.sum('num_calls_total')
+    3
+    """
+    def __init__(self, pending_limit=256):
+        self.pending_limit = pending_limit
+        self._lock = threading.Lock()
+        self._shards = []
+        # Made by the first call, and the first retirement: many decorated
+        # functions are never called, or only ever from one thread.
+        self._local = None
+        self._retired = None    # shards of finished threads, combined
+
+    def shard(self):
+        """The calling thread's shard."""
+        try:
+            return self._local.shard
+        except AttributeError:      # first call in this thread, or at all
+            with self._lock:
+                if self._local is None:
+                    self._local = threading.local()
+                shard = self._local.shard = StatsShard(threading.current_thread())
+                self._retire_finished()
+                self._shards.append(shard)
+            return shard
+
+    def num_retired_pending(self):
+        """Number of history records pending in the retired shard."""
+        retired = self._retired
+        return len(retired.pending) if retired is not None else 0
+
+    def _retire_finished(self):
+        """Fold the shards of finished threads into self._retired, and
+        return it (if any) and the shards of live threads, as a list.
+        Call with self._lock held."""
+        live = []
+        for shard in self._shards:
+            if shard.thread.is_alive():
+                live.append(shard)
+            else:
+                if self._retired is None:
+                    self._retired = StatsShard()
+                self._retired.merge(shard)
+                self._retired.pending.extend(shard.pending)
+        self._shards = live
+        return live if self._retired is None else [self._retired] + live
+
+    def merge_into(self, total):
+        """Merge all shards into total, a StatsShard (e.g. a StatsSnapshot),
+        and return it."""
+        with self._lock:
+            for shard in sorted(self._retire_finished(),
+                                key=lambda shard: shard.last_call_num):
+                total.merge(shard)
+        return total
+
+    def sum(self, attr):
+        """Total of the int attribute attr over all shards."""
+        with self._lock:
+            return sum(getattr(shard, attr) for shard in self._retire_finished())
+
+    def merged(self, attr):
+        """A new LatencyHistogram or RunningStats combining attribute attr
+        of all shards. For RunningStats, `last` is from the shard whose
+        latest logged call has the highest number."""
+        with self._lock:
+            shards = sorted(self._retire_finished(),
+                            key=lambda shard: shard.last_call_num)
+            result = type(getattr(_empty_shard, attr))()
+            for shard in shards:
+                result.merge(getattr(shard, attr))
+            return result
+
+    def drain_pending(self):
+        """Remove the pending history records of all shards, and return
+        them as a list, in call number order."""
+        records = []
+        with self._lock:
+            for shard in self._retire_finished():
+                pending = shard.pending
+                # Only the owner appends (on the right); only this pops.
+                for _ in range(len(pending)):
+                    records.append(pending.popleft())
+        records.sort(key=lambda record: record[0])
+        return records
+
+
+# For the types of StatsShard attributes. Never updated.
+_empty_shard = StatsShard()
+
+
+class StatsSnapshot(StatsShard):
+    """A decorated function's stats, combined from all its shards, as of
+    when it was made (by stats.snapshot); picklable, so that it can be sent
+    to another process, and mergeable with snapshots of the same function
+    in other processes (see aggregate.py).
+
+        name:       the function's prefixed name
+        pids:       ids of the processes whose stats are included
+        history:    list of CallRecords (possibly empty), in which argument
+                    values and retval are reprs and timestamp is epoch
+                    seconds; merged histories are sorted by timestamp
+
+    >>> a, b = StatsSnapshot('f', (1,)), StatsSnapshot('f', (2,))
+    >>> a.num_calls_logged, b.num_calls_logged = 3, 4
+    >>> a.merge(b)
+    >>> a.num_calls_logged, sorted(a.pids)
+    (7, [1, 2])
+    """
+    __slots__ = ('name', 'pids', 'history')
+
+    def __init__(self, name, pids=()):
+        super().__init__()
+        self.name = name
+        self.pids = set(pids)
+        self.history = []
+
+    @property
+    def elapsed_secs_logged(self):
+        return self.elapsed_ns_logged / 1e9
+
+    @property
+    def elapsed_secs_estimated(self):
+        return self.elapsed_ns_estimated / 1e9
+
+    @property
+    def items_per_sec(self):
+        return (self.items_yielded / (self.elapsed_ns_logged / 1e9)
+                if self.elapsed_ns_logged else None)
+
+    def latency_percentile(self, q):
+        """As stats.latency_percentile: in seconds, or None."""
+        ns = self.latency.percentile(q)
+        return None if ns is None else ns / 1e9
+
+    def merge(self, other):
+        super().merge(other)
+        if isinstance(other, StatsSnapshot):
+            self.pids |= other.pids
+            if other.history:
+                self.history = sorted(self.history + other.history,
+                                      key=lambda rec: rec.timestamp)
+
+    def __repr__(self):
+        return ("<StatsSnapshot of %s: %d calls logged (of %d), %f secs, %d processes>"
+                % (self.name, self.num_calls_logged, self.num_calls_total,
+                   self.elapsed_secs_logged, len(self.pids)))
@@ -0,0 +1,298 @@
+__author__ = "Brian O'Neill"  # BTO
+__version__ = '0.2.2'
+__doc__ = """
+Sinks -- streams that log_calls can write its messages to, other than
+by print(..., flush=True). A sink is an io.TextIOBase, so it's a legitimate
+value of the `file` setting of log_calls:
+
+    sink = QueueSink(sys.stderr, overflow=QueueSink.DROP_OLDEST)
+    @log_calls(file=sink)
+    def f(): ...
+
+log_calls hands each message to a sink's write_message method,
+instead of printing it.
+
+QueueSink: messages go onto a bounded queue, which a background thread
+drains in batches, so the decorated function doesn't wait on writes and
+flushes. When the queue is full, the sink's overflow policy applies:
+    BLOCK        the caller waits for room (nothing is lost),
+    DROP_NEWEST  the new message is discarded,
+    DROP_OLDEST  the oldest queued message is discarded.
+Discarded messages are counted in the `dropped` attribute, as are
+those of callers still waiting for room (BLOCK) when the sink is closed.
+flush() waits until everything queued so far has been written;
+at exit, every open QueueSink is flushed and closed.
+
+BufferedFileSink: messages accumulate in a buffer, which is written to
+a file (with one write()) when it reaches buffer_size bytes, when
+flush_interval milliseconds have passed since the last write to the file,
+on flush(), and at exit. Optionally the file is rotated by size.
+"""
+import atexit
+from collections import deque
+import io
+import os
+import sys
+import threading
+import time
+import weakref
+
+__all__ = ['LogSink', 'QueueSink', 'BufferedFileSink']
+
+
+class LogSink(io.TextIOBase):
+    """Base class for sinks. Subclasses implement write (for print & co.)
+    and may override write_message, which log_calls calls with each complete
+    (possibly multiline) message, sans trailing newline."""
+    def writable(self):
+        return True
+
+    def write_message(self, msg):
+        self.write(msg + '\n')
+
+
+class QueueSink(LogSink):
+    """A sink that writes messages from a background thread.
+    (See module docstring.)
+
+        stream:     A text stream to write to (default: sys.stdout, as of
+                    construction); or, a callable which the writer thread
+                    calls with each batch, a list of the raw messages
+                    (as passed to write_message, without newlines, or
+                    to write).
+        maxsize:    Capacity of the queue, in messages (> 0).
+        overflow:   What to do when the queue is full: BLOCK, DROP_NEWEST
+                    or DROP_OLDEST.
+        batch_size: The writer takes at most this many messages at a time
+                    off the queue, and writes them with one write().
+    """
+    BLOCK = 'block'
+    DROP_NEWEST = 'drop_newest'
+    DROP_OLDEST = 'drop_oldest'
+    _overflow_policies = (BLOCK, DROP_NEWEST, DROP_OLDEST)
+
+    def __init__(self, stream=None, *, maxsize=1024, overflow=BLOCK, batch_size=256):
+        if overflow not in self._overflow_policies:
+            raise ValueError("overflow must be one of %r, not %r"
+                             % (self._overflow_policies, overflow))
+        if maxsize <= 0 or batch_size <= 0:
+            raise ValueError("maxsize and batch_size must be > 0")
+        if stream is None:
+            stream = sys.stdout
+        # raw: stream is a callable that takes lists of messages
+        self._raw = not hasattr(stream, 'write') and callable(stream)
+        self.stream = stream
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.batch_size = batch_size
+        # Messages lost, to overflow or to errors writing them
+        self.dropped = 0
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._in_flight = 0     # size of batch being written
+        self._closing = False
+        self._writer = threading.Thread(target=self._drain,
+                                        name='log_calls-QueueSink',
+                                        daemon=True)
+        self._writer.start()
+        _open_queue_sinks.add(self)
+
+    def write(self, s):
+        self._put(s)
+        return len(s)
+
+    def write_message(self, msg):
+        self._put(msg if self._raw else msg + '\n')
+
+    def _put(self, item):
+        with self._cond:
+            if self._closing:
+                raise ValueError("I/O operation on closed QueueSink.")
+            if len(self._queue) >= self.maxsize:
+                if self.overflow == self.BLOCK:
+                    while len(self._queue) >= self.maxsize and not self._closing:
+                        self._cond.wait()
+                    if self._closing:
+                        # Closed while waiting: the writer may be gone
+                        self.dropped += 1
+                        return
+                elif self.overflow == self.DROP_NEWEST:
+                    self.dropped += 1
+                    return
+                else:   # DROP_OLDEST
+                    self._queue.popleft()
+                    self.dropped += 1
+            self._queue.append(item)
+            self._cond.notify_all()
+
+    def _drain(self):
+        """Body of the writer thread."""
+        queue = self._queue
+        while True:
+            with self._cond:
+                while not queue and not self._closing:
+                    self._cond.wait()
+                if not queue:       # and closing
+                    return
+                batch = [queue.popleft()
+                         for _ in range(min(len(queue), self.batch_size))]
+                self._in_flight = len(batch)
+                self._cond.notify_all()     # there's room now
+            try:
+                if self._raw:
+                    self.stream(batch)
+                else:
+                    self.stream.write(''.join(batch))
+                    self.stream.flush()
+            except Exception:
+                with self._cond:
+                    self.dropped += len(batch)
+            with self._cond:
+                self._in_flight = 0
+                self._cond.notify_all()     # for flush()
+
+    @property
+    def pending(self):
+        """Number of messages queued or being written."""
+        with self._cond:
+            return len(self._queue) + self._in_flight
+
+    def flush(self):
+        """Wait until everything queued so far has been written."""
+        if threading.current_thread() is self._writer:
+            return
+        with self._cond:
+            while (self._queue or self._in_flight) and self._writer.is_alive():
+                self._cond.wait()
+
+    def close(self):
+        """Write everything queued, then stop the writer thread."""
+        if self.closed:
+            return
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        if threading.current_thread() is not self._writer:
+            self._writer.join()
+        _open_queue_sinks.discard(self)
+        super().close()
+
+
+class BufferedFileSink(LogSink):
+    """A sink that buffers messages and writes them to a file in chunks.
+    (See module docstring.)
+
+        path:           The file to write to (appended to, if it exists).
+        buffer_size:    Write the buffer to the file when it holds at least
+                        this many bytes.
+        flush_interval: Write the buffer to the file when this many
+                        milliseconds have passed since the last time that was
+                        done -- checked on each write, and by a timer armed
+                        when the buffer becomes nonempty. None: no time limit.
+        max_bytes:      If > 0, rotate the file when writing to it would make
+                        it larger than this: path.1 ... path.<backup_count>
+                        hold older contents, as with
+                        logging.handlers.RotatingFileHandler.
+        backup_count:   Number of rotated files to keep. If 0, rotating just
+                        empties the file.
+        encoding:       The file's encoding.
+    """
+    def __init__(self, path, *, buffer_size=64 * 1024, flush_interval=1000,
+                 max_bytes=0, backup_count=1, encoding='utf-8'):
+        self.path = os.fspath(path)
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._encoding = encoding
+
+        self._buffer = bytearray()
+        self._lock = threading.RLock()
+        self._timer = None
+        self._file = open(self.path, 'ab')
+        self._file_size = self._file.tell()
+        self._last_flush = time.monotonic()
+        _open_file_sinks.add(self)
+
+    @property
+    def encoding(self):
+        return self._encoding
+
+    def write(self, s):
+        data = s.encode(self._encoding)
+        with self._lock:
+            if self.closed:
+                raise ValueError("I/O operation on closed BufferedFileSink.")
+            was_empty = not self._buffer
+            self._buffer += data
+            if (len(self._buffer) >= self.buffer_size
+                or (self.flush_interval is not None
+                    and (time.monotonic() - self._last_flush) * 1000 >= self.flush_interval)):
+                self._flush_buffer()
+            elif was_empty and self.flush_interval is not None:
+                self._arm_timer()
+        return len(s)
+
+    def _arm_timer(self):
+        self._timer = threading.Timer(self.flush_interval / 1000, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            if self._buffer and not self.closed:
+                self._flush_buffer()
+
+    def _flush_buffer(self):
+        """Write the buffer to the file. Call with self._lock held."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        if (self.max_bytes > 0 and self._file_size
+              and self._file_size + len(self._buffer) > self.max_bytes):
+            self._rotate()
+        self._file.write(self._buffer)
+        self._file.flush()
+        self._file_size += len(self._buffer)
+        self._buffer.clear()
+
+    def _rotate(self):
+        self._file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                src = "%s.%d" % (self.path, i)
+                if os.path.exists(src):
+                    os.replace(src, "%s.%d" % (self.path, i + 1))
+            os.replace(self.path, self.path + ".1")
+        self._file = open(self.path, 'wb')
+        self._file_size = 0
+
+    def flush(self):
+        """Write the buffer to the file."""
+        with self._lock:
+            if not self.closed:
+                self._flush_buffer()
+
+    def close(self):
+        with self._lock:
+            if self.closed:
+                return
+            self._flush_buffer()
+            self._file.close()
+            _open_file_sinks.discard(self)
+            super().close()
+
+
+_open_queue_sinks = weakref.WeakSet()
+_open_file_sinks = weakref.WeakSet()
+
+
+@atexit.register
+def _close_sinks():
+    """Drain every open sink on the way out."""
+    for sink in list(_open_queue_sinks) + list(_open_file_sinks):
+        sink.close()
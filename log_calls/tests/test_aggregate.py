@@ -0,0 +1,141 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import TestCase
+
+from log_calls import record_history, StatsCollector, StatsSnapshot, snapshot_all
+from log_calls.history_log import HistoryLogReader
+
+
+@record_history(prefix='agg.', record_retval_stats=True)
+def work(x):
+    return x * x
+
+
+@record_history(prefix='agg.')
+def gen(n):
+    yield from range(n)
+
+
+_spill_dir = tempfile.mkdtemp()
+_spill_path = os.path.join(_spill_dir, 'spilled.jsonl')
+
+
+@record_history(prefix='agg.', max_history=1, history_spill_file=_spill_path)
+def spilled(x):
+    return x
+
+
+def work_and_report(x):
+    from log_calls.aggregate import send_snapshots
+    work(x)
+    send_snapshots()
+    return os.getpid()
+
+
+class TestSnapshot(TestCase):
+
+    def setUp(self):
+        work.stats.clear_history()
+
+    def test_snapshot(self):
+        for x in range(3):
+            work(x)
+        snap = work.stats.snapshot(history=2)
+        self.assertEqual(snap.name, 'agg.work')
+        self.assertEqual(snap.pids, {os.getpid()})
+        self.assertEqual(snap.num_calls_logged, 3)
+        self.assertEqual(snap.retval_stats.max, 4)
+        self.assertEqual(snap.elapsed_ns_logged, work.stats.elapsed_ns_logged)
+        self.assertEqual(snap.latency, work.stats.latency_histogram)
+        # the last 2 records, with reprs of values
+        self.assertEqual([(rec.argvals, rec.retval) for rec in snap.history],
+                         [(('1',), '1'), (('2',), '4')])
+        self.assertEqual(work.stats.snapshot().history, [])
+
+    def test_pickle_and_merge(self):
+        work(1)
+        work(2)
+        snap = pickle.loads(pickle.dumps(work.stats.snapshot(history=True)))
+        other = work.stats.snapshot(history=True)
+        other.pids = {-1}
+        snap.merge(other)
+        self.assertEqual(snap.num_calls_total, 4)
+        self.assertEqual(snap.elapsed_stats.count, 4)
+        self.assertEqual(snap.latency.count, 4)
+        self.assertEqual(len(snap.history), 4)
+        self.assertEqual(snap.pids, {os.getpid(), -1})
+
+    def test_snapshot_all(self):
+        work(3)
+        snaps = snapshot_all()
+        self.assertIsInstance(snaps['agg.work'], StatsSnapshot)
+        self.assertEqual(snaps['agg.work'].num_calls_logged, 1)
+
+
+class TestStatsCollector(TestCase):
+
+    def setUp(self):
+        work.stats.clear_history()
+        gen.stats.clear_history()
+
+    def test_pool(self):
+        work(100)       # in this process: not to be counted again by workers
+        ctx = multiprocessing.get_context()
+        with StatsCollector(history=True, context=ctx) as collector:
+            with ProcessPoolExecutor(2, mp_context=ctx,
+                                     initializer=collector.initializer,
+                                     initargs=collector.initargs) as pool:
+                self.assertEqual(list(pool.map(work, range(20))),
+                                 [x * x for x in range(20)])
+        merged = collector.merged()
+        self.assertEqual(merged['agg.work'].num_calls_logged, 21)
+        self.assertEqual(sorted(rec.argvals for rec in merged['agg.work'].history),
+                         sorted((repr(x),) for x in [100] + list(range(20))))
+        self.assertGreaterEqual(len(merged['agg.work'].pids), 2)
+        self.assertEqual(collector.merged(include_local=False)['agg.work'].num_calls_logged, 20)
+        self.assertEqual(merged['agg.gen'].num_calls_total, 0)
+
+    def test_on_demand(self):
+        ctx = multiprocessing.get_context()
+        with StatsCollector(context=ctx) as collector:
+            with ProcessPoolExecutor(1, mp_context=ctx,
+                                     initializer=collector.initializer,
+                                     initargs=collector.initargs) as pool:
+                pid = pool.submit(work_and_report, 1).result()
+                pool.submit(work_and_report, 2).result()
+        # The snapshot sent at exit replaced the ones sent on demand
+        self.assertEqual(collector.pids, {pid})
+        self.assertEqual(collector.merged()['agg.work'].num_calls_logged, 2)
+
+    @unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(),
+                         "needs the fork start method")
+    def test_fork_leaves_parent_files_alone(self):
+        spilled.stats.clear_history(1)
+        log_path = os.path.join(_spill_dir, 'spilled.hlog')
+        spilled.stats.start_history_log(log_path)
+        for x in range(5):
+            spilled(x)
+        with open(_spill_path) as fp:
+            spill_before = fp.read()
+        ctx = multiprocessing.get_context('fork')
+        with StatsCollector(history=True, context=ctx) as collector:
+            with ProcessPoolExecutor(1, mp_context=ctx,
+                                     initializer=collector.initializer,
+                                     initargs=collector.initargs) as pool:
+                self.assertEqual(list(pool.map(spilled, [10, 11])), [10, 11])
+        spilled(5)
+        spilled.stats.stop_history_log()
+
+        self.assertEqual([rec.argvals for rec in spilled.stats.history],
+                         [(x,) for x in range(6)])
+        with open(_spill_path) as fp:
+            self.assertTrue(fp.read().startswith(spill_before))
+        with HistoryLogReader(log_path) as log:
+            self.assertEqual([rec.call_num for rec in log], list(range(1, 7)))
+        merged = collector.merged(include_local=False)['agg.spilled']
+        self.assertEqual([rec.argvals for rec in merged.history], [('11',)])
+        self.assertEqual(merged.num_calls_logged, 2)
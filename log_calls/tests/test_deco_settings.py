@@ -417,6 +417,47 @@ class TestDecoSettingsMapping(TestCase):
 
         self.assertRaises(KeyError, bad_key)
 
+    def test__version(self):
+        mapping = self._settings_mapping
+        v0 = mapping._version
+        mapping['enabled'] = False
+        self.assertEqual(mapping._version, v0 + 1)
+        mapping.my_setting = 'eek'      # same value: still a change
+        self.assertEqual(mapping._version, v0 + 2)
+        mapping.update(enabled=True, your_setting='ignored')  # immutable skipped
+        self.assertEqual(mapping._version, v0 + 3)
+        mapping['enabled']
+        self.assertEqual(mapping._version, v0 + 3)
+
+    def test_resolve_all(self):
+        mapping = self._settings_mapping
+        # All direct: the same (cached) dict every time
+        d1 = mapping.resolve_all({}, fparams=None)
+        self.assertDictEqual(d1,
+                             {'enabled': True, 'folderol': 'bar', 'my_setting': 'eek',
+                              'your_setting': 'Howdy', 'history': False})
+        self.assertIs(mapping.resolve_all({'enabled': 0}, fparams=None), d1)
+
+        # Changing settings invalidates the cache
+        mapping['enabled'] = 'enabled_kwd='
+        mapping['my_setting'] = 'my_kwd='
+
+        def f(a, enabled_kwd=3, **kwargs):
+            pass
+        fparams = inspect.signature(f).parameters
+        d2 = mapping.resolve_all({'my_kwd': 'wow'}, fparams=fparams)
+        self.assertIsNot(d2, d1)
+        self.assertEqual(d2['enabled'], 3)
+        self.assertEqual(d2['my_setting'], 'wow')
+        self.assertEqual(d2['folderol'], 'bar')
+        for name in d2:
+            self.assertEqual(d2[name],
+                             mapping.get_final_value(name, {'my_kwd': 'wow'}, fparams=fparams))
+
+        d3 = mapping.resolve_all({'enabled_kwd': 0}, fparams=fparams)
+        self.assertEqual(d3['enabled'], 0)
+        self.assertEqual(d3['my_setting'], 'on')    # default: allow_falsy=False
+
     def test_get_final_value(self):
         mapping = self._settings_mapping
         v = mapping.get_final_value('enabled', fparams=None)
@@ -445,3 +486,25 @@ class TestDecoSettingsMapping(TestCase):
         hparams = inspect.signature(h).parameters
         v = mapping.get_final_value('enabled', fparams=hparams)
         self.assertEqual(v, False)
+
+
+class TestResolveOnlyLoggedCalls(TestCase):
+
+    def test_disabled_calls_dont_resolve_all(self):
+        import io
+        from unittest import mock
+        from log_calls import log_calls
+
+        @log_calls(enabled='log_it=', file=io.StringIO())
+        def f(x, log_it=False):
+            return x
+
+        mapping = f.log_calls_settings
+        with mock.patch.object(mapping, 'resolve_all',
+                               wraps=mapping.resolve_all) as resolve_all:
+            f(1)
+            f(2, log_it=False)
+            self.assertEqual(resolve_all.call_count, 0)
+            f(3, log_it=True)
+            self.assertEqual(resolve_all.call_count, 1)
+        self.assertEqual((f.stats.num_calls_total, f.stats.num_calls_logged), (3, 1))
@@ -0,0 +1,389 @@
+from collections import OrderedDict
+import inspect
+import os
+import tempfile
+from unittest import TestCase
+
+from log_calls.helpers import ParamLayout
+from log_calls.history import CallHistory, CallRecord, HistorySampler
+
+
+def _add(hist, n, name='f', chain=('<module>',)):
+    hist.append(n,
+                ['a'], (n,),
+                (n, n + 1),
+                OrderedDict([('x', n)]), OrderedDict([('y', 0)]), {'z': -n},
+                n * 10,
+                n / 1000,
+                1000.0 + n,
+                prefixed_func_name=name,
+                caller_chain=list(chain))
+
+
+class TestCallHistory(TestCase):
+
+    def test_unbounded(self):
+        hist = CallHistory()
+        for n in range(1, 6):
+            _add(hist, n)
+        self.assertEqual(len(hist), 5)
+        self.assertEqual(list(hist.call_nums()), [1, 2, 3, 4, 5])
+        self.assertEqual(list(hist.timestamps()), [1001.0, 1002.0, 1003.0, 1004.0, 1005.0])
+
+    def test_record(self):
+        hist = CallHistory()
+        _add(hist, 3)
+        self.assertEqual(
+            list(hist)[0],
+            CallRecord(3, ['a'], (3,), (3, 4),
+                       OrderedDict([('x', 3)]), OrderedDict([('y', 0)]), {'z': -3},
+                       30, 0.003, 1003.0,
+                       prefixed_func_name='f', caller_chain=['<module>']))
+
+    def test_ring_buffer(self):
+        hist = CallHistory(maxlen=3)
+        for n in range(1, 8):
+            _add(hist, n)
+        self.assertEqual(len(hist), 3)
+        self.assertEqual(list(hist.call_nums()), [5, 6, 7])
+        self.assertEqual(list(hist.elapsed_secs()), [0.005, 0.006, 0.007])
+        self.assertEqual([rec.retval for rec in hist], [50, 60, 70])
+        self.assertEqual([rec.call_num for rec in hist.records(1)], [6, 7])
+        self.assertEqual([rec.call_num for rec in hist.records(-2, -1)], [6])
+
+    def test_partly_filled_ring_buffer(self):
+        hist = CallHistory(maxlen=5)
+        _add(hist, 1)
+        _add(hist, 2)
+        self.assertEqual(list(hist.call_nums()), [1, 2])
+        self.assertEqual([rec.call_num for rec in hist], [1, 2])
+
+    def test_interned(self):
+        hist = CallHistory()
+        _add(hist, 1, name='f', chain=('g', '<module>'))
+        _add(hist, 2, name='f', chain=('h', '<module>'))
+        _add(hist, 3, name='f', chain=('g', '<module>'))
+        self.assertEqual(len(hist._names.values), 1)
+        self.assertEqual(len(hist._chains.values), 2)
+        self.assertEqual([rec.caller_chain for rec in hist],
+                         [['g', '<module>'], ['h', '<module>'], ['g', '<module>']])
+        # materialized records don't share mutable parts
+        recs = list(hist)
+        recs[0].caller_chain.append('?')
+        self.assertEqual(list(hist)[0].caller_chain, ['g', '<module>'])
+
+    def test_records_snapshot(self):
+        hist = CallHistory(maxlen=5)
+        for n in range(1, 9):
+            _add(hist, n)
+        for start, stop in ((None, None), (1, 4), (3, None), (-2, None), (2, 2)):
+            self.assertEqual(list(hist.records_snapshot(start, stop)),
+                             list(hist.records(start, stop)))
+        snap = hist.records_snapshot()
+        for n in range(9, 200):     # overwrites every slot, compacts the tables
+            _add(hist, n, name='f%d' % n)
+        self.assertEqual([(rec.call_num, rec.prefixed_func_name) for rec in snap],
+                         [(n, 'f') for n in range(4, 9)])
+
+    def test_records_snapshot_is_lazy(self):
+        import tracemalloc
+        n = 20000
+        hist = CallHistory()
+        for i in range(n):
+            _add(hist, i)
+        tracemalloc.start()
+        try:
+            count = 0
+            for rec in hist.records_snapshot():
+                count += 1
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(count, n)
+        # Column copies only: far less than a CallRecord per record
+        self.assertLess(peak, 200 * n)
+
+    def test_clear(self):
+        hist = CallHistory(maxlen=2)
+        for n in range(1, 4):
+            _add(hist, n)
+        hist.clear()
+        self.assertEqual(len(hist), 0)
+        self.assertEqual(list(hist), [])
+        _add(hist, 9)
+        self.assertEqual(list(hist.call_nums()), [9])
+
+    def test_columns(self):
+        def f(a, *args, x=1, y=0, **kwargs): pass
+        layout = ParamLayout(inspect.signature(f).parameters)
+        hist = CallHistory(maxlen=2)
+        _add(hist, 1, name='f')
+        _add(hist, 2, name='g', chain=('h', '<module>'))
+        _add(hist, 3, name='f')
+        self.assertEqual(list(hist.retvals()), [20, 30])
+        cols = hist.arg_columns(layout)
+        self.assertEqual(list(cols), ['a', 'args', 'x', 'y', 'kwargs'])
+        self.assertEqual(cols['a'], [2, 3])
+        self.assertEqual(cols['args'], [(2, 3), (3, 4)])
+        self.assertEqual(cols['x'], [2, 3])
+        self.assertEqual(cols['kwargs'], [{'z': -2}, {'z': -3}])
+        codes, names = hist.prefixed_func_name_codes()
+        self.assertEqual([names[c] for c in codes], ['g', 'f'])
+        codes, chains = hist.caller_chain_codes()
+        self.assertEqual([chains[c] for c in codes], [('h', '<module>'), ('<module>',)])
+
+    def test_generator_stats(self):
+        hist = CallHistory(maxlen=2)
+        _add(hist, 1)
+        hist.append(2, [], (), (), OrderedDict(), OrderedDict(), {},
+                    None, 0.002, 1002.0, 'g', ['<module>'],
+                    items_yielded=5, first_item_secs=0.0001)
+        recs = list(hist)
+        self.assertEqual((recs[0].items_yielded, recs[0].first_item_secs), (None, None))
+        self.assertEqual((recs[1].items_yielded, recs[1].first_item_secs), (5, 0.0001))
+        self.assertEqual(hist.generator_columns(), ([None, 5], [None, 0.0001]))
+
+
+class TestSpill(TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_spill(self):
+        hist = CallHistory(maxlen=2, spill_file=self.path)
+        for n in range(1, 6):
+            _add(hist, n)
+        hist.close()
+        self.assertEqual(len(hist), 5)
+        with open(self.path) as fp:
+            self.assertEqual(len(fp.readlines()), 3)
+        recs = list(hist)
+        self.assertEqual([rec.call_num for rec in recs], [1, 2, 3, 4, 5])
+        # spilled records read back as stored
+        self.assertEqual(recs[0], CallRecord(1, ['a'], (1,), (1, 2),
+                                             OrderedDict([('x', 1)]), OrderedDict([('y', 0)]),
+                                             {'z': -1},
+                                             10, 0.001, 1001.0,
+                                             prefixed_func_name='f', caller_chain=['<module>']))
+        self.assertEqual([rec.call_num for rec in hist.records(2, 4)], [3, 4])
+        self.assertEqual(list(hist.call_nums()), [1, 2, 3, 4, 5])
+        self.assertEqual(list(hist.elapsed_secs()), [0.001, 0.002, 0.003, 0.004, 0.005])
+
+    def test_generator_stats_spilled(self):
+        hist = CallHistory(maxlen=1, spill_file=self.path)
+        hist.append(1, [], (), (), OrderedDict(), OrderedDict(), {},
+                    None, 0.0, 0.0, 'g', ['<module>'],
+                    items_yielded=0, first_item_secs=None)
+        _add(hist, 2)
+        spilled = next(hist.records())
+        self.assertEqual((spilled.items_yielded, spilled.first_item_secs), (0, None))
+        self.assertEqual(hist.generator_columns(), ([0, None], [None, None]))
+
+    def test_unrepresentable_values_spilled_as_reprs(self):
+        hist = CallHistory(maxlen=1, spill_file=self.path)
+        obj = object()
+        hist.append(1, ['a'], (obj,), (), OrderedDict(), OrderedDict(), {},
+                    obj, 0.0, 0.0, 'f', ['<module>'])
+        _add(hist, 2)
+        self.assertEqual(next(hist.records()).argvals, (repr(obj),))
+
+    def test_unencodable_record_spilled_as_reprs(self):
+        hist = CallHistory(maxlen=2, spill_file=self.path)
+        circular = []
+        circular.append(circular)
+        for n in range(1, 6):
+            hist.append(n, ['a', 'b'], ({(1, 2): n}, circular), (),
+                        OrderedDict(), OrderedDict(), {},
+                        n, 0.0, 0.0, 'f', ['<module>'])
+        recs = list(hist)
+        hist.close()
+        self.assertEqual([rec.call_num for rec in recs], [1, 2, 3, 4, 5])
+        self.assertEqual(recs[0].argvals, ('{(1, 2): 1}', '[[...]]'))
+        self.assertEqual(recs[0].retval, '1')
+        with open(self.path) as fp:
+            self.assertEqual(len(fp.readlines()), 3)
+
+    def test_clear_truncates(self):
+        hist = CallHistory(maxlen=1, spill_file=self.path)
+        for n in range(1, 4):
+            _add(hist, n)
+        hist.clear()
+        self.assertEqual(os.path.getsize(self.path), 0)
+        _add(hist, 7)
+        self.assertEqual([rec.call_num for rec in hist], [7])
+
+    def test_earlier_spills_kept(self):
+        hist = CallHistory(maxlen=1, spill_file=self.path)
+        for n in range(1, 4):
+            _add(hist, n)
+        hist.close()
+        with open(self.path, 'a') as fp:
+            fp.write('{"partial')       # as if the earlier run died writing
+        size = os.path.getsize(self.path)
+        # A new history of the same file (e.g. after a restart)
+        hist = CallHistory(maxlen=1, spill_file=self.path)
+        self.assertEqual(os.path.getsize(self.path), size)
+        for n in range(11, 14):
+            _add(hist, n)
+        self.assertEqual([rec.call_num for rec in hist], [11, 12, 13])
+        self.assertEqual(list(hist.call_nums()), [11, 12, 13])
+        hist.close()
+        with open(self.path) as fp:
+            lines = fp.read().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(lines[2], '{"partial')
+
+    def test_exporting_reads_spill_file_once(self):
+        hist = CallHistory(maxlen=2, spill_file=self.path)
+        for n in range(1, 6):
+            _add(hist, n, name='f' if n % 2 else 'g', chain=(str(n),))
+        reads = []
+        spilled_records = hist._spilled_records
+        hist._spilled_records = lambda *args: reads.append(args) or spilled_records(*args)
+        with hist.exporting():
+            self.assertEqual(list(hist.call_nums()), [1, 2, 3, 4, 5])
+            codes, names = hist.prefixed_func_name_codes()
+            self.assertEqual([names[code] for code in codes], ['f', 'g', 'f', 'g', 'f'])
+            codes, chains = hist.caller_chain_codes()
+            self.assertEqual([chains[code] for code in codes],
+                             [('1',), ('2',), ('3',), ('4',), ('5',)])
+            columns = hist.arg_columns(ParamLayout(
+                inspect.signature(lambda a, *args, x, y, **z: None).parameters))
+            self.assertEqual(columns['a'], [1, 2, 3, 4, 5])
+            self.assertEqual(columns['args'][0], (1, 2))
+            self.assertEqual(columns['z'][0], {'z': -1})
+        hist.close()
+        self.assertEqual(len(reads), 1)
+
+    def test_reading_leaves_tables_alone(self):
+        hist = CallHistory(maxlen=2, spill_file=self.path)
+        for n in range(1, 6):
+            _add(hist, n, name='f%d' % n, chain=(str(n),))
+        tables = (list(hist._names.values), list(hist._chains.values),
+                  list(hist._argnames.values))
+        for _ in range(3):
+            codes, names = hist.prefixed_func_name_codes()
+            self.assertEqual([names[code] for code in codes],
+                             ['f1', 'f2', 'f3', 'f4', 'f5'])
+            codes, chains = hist.caller_chain_codes()
+            self.assertEqual([chains[code] for code in codes],
+                             [('1',), ('2',), ('3',), ('4',), ('5',)])
+        hist.close()
+        self.assertEqual((list(hist._names.values), list(hist._chains.values),
+                          list(hist._argnames.values)),
+                         tables)
+
+    def test_json_round_trip(self):
+        hist = CallHistory(maxlen=1, spill_file=self.path)
+        hist.append(1, ['a'], ((1, 2),), (), OrderedDict(), OrderedDict(), {},
+                    {3: (4,)}, 0.0, 0.0, 'f', ['<module>'])
+        _add(hist, 2)
+        rec = next(hist.records())
+        hist.close()
+        self.assertEqual((rec.argvals, rec.retval), (([1, 2],), {'3': [4]}))
+
+    def test_no_spill_when_unbounded(self):
+        hist = CallHistory(spill_file=self.path)
+        self.assertIsNone(hist.spill_file)
+
+
+class TestInternedCompaction(TestCase):
+
+    def _add_named(self, hist, n):
+        hist.append(n, ['a'], (n,), (), OrderedDict(), OrderedDict(), {},
+                    n, 0.1, 1000.0 + n, 'f%d' % n, ('caller%d' % n,))
+
+    def test_ring(self):
+        hist = CallHistory(maxlen=4)
+        for n in range(1, 1001):
+            self._add_named(hist, n)
+        limit = hist.interned_slack * 64
+        self.assertLessEqual(len(hist._names.values), limit)
+        self.assertLessEqual(len(hist._chains.values), limit)
+        self.assertEqual(len(hist._argnames.values), 1)
+        self.assertEqual([rec.prefixed_func_name for rec in hist],
+                         ['f997', 'f998', 'f999', 'f1000'])
+        self.assertEqual([rec.caller_chain for rec in hist],
+                         [['caller997'], ['caller998'], ['caller999'], ['caller1000']])
+        codes, names = hist.prefixed_func_name_codes()
+        self.assertEqual([names[code] for code in codes],
+                         ['f997', 'f998', 'f999', 'f1000'])
+
+    def test_deleted(self):
+        hist = CallHistory()
+        for n in range(1, 1001):
+            self._add_named(hist, n)
+            if len(hist) > 3:
+                hist.delete(0)
+        self.assertLessEqual(len(hist._names.values), hist.interned_slack * 64)
+        self.assertEqual([rec.prefixed_func_name for rec in hist],
+                         ['f998', 'f999', 'f1000'])
+
+
+class TestHistorySampler(TestCase):
+
+    def _sample(self, sampler, n, hist=None):
+        hist = CallHistory() if hist is None else hist
+        for call_num in range(1, n + 1):
+            if sampler.admit(call_num, hist):
+                _add(hist, call_num)
+        return list(hist.call_nums())
+
+    def test_all(self):
+        for sample in (None, 0, 1, 1.0):
+            self.assertEqual(self._sample(HistorySampler(sample), 5), [1, 2, 3, 4, 5])
+
+    def test_every(self):
+        self.assertEqual(self._sample(HistorySampler(3), 10), [1, 4, 7, 10])
+
+    def test_probability(self):
+        sampler = HistorySampler(0.25)
+        draws = iter([0.1, 0.9, 0.3, 0.2, 0.25])
+        sampler._random = lambda: next(draws)
+        self.assertEqual(self._sample(sampler, 5), [1, 4])
+
+    def test_reservoir(self):
+        sampler = HistorySampler('reservoir', max_history=10)
+        # Every call has the same chance of being in the sample
+        counts = [0] * 100
+        for _ in range(300):
+            for call_num in self._sample(sampler, 100):
+                counts[call_num - 1] += 1
+        self.assertEqual(sum(counts), 3000)
+        self.assertGreater(sum(counts[:50]), 1200)
+        self.assertGreater(sum(counts[50:]), 1200)
+
+    def test_decided_at_call(self):
+        sampler = HistorySampler(3)
+        self.assertEqual([sampler.admit_call(n) for n in range(1, 5)],
+                         [True, False, False, True])
+        self.assertTrue(sampler.admit_record(2, CallHistory()))
+        sampler = HistorySampler('reservoir', max_history=1)
+        self.assertTrue(all(sampler.admit_call(n) for n in range(1, 5)))
+
+    def test_unsampled_calls_make_no_record(self):
+        from unittest import mock
+        from log_calls import record_history
+
+        @record_history(history_sample=3)
+        def f(x):
+            return x
+
+        with mock.patch.object(record_history, '_add_to_history',
+                               autospec=True) as add_to_history:
+            for i in range(10):
+                f(i)
+        self.assertEqual([call.args[1] for call in add_to_history.call_args_list],
+                         [1, 4, 7, 10])
+        self.assertEqual(f.stats.num_calls_logged, 10)
+
+    def test_invalid(self):
+        for sample in (-1, 0.0, 1.5, 'all', '3', True):
+            with self.assertRaises(ValueError):
+                HistorySampler(sample)
+        with self.assertRaises(ValueError):
+            HistorySampler('reservoir')
@@ -0,0 +1,173 @@
+from collections import OrderedDict
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+
+from log_calls import record_history, HistoryLogWriter, HistoryLogReader
+from log_calls.history import CallRecord
+
+
+class TestHistoryLog(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'hist.lch')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_round_trip(self):
+        writer = HistoryLogWriter(self.path)
+        for n in range(1, 4):
+            writer.append(n, ['a'], (n,), ('v',),
+                          OrderedDict([('x', n)]), OrderedDict(), {'z': [n]},
+                          n * 10, n / 1000, 1000.0 + n,
+                          'f', ['g', '<module>'])
+        writer.close()
+
+        with HistoryLogReader(self.path) as reader:
+            self.assertEqual(len(reader), 3)
+            self.assertEqual(list(reader.column('call_num')), [1, 2, 3])
+            self.assertEqual(list(reader.column('elapsed_secs')), [0.001, 0.002, 0.003])
+            self.assertEqual(list(reader.column('timestamp')), [1001.0, 1002.0, 1003.0])
+            # names and chains are interned
+            self.assertEqual(len(set(reader.column('prefixed_fname'))), 1)
+            self.assertEqual(len(set(reader.column('caller_chain'))), 1)
+            self.assertEqual(
+                reader.record(1),
+                CallRecord(2, ['a'], ('2',), ("'v'",),
+                           OrderedDict([('x', '2')]), OrderedDict(), {'z': '[2]'},
+                           '20', 0.002, 1002.0,
+                           prefixed_func_name='f', caller_chain=['g', '<module>']))
+            self.assertEqual([rec.call_num for rec in reader], [1, 2, 3])
+            self.assertEqual(len(reader.records_view), 3 * reader.record_size)
+            with self.assertRaises(IndexError):
+                reader.record(3)
+
+    def _write(self, names):
+        writer = HistoryLogWriter(self.path)
+        for n, name in enumerate(names, 1):
+            writer.append(n, ['a'], (0,), (), OrderedDict(), OrderedDict(), {},
+                          None, 0.5, 1000.0, name, ['<module>'])
+        writer.close()
+        return writer
+
+    def test_only_names_and_chains_interned(self):
+        self._write(['f', 'f', 'f'])
+        with HistoryLogReader(self.path) as reader:
+            # same args and retval each time, stored each time
+            self.assertEqual(len(set(reader.column('args'))), 3)
+            self.assertEqual(len(set(reader.column('retval'))), 3)
+            self.assertEqual(len(set(reader.column('prefixed_fname'))), 1)
+            self.assertEqual([rec.argvals for rec in reader], [('0',)] * 3)
+
+    def test_intern_limit(self):
+        saved = HistoryLogWriter.intern_limit
+        HistoryLogWriter.intern_limit = 2
+        try:
+            writer = self._write(['f', 'g', 'h', 'h', 'f'])
+        finally:
+            HistoryLogWriter.intern_limit = saved
+        self.assertEqual(len(writer._string_ids), 2)
+        with HistoryLogReader(self.path) as reader:
+            self.assertEqual([rec.prefixed_func_name for rec in reader],
+                             ['f', 'g', 'h', 'h', 'f'])
+            fname_ids = list(reader.column('prefixed_fname'))
+            self.assertEqual(fname_ids[0], fname_ids[4])
+            self.assertNotEqual(fname_ids[2], fname_ids[3])
+
+    def test_numpy_columns(self):
+        try:
+            import numpy as np
+        except ImportError:
+            raise unittest.SkipTest("needs numpy")
+        self._write(['f', 'g', 'f'])
+        reader = HistoryLogReader(self.path)
+        call_nums = reader.column('call_num')
+        elapsed = reader.column('elapsed_secs')
+        self.assertIsInstance(call_nums, np.ndarray)
+        self.assertEqual(call_nums.dtype, np.dtype('<i8'))
+        self.assertEqual(call_nums.tolist(), [1, 2, 3])
+        self.assertEqual(elapsed.tolist(), [0.5, 0.5, 0.5])
+        self.assertEqual(reader.string(int(reader.column('prefixed_fname')[1])), 'g')
+        # the arrays view the mapping, which close() leaves to them
+        reader.close()
+        self.assertEqual(call_nums.tolist(), [1, 2, 3])
+
+    def test_generator_stats(self):
+        writer = HistoryLogWriter(self.path)
+        writer.append(1, [], (), (), OrderedDict(), OrderedDict(), {},
+                      None, 0.5, 1000.0, 'g', ['<module>'],
+                      items_yielded=3, first_item_secs=0.25)
+        writer.append(2, [], (), (), OrderedDict(), OrderedDict(), {},
+                      None, 0.5, 1000.0, 'f', ['<module>'])
+        writer.close()
+        with HistoryLogReader(self.path) as reader:
+            self.assertEqual([(rec.items_yielded, rec.first_item_secs) for rec in reader],
+                             [(3, 0.25), (None, None)])
+
+    def test_not_a_history_log(self):
+        with open(self.path, 'wb') as fp:
+            fp.write(b'call_num|a\n')
+        with self.assertRaises(ValueError):
+            HistoryLogReader(self.path)
+
+    def test_start_stop_history_log(self):
+        @record_history()
+        def f(a, b=2):
+            return a + b
+
+        f(0)
+        f.stats.start_history_log(self.path)
+        f(1)
+        f(2, b=3)
+        f.stats.stop_history_log()
+        f(3)
+
+        with HistoryLogReader(self.path) as reader:
+            recs = list(reader)
+        self.assertEqual([rec.call_num for rec in recs], [2, 3])
+        self.assertEqual([rec.retval for rec in recs], ['3', '5'])
+        self.assertEqual(recs[1].explicit_kwargs, OrderedDict([('b', '3')]))
+        self.assertEqual(recs[1].prefixed_func_name, 'f')
+        self.assertEqual(len(f.stats.history), 4)
+
+    def test_failing_repr(self):
+        class NoRepr():
+            def __repr__(self):
+                raise RuntimeError("no repr")
+
+        @record_history()
+        def f(a):
+            return a
+
+        f.stats.start_history_log(self.path)
+        for _ in range(4):
+            f(NoRepr())
+        self.assertEqual([rec.call_num for rec in f.stats.history], [1, 2, 3, 4])
+        f.stats.stop_history_log()
+        with HistoryLogReader(self.path) as reader:
+            recs = list(reader)
+        self.assertEqual([rec.call_num for rec in recs], [1, 2, 3, 4])
+        self.assertEqual(recs[0].argvals, ('<NoRepr object (repr failed)>',))
+
+    def test_failing_log_append_loses_no_history(self):
+        @record_history()
+        def f(a):
+            return a
+
+        f.stats.start_history_log(self.path)
+        log = f.stats._proxied_instance_._history_log
+        append = log.append
+        def flaky_append(call_num, *rest):
+            if call_num == 2:
+                raise OSError("disk full")
+            return append(call_num, *rest)
+        log.append = flaky_append
+        for x in range(4):
+            f(x)
+        self.assertEqual([rec.call_num for rec in f.stats.history], [1, 2, 3, 4])
+        f.stats.stop_history_log()
+        with HistoryLogReader(self.path) as reader:
+            self.assertEqual([rec.call_num for rec in reader], [1, 3, 4])
@@ -732,7 +732,7 @@ write settings using the `log_calls` keywords as keys:
 The `log_calls_settings` attribute has a length:
 
     >>> len(f.log_calls_settings)
-    14
+    18
 
 Its keys and items can be iterated through:
 
@@ -744,7 +744,9 @@ Its keys and items can be iterated through:
      'indent', 'log_call_numbers',
      'prefix', 'file',
      'logger', 'loglevel',
-     'record_history', 'max_history']
+     'record_history', 'max_history',
+     'history_spill_file', 'history_sample',
+     'overhead_budget', 'record_retval_stats']
     >>> items = []
     >>> for k, v in f.log_calls_settings.items(): items.append((k, v))
     >>> items                                           # doctest: +NORMALIZE_WHITESPACE
@@ -753,7 +755,9 @@ Its keys and items can be iterated through:
      ('indent', False),         ('log_call_numbers', False),
      ('prefix', ''),            ('file', None),
      ('logger', None),          ('loglevel', 10),
-     ('record_history', False), ('max_history', 0)]
+     ('record_history', False), ('max_history', 0),
+     ('history_spill_file', None), ('history_sample', None),
+     ('overhead_budget', None), ('record_retval_stats', False)]
 
 You can use `in` to test for key membership:
 
@@ -845,7 +849,9 @@ but using `as_dict()` is sufficient):
                  ('indent', False),           ('log_call_numbers', False),
                  ('prefix', ''),              ('file', None),
                  ('logger', None),            ('loglevel', 10),
-                 ('record_history', False),   ('max_history', 0)])
+                 ('record_history', False),   ('max_history', 0),
+                 ('history_spill_file', None), ('history_sample', None),
+                 ('overhead_budget', None), ('record_retval_stats', False)])
 
 change settings temporarily:
 
@@ -870,7 +876,7 @@ dictionary rather than keywords:
 
 **NOTES**:
 
-1. *The [`max_history`](#max_history-parameter) setting is immutable (no other setting is), and attempts to change it
+1. *The [`max_history`](#max_history-parameter), `history_spill_file` and `history_sample` settings are immutable (no other setting is), and attempts to change them
 directly (e.g.* `f.log_calls_settings.max_history = anything`) *raise* `ValueError`.
 *Nevertheless, it* is *an item in the retrieved settings dictionaries. To allow for
 the use-case just illustrated, `update()` is considerate enough to skip over
@@ -887,7 +893,7 @@ def main__indirect_parameter_values__dynamic_control():
     """
 ##[Dynamic control of settings with indirect values](id:Indirect-values)
 
-Every parameter of `log_calls` except `prefix` and `max_history` can take
+Every parameter of `log_calls` except `prefix`, `max_history`, `history_spill_file`, `history_sample` and `overhead_budget` can take
 two kinds of values: *direct* and *indirect*, which you can think of as
 *static* and *dynamic* respectively. Direct/static values are actual values
 used when the decorated function is interpreted, e.g. `enabled=True`,
@@ -900,7 +906,7 @@ value has no effect on the decorator's setting.
 
 `log_calls` provides a second way to overcome this limitation. The decorator
 lets you specify any parameter
-except `prefix` or `max_history` with one level of indirection, by using
+except `prefix`, `max_history`, `history_spill_file`, `history_sample` or `overhead_budget` with one level of indirection, by using
 *indirect values*: an indirect value is a string that names a keyword argument
 *of the decorated function*. It can be an explicit keyword argument present
 in the signature of the function, or an implicit keyword argument that ends up
@@ -1237,19 +1243,22 @@ presents CSVs nicely:
                            defaulted_kwargs=OrderedDict([('x', 1)]), implicit_kwargs={},
                            retval=None, elapsed_secs=2.1457672119140625e-06,
                            timestamp='10/28/14 15:56:13.733763',
-                           prefixed_func_name='f', caller_chain=['<module>'])
+                           prefixed_func_name='f', caller_chain=['<module>'],
+                           items_yielded=None, first_item_secs=None)
     CallRecord(call_num=2, argnames=['a'], argvals=(1,), varargs=(100, 101),
                            explicit_kwargs=OrderedDict([('x', 1000)]),
                            defaulted_kwargs=OrderedDict(), implicit_kwargs={'y': 1001},
                            retval=None, elapsed_secs=1.9073486328125e-06,
                            timestamp='10/28/14 15:56:13.734102',
-                           prefixed_func_name='f', caller_chain=['<module>'])
+                           prefixed_func_name='f', caller_chain=['<module>'],
+                           items_yielded=None, first_item_secs=None)
     CallRecord(call_num=3, argnames=['a'], argvals=(10,), varargs=(20,),
                            explicit_kwargs=OrderedDict(),
                            defaulted_kwargs=OrderedDict([('x', 1)]), implicit_kwargs={'z': 5000},
                            retval=None, elapsed_secs=2.1457672119140625e-06,
                            timestamp='10/28/14 15:56:13.734412',
-                           prefixed_func_name='f', caller_chain=['<module>'])
+                           prefixed_func_name='f', caller_chain=['<module>'],
+                           items_yielded=None, first_item_secs=None)
 
 #####The *CallRecord* namedtuple
 For the record, the records that comprise a decorated function's history are
@@ -1297,13 +1306,15 @@ Here's `g`'s call history:
                            defaulted_kwargs=OrderedDict(), implicit_kwargs={},
                            retval=None, elapsed_secs=2.1457672119140625e-06,
                            timestamp='10/28/14 20:51:12.376714',
-                           prefixed_func_name='g', caller_chain=['<module>'])
+                           prefixed_func_name='g', caller_chain=['<module>'],
+                           items_yielded=None, first_item_secs=None)
     CallRecord(call_num=3, argnames=['a'], argvals=(2,), varargs=(),
                            explicit_kwargs=OrderedDict(),
                            defaulted_kwargs=OrderedDict(), implicit_kwargs={},
                            retval=None, elapsed_secs=2.1457672119140625e-06,
                            timestamp='10/28/14 20:51:12.376977',
-                           prefixed_func_name='g', caller_chain=['<module>'])
+                           prefixed_func_name='g', caller_chain=['<module>'],
+                           items_yielded=None, first_item_secs=None)
 
 The first call (`call_num=1`) was discarded to make room for the last call
 (`call_num=3`) because the call history size is set to 2.
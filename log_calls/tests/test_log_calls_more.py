@@ -200,6 +200,58 @@ but now we do get output:
     pass
 
 
+def main__loggers_that_wont_emit__more():
+    """
+## Nothing is formatted for a logger that won't emit the messages
+
+If the logger isn't enabled for `loglevel`, or none of its handlers would take
+the messages, `log_calls` doesn't make them -- here, arguments aren't even
+`repr`'d. Calls are still counted, timed, and recorded:
+
+    >>> import logging
+    >>> import sys
+    >>> class Noisy():
+    ...     def __repr__(self):
+    ...         print("repr'd!")
+    ...         return 'Noisy()'
+    >>> ch = logging.StreamHandler(stream=sys.stdout)
+    >>> quiet_logger = logging.getLogger('quiet_logger')
+    >>> quiet_logger.addHandler(ch)
+    >>> quiet_logger.propagate = False
+    >>> quiet_logger.setLevel(logging.INFO)
+    >>> @log_calls(logger=quiet_logger, loglevel=logging.DEBUG,
+    ...            log_retval=True, record_history=True)
+    ... def f(x): return 17
+    >>> f(Noisy())
+    17
+    >>> f.stats.num_calls_logged, len(f.stats.history)
+    (1, 1)
+    >>> f.stats.history[0].caller_chain
+    ['<module>']
+
+Once the logger will emit them, the messages are made and written:
+
+    >>> quiet_logger.setLevel(logging.DEBUG)
+    >>> f(Noisy())
+    repr'd!
+    f <== called by <module>
+        arguments: x=Noisy()
+        f return value: 17
+    f ==> returning to <module>
+    17
+
+The handler's level counts too:
+
+    >>> ch.setLevel(logging.INFO)
+    >>> f(Noisy())
+    17
+    >>> f.stats.num_calls_logged, len(f.stats.history)
+    (3, 3)
+    >>> quiet_logger.removeHandler(ch)
+    """
+    pass
+
+
 def main__inner_functions__more():
     """
 ## log_calls_settings of an inner function
@@ -231,6 +283,680 @@ Call it:
     pass
 
 
+def main__disabled_fast_path__more():
+    """
+## Disabled calls don't walk the stack, but chains & indentation are intact
+
+Disabled decorated functions skip straight to calling the wrapped function.
+They still show up (unnumbered) in the call chains of enabled descendants,
+which still get the indentation of the nearest *enabled* decorated caller:
+
+    >>> @log_calls(indent=True, log_call_numbers=True, log_args=False)
+    ... def leaf(): pass
+    >>> @log_calls(enabled=False, indent=True, log_call_numbers=True)
+    ... def off_1(): leaf()
+    >>> @log_calls(enabled='on=', indent=True)
+    ... def off_2(**kwargs): off_1()
+    >>> @log_calls(indent=True, log_call_numbers=True, log_args=False)
+    ... def top(): off_2(on=False); leaf()
+    >>> top()
+    top [1] <== called by <module>
+        leaf [1] <== called by off_1 <== off_2 <== top [1]
+        leaf [1] ==> returning to off_1 ==> off_2 ==> top [1]
+        leaf [2] <== called by top [1]
+        leaf [2] ==> returning to top [1]
+    top [1] ==> returning to <module>
+
+Disabled calls are counted, but not logged:
+
+    >>> off_1.stats.num_calls_total, off_1.stats.num_calls_logged
+    (1, 0)
+    >>> off_2.stats.num_calls_total, off_2.stats.num_calls_logged
+    (1, 0)
+    >>> off_1()
+    leaf [3] <== called by off_1
+    leaf [3] ==> returning to off_1
+    """
+    pass
+
+
+def main__call_stack__more():
+    """
+## Call chains come from a per-thread (per-task) stack of active calls
+
+Each thread has its own stack of active decorated calls, so a function
+run in another thread doesn't see the decorated function that started it:
+
+    >>> import threading
+    >>> @log_calls(log_args=False)
+    ... def in_thread(): pass
+    >>> @log_calls(log_args=False)
+    ... def spawner():
+    ...     t = threading.Thread(target=in_thread)
+    ...     t.start(); t.join()
+    >>> spawner()
+    spawner <== called by <module>
+    in_thread <== called by run
+    in_thread ==> returning to run
+    spawner ==> returning to <module>
+
+A call that raises is popped off the stack all the same:
+
+    >>> @log_calls(log_args=False, log_exit=False)
+    ... def raiser(): raise ValueError
+    >>> @log_calls(log_args=False, log_exit=False, log_call_numbers=True)
+    ... def catcher():
+    ...     try: raiser()
+    ...     except ValueError: pass
+    >>> catcher()
+    catcher [1] <== called by <module>
+    raiser <== called by catcher [1]
+    >>> raiser()                    # doctest: +ELLIPSIS
+    Traceback (most recent call last):
+        ...
+    ValueError
+    >>> def not_decorated(): raiser()
+    >>> not_decorated()             # doctest: +ELLIPSIS
+    Traceback (most recent call last):
+        ...
+    ValueError
+    """
+    pass
+
+
+def main__call_plan__more():
+    """
+## Changing settings remakes the plan of handlers to call
+
+Handlers whose settings are directly false aren't even looked at during calls;
+which ones are is worked out again after any change to the settings:
+
+    >>> @log_calls(log_args=False, log_exit=False)
+    ... def f(x, **kwargs): return 2 * x
+    >>> _ = f(1)
+    f <== called by <module>
+    >>> f.log_calls_settings.update(log_args=True, log_retval='show_retval=')
+    >>> _ = f(2)
+    f <== called by <module>
+        arguments: x=2
+    >>> _ = f(3, show_retval=True)
+    f <== called by <module>
+        arguments: x=3, [**]kwargs={'show_retval': True}
+        f return value: 6
+    >>> f.log_calls_settings.log_exit = True
+    >>> _ = f(4)
+    f <== called by <module>
+        arguments: x=4
+    f ==> returning to <module>
+    """
+    pass
+
+
+def main__clock__more():
+    """
+## Timing with a nanosecond clock
+
+Elapsed times are measured with time.perf_counter_ns by default and
+accumulated as an exact number of nanoseconds. `set_clock` swaps in another
+clock (here, a fake one that ticks 1500 ns per reading):
+
+    >>> import itertools
+    >>> ticks = itertools.count(0, 1500)
+    >>> log_calls.set_clock(lambda: next(ticks))
+    >>> @log_calls(log_elapsed=True)
+    ... def f(): pass
+    >>> f()
+    f <== called by <module>
+        elapsed time: 0.000002 [secs]
+    f ==> returning to <module>
+    >>> f.stats.elapsed_ns_logged
+    1500
+    >>> f.stats.elapsed_secs_logged
+    1.5e-06
+    >>> f.stats.clear_history()
+    >>> f.stats.elapsed_ns_logged
+    0
+
+Every logged call's elapsed time also goes into a histogram of latencies,
+which gives percentiles (in seconds) without keeping history:
+
+    >>> import io
+    >>> ticks = itertools.count(0, 1000)
+    >>> @log_calls(file=io.StringIO())
+    ... def g(): pass
+    >>> for _ in range(3):
+    ...     g()
+    >>> g.stats.latency_histogram.count
+    3
+    >>> g.stats.latency_percentile(50), g.stats.latency_percentile(99)
+    (1e-06, 1e-06)
+
+Running summaries -- count, min, max, mean, variance, last -- are kept of
+elapsed times (in seconds), and, with record_retval_stats=True, of return
+values that are ints or floats:
+
+    >>> @log_calls(file=io.StringIO(), record_retval_stats=True)
+    ... def h(x): return x * 2
+    >>> for x in (1, 2, 3):
+    ...     _ = h(x)
+    >>> h.stats.elapsed_stats.count, h.stats.elapsed_stats.mean
+    (3, 1e-06)
+    >>> h.stats.retval_stats
+    RunningStats(count=3, min=2, max=6, mean=4.0, variance=2.6666666666666665, last=6)
+
+Values that aren't finite as floats -- nan, infinities, ints too big for
+a float -- are left out of the summary (but are returned, and recorded,
+as usual):
+
+    >>> from log_calls import record_history
+    >>> @record_history(record_retval_stats=True)
+    ... def ret(x): return x
+    >>> for x in (float('nan'), float('inf'), 10**400, 1.0):
+    ...     _ = ret(x)
+    >>> ret.stats.retval_stats.count, ret.stats.retval_stats.mean
+    (1, 1.0)
+    >>> ret.stats.num_calls_logged, len(ret.stats.history)
+    (4, 4)
+    >>> h.stats.clear_history()
+    >>> h.stats.retval_stats.count
+    0
+
+By default, return values aren't summarized:
+
+    >>> @record_history()
+    ... def plain(x): return x
+    >>> _ = plain(1)
+    >>> plain.stats.retval_stats.count
+    0
+    >>> log_calls.set_clock()       # back to time.perf_counter_ns
+    """
+    pass
+
+
+def main__history_timestamps__more():
+    """
+## Timestamps in history
+
+Records keep the raw time of each call; it's formatted, as '%x %X.%f',
+when history is read:
+
+    >>> import datetime, time
+    >>> @log_calls(record_history=True, log_exit=False)
+    ... def f(x): return x
+    >>> before = time.time()
+    >>> f(1)
+    f <== called by <module>
+        arguments: x=1
+    1
+    >>> rec = f.stats.history[0]
+    >>> isinstance(rec.timestamp, str)
+    True
+    >>> ts = datetime.datetime.strptime(rec.timestamp, '%x %X.%f').timestamp()
+    >>> abs(ts - before) < 5
+    True
+    >>> rec.timestamp in f.stats.history_as_csv
+    True
+
+Formatting shares the work across timestamps in the same second,
+with the same results as strftime:
+
+    >>> from log_calls.history import _TimestampFormatter
+    >>> stamps = [before, before + 0.25, before + 1.5]
+    >>> (list(map(_TimestampFormatter(), stamps)) ==
+    ...  [datetime.datetime.fromtimestamp(t).strftime('%x %X.%f') for t in stamps])
+    True
+    """
+    pass
+
+
+def main__overhead_budget__more():
+    """
+## Keeping logging overhead within a budget
+
+With `overhead_budget`, log_calls times its own overhead and logs calls at
+a rate that keeps it within that fraction of the function's own time.
+Logging a function that does next to nothing costs far more than 1% of its
+time, so most calls go unlogged (but are still counted):
+
+    >>> import io
+    >>> @log_calls(overhead_budget=0.01, file=io.StringIO())
+    ... def fast(x): return x
+    >>> for i in range(1000):
+    ...     _ = fast(i)
+    >>> fast.stats.sample_rate < 0.5
+    True
+    >>> fast.stats.num_calls_logged < 500, fast.stats.num_calls_total
+    (True, 1000)
+
+A function that takes a while can afford to have every call logged.
+(Here, a fake clock (see set_clock) that only `slow` advances, by 10ms
+a call, makes logging free.)
+
+    >>> now = [0]
+    >>> log_calls.set_clock(lambda: now[0])
+    >>> @log_calls(overhead_budget=0.5, file=io.StringIO())
+    ... def slow(): now[0] += 10_000_000
+    >>> for i in range(5):
+    ...     slow()
+    >>> slow.stats.sample_rate, slow.stats.num_calls_logged
+    (1.0, 5)
+
+Calls that aren't logged are only counted: the other stats, and history,
+are of the logged calls. `stats.elapsed_secs_estimated` estimates the
+elapsed time of all the calls, counting each logged call 1/sample_rate
+times (its rate when it was logged). Below, the clock ticks by 1000ns
+each time it's read, so each call of `tick` takes 1000ns and logging it
+costs 2000ns more: the rate settles at 0.5 * 1000 / 2000 = 0.25.
+
+    >>> import itertools
+    >>> ticks = itertools.count(0, 1000)
+    >>> log_calls.set_clock(lambda: next(ticks))
+    >>> @log_calls(overhead_budget=0.5, file=io.StringIO())
+    ... def tick(): pass
+    >>> for i in range(9):
+    ...     tick()
+    >>> tick.stats.sample_rate, tick.stats.num_calls_logged, tick.stats.num_calls_total
+    (0.25, 3, 9)
+    >>> tick.stats.elapsed_secs_logged, tick.stats.elapsed_secs_estimated
+    (3e-06, 9e-06)
+    >>> log_calls.set_clock()
+
+When every call is logged, the estimate is just elapsed_secs_logged:
+
+    >>> slow.stats.elapsed_secs_estimated == slow.stats.elapsed_secs_logged
+    True
+
+Without a budget, the rate is 1.0:
+
+    >>> fast.log_calls_settings.overhead_budget = None
+    >>> fast.stats.sample_rate
+    1.0
+    """
+    pass
+
+
+def main__coroutines__more():
+    """
+## Coroutine functions
+
+A decorated `async def` function is logged when its coroutine runs, not
+when it's created: the call chain is that of the awaiting coroutine,
+retval is what awaiting it gives, and the elapsed time is that of the
+whole awaited execution, including time spent suspended. (Here, a fake
+clock (see set_clock) that only `other_work` advances, by 10ms, runs
+while `fetch` is suspended.)
+
+    >>> import asyncio
+    >>> now = [0]
+    >>> log_calls.set_clock(lambda: now[0])
+    >>> async def other_work():
+    ...     now[0] += 10_000_000
+    >>> @log_calls(log_retval=True, indent=True)
+    ... async def fetch(n):
+    ...     await asyncio.sleep(0)
+    ...     return n * 10
+    >>> @log_calls(indent=True)
+    ... async def process(n):
+    ...     return await fetch(n) + 1
+    >>> async def main():
+    ...     other = asyncio.create_task(other_work())
+    ...     return await process(1)
+    >>> asyncio.run(main())
+    process <== called by main
+        arguments: n=1
+        fetch <== called by process
+            arguments: n=1
+            fetch return value: 10
+        fetch ==> returning to process
+    process ==> returning to main
+    11
+    >>> fetch.stats.elapsed_secs_logged
+    0.01
+    >>> log_calls.set_clock()
+
+Call chains and indentation are per task. A coroutine that's the top of
+a task is called by the task; one running in a task spawned by a logged
+call has that call at the end of its chain:
+
+    >>> @log_calls()
+    ... async def spawner():
+    ...     return await asyncio.create_task(fetch(2), name='fetcher')
+    >>> async def main():
+    ...     return await asyncio.create_task(spawner(), name='main-task')
+    >>> asyncio.run(main())
+    spawner <== called by <main-task>
+    fetch <== called by <fetcher> <== spawner
+        arguments: n=2
+        fetch return value: 20
+    fetch ==> returning to <fetcher> ==> spawner
+    spawner ==> returning to <main-task>
+    20
+
+Other asyncio code that awaits a coroutine is just a caller:
+
+    >>> async def main():
+    ...     return await asyncio.wait_for(fetch(3), timeout=None)
+    >>> asyncio.run(main())
+    fetch <== called by wait_for
+        arguments: n=3
+        fetch return value: 30
+    fetch ==> returning to wait_for
+    30
+
+record_history records what the coroutine returned:
+
+    >>> from log_calls import record_history
+    >>> @record_history()
+    ... async def square(x):
+    ...     await asyncio.sleep(0)
+    ...     return x * x
+    >>> async def main():
+    ...     return await asyncio.gather(square(2), square(3))
+    >>> asyncio.run(main())
+    [4, 9]
+    >>> [(rec.argvals, rec.retval) for rec in square.stats.history]
+    [((2,), 4), ((3,), 9)]
+    """
+    pass
+
+
+def main__generators__more():
+    """
+## Generator functions
+
+A decorated generator function returns a generator that delegates to the
+function's own. The call is logged when that's first advanced, and
+completes when it's exhausted (or closed). Its elapsed time is the time
+spent in the generator itself, over all the `next()`s; the number of
+items it yielded, and the time until the first one, are logged with it
+(with `log_elapsed`), and recorded in history. (The clock here ticks by
+1000ns each time it's read.)
+
+    >>> import itertools
+    >>> ticks = itertools.count(0, 1000)
+    >>> log_calls.set_clock(lambda: next(ticks))
+    >>> @log_calls(log_elapsed=True, log_retval=True, record_history=True)
+    ... def countdown(n):
+    ...     while n > 0:
+    ...         yield n
+    ...         n -= 1
+    ...     return 'liftoff'
+    >>> for i in countdown(2):
+    ...     print(i)
+    countdown <== called by <module>
+        arguments: n=2
+    2
+    1
+        countdown return value: liftoff
+        elapsed time: 0.000003 [secs], items yielded: 2, first after: 0.000002 [secs]
+    countdown ==> returning to <module>
+    >>> rec = countdown.stats.history[0]
+    >>> rec.retval, rec.items_yielded, rec.first_item_secs
+    ('liftoff', 2, 2e-06)
+
+`stats` keeps the totals, and the throughput -- items per second of time
+spent in the generator:
+
+    >>> countdown.stats.items_yielded
+    2
+    >>> countdown.stats.first_item_stats.mean
+    2e-06
+    >>> countdown.stats.items_per_sec
+    666666.6666666666
+    >>> log_calls.set_clock()
+
+Values sent to the generator, exceptions thrown into it, and `close()`
+are passed on to the function's generator:
+
+    >>> @log_calls(log_args=False, log_exit=False, record_history=True)
+    ... def echo():
+    ...     try:
+    ...         while True:
+    ...             received = yield
+    ...             if received is not None:
+    ...                 print('echo:', received)
+    ...     finally:
+    ...         print('echo closed')
+    >>> g = echo(); next(g)
+    echo <== called by <module>
+    >>> g.send('hello')
+    echo: hello
+    >>> g.close()
+    echo closed
+    >>> echo.stats.history[0].items_yielded
+    2
+
+Async generator functions are handled the same way:
+
+    >>> import asyncio
+    >>> @log_calls(log_args=False, log_exit=False, record_history=True)
+    ... async def ticker(n):
+    ...     for i in range(n):
+    ...         await asyncio.sleep(0)
+    ...         yield i
+    >>> async def main():
+    ...     items = []
+    ...     async for i in ticker(3):
+    ...         items.append(i)
+    ...     return items
+    >>> asyncio.run(main())
+    ticker <== called by main
+    [0, 1, 2]
+    >>> ticker.stats.items_yielded, ticker.stats.history[0].retval
+    (3, None)
+
+Disabled, a call just delegates to the async generator, values sent
+into it included:
+
+    >>> @log_calls(enabled=False)
+    ... async def running_total():
+    ...     total = 0
+    ...     while True:
+    ...         total += yield total
+    >>> async def add_up():
+    ...     agen = running_total()
+    ...     await agen.asend(None)
+    ...     totals = [await agen.asend(n) for n in (1, 2, 3)]
+    ...     await agen.aclose()
+    ...     return totals
+    >>> asyncio.run(add_up())
+    [1, 3, 6]
+    >>> running_total.stats.num_calls_total, running_total.stats.num_calls_logged
+    (1, 0)
+    """
+    pass
+
+
+def main__report__more():
+    """
+## A profile of all decorated functions
+
+`log_calls.report()` ranks every decorated function (by `log_calls` or
+`record_history`) by total elapsed time, or by another column, optionally
+only those whose prefixed names start with `prefix`, or that are in
+`module`. (Here, the clock ticks by 1000ns each time it's read, so
+every logged call takes 1000ns.)
+
+    >>> import io, itertools
+    >>> from log_calls import record_history
+    >>> ticks = itertools.count(0, 1000)
+    >>> log_calls.set_clock(lambda: next(ticks))
+    >>> record_history.set_clock(lambda: next(ticks))
+    >>> @log_calls(prefix='rpt.', file=io.StringIO())
+    ... def parse(s): return s.split()
+    >>> @record_history(prefix='rpt.')
+    ... def lookup(k): return k
+    >>> @log_calls(prefix='rpt.', enabled=False)
+    ... def idle(): pass
+    >>> for _ in range(3):
+    ...     _ = parse('a b')
+    >>> _ = lookup(1); idle()
+    >>> print(log_calls.report(prefix='rpt.'))   # doctest: +ELLIPSIS
+    function    calls  logged  total secs  mean secs  p99 secs  module
+    rpt.parse       3       3    0.000003   0.000001  0.000001  ...test_log_calls_more
+    rpt.lookup      1       1    0.000001   0.000001  0.000001  ...test_log_calls_more
+    rpt.idle        1       0    0.000000          -         -  ...test_log_calls_more
+    >>> [row.name for row in log_calls.report(sort_by='num_calls_total', prefix='rpt.', top=2)]
+    ['rpt.parse', 'rpt.idle']
+    >>> log_calls.report(prefix='rpt.', module='no.such.module')
+    ()
+    >>> log_calls.set_clock(); record_history.set_clock()
+
+The rows are namedtuples:
+
+    >>> row = log_calls.report(prefix='rpt.lookup')[0]
+    >>> row.deco, row.num_calls_logged, row.mean_secs
+    ('record_history', 1, 1e-06)
+
+`decorated_functions()` lists the functions a decorator class has
+decorated that still exist, by prefixed name; they have `stats`:
+
+    >>> [fn.__name__ for fn in log_calls.decorated_functions()
+    ...  if fn.stats.num_calls_total and fn.__name__ in ('parse', 'idle')]
+    ['idle', 'parse']
+    """
+    pass
+
+
+def main__instrument__more():
+    """
+## Decorating a whole class or module
+
+`log_calls.instrument_class(cls, **settings)` decorates, in place, the
+methods defined in `cls` -- including staticmethods and classmethods, but
+not `__dunder__` methods, unless `include` names them -- giving them the
+prefix `cls.__qualname__ + '.'`. They share a single settings object,
+which it returns; each has its own `stats`.
+
+    >>> from log_calls import record_history
+    >>> class Cart():
+    ...     def __init__(self):
+    ...         self.items = []
+    ...     def add(self, item):
+    ...         self.items.append(item)
+    ...         return self.count()
+    ...     def count(self):
+    ...         return len(self.items)
+    ...     @staticmethod
+    ...     def price(item):
+    ...         return 10
+    ...     @classmethod
+    ...     def empty(cls):
+    ...         return cls()
+    ...     def _check(self):
+    ...         pass
+    >>> settings = log_calls.instrument_class(Cart, exclude='_*', log_retval=True)
+    >>> cart = Cart.empty()         # doctest: +ELLIPSIS
+    Cart.empty <== called by <module>
+        arguments: cls=<class '...Cart'>
+        Cart.empty return value: <...
+    Cart.empty ==> returning to <module>
+    >>> _ = cart.add('pen')         # doctest: +ELLIPSIS
+    Cart.add <== called by <module>
+        arguments: self=<...Cart object at 0x...>, item='pen'
+    Cart.count <== called by Cart.add
+        arguments: self=<...Cart object at 0x...>
+        Cart.count return value: 1
+    Cart.count ==> returning to Cart.add
+        Cart.add return value: 1
+    Cart.add ==> returning to <module>
+    >>> Cart.price('pen')
+    Cart.price <== called by <module>
+        arguments: item='pen'
+        Cart.price return value: 10
+    Cart.price ==> returning to <module>
+    10
+
+Changing a setting changes it for all of the methods:
+
+    >>> settings.log_args = False
+    >>> Cart.count.log_calls_settings is settings
+    True
+    >>> cart.count()
+    Cart.count <== called by <module>
+        Cart.count return value: 1
+    Cart.count ==> returning to <module>
+    1
+    >>> settings.enabled = False
+    >>> _ = cart.add('ink')
+    >>> Cart.count.stats.num_calls_logged, Cart.count.stats.num_calls_total
+    (2, 3)
+    >>> cart._check.__name__, hasattr(cart._check, 'stats')
+    ('_check', False)
+
+`include` and `exclude` are names or fnmatch-style patterns, or lists of
+them. Methods that are already decorated are left alone:
+
+    >>> class Point():
+    ...     def __init__(self, x):
+    ...         self.x = x
+    ...     @log_calls(prefix='P.', log_args=False)
+    ...     def norm(self):
+    ...         return abs(self.x)
+    >>> _ = record_history.instrument_class(Point, include=['__init__', 'norm'])
+    >>> Point(-2).norm()
+    P.norm <== called by <module>
+    P.norm ==> returning to <module>
+    2
+    >>> Point.__init__.stats.num_calls_logged
+    1
+
+`instrument_module(module, **settings)` does the same for the functions
+defined in a module (not those it imports), with the prefix
+`module.__name__ + '.'`. Only calls through the module's namespace are
+logged, so a function imported from the module beforehand is unaffected:
+
+    >>> import types
+    >>> shop = types.ModuleType('shop')
+    >>> exec('''
+    ... from os.path import join
+    ... def checkout(cart): return total(cart) + 1
+    ... def total(cart): return len(cart)
+    ... ''', vars(shop))
+    >>> shared = record_history.instrument_module(shop, include=['checkout', 'total', 'join'])
+    >>> shop.checkout([1, 2])
+    3
+    >>> [rec.prefixed_func_name for rec in shop.total.stats.history]
+    ['shop.total']
+    >>> shop.total.stats.history[0].caller_chain
+    ['shop.checkout [1]']
+    >>> hasattr(shop.join, 'stats')
+    False
+
+Clearing the history of one of the functions clears that of them all,
+as they share `max_history` and `history_sample` too:
+
+    >>> shop.total.stats.clear_history(max_history=1)
+    >>> shared.max_history, shop.checkout.stats.num_calls_logged
+    (1, 0)
+    >>> for n in range(3):
+    ...     _ = shop.checkout([n])
+    >>> len(shop.checkout.stats.history), len(shop.total.stats.history)
+    (1, 1)
+
+A class defined in a function gets its qualname as prefix, without
+`<locals>`:
+
+    >>> def make_greeter():
+    ...     class Greeter():
+    ...         def hello(self): return 'hi'
+    ...     return Greeter
+    >>> Greeter = make_greeter()
+    >>> _ = record_history.instrument_class(Greeter)
+    >>> _ = Greeter().hello()
+    >>> Greeter.hello.stats.history[0].prefixed_func_name
+    'make_greeter.Greeter.hello'
+
+As the functions share settings, they can't share a `history_spill_file`:
+
+    >>> log_calls.instrument_module(shop, history_spill_file='spill.jsonl')
+    Traceback (most recent call last):
+        ...
+    ValueError: functions decorated together can't share a history_spill_file
+    """
+    pass
+
+
 def main__methods__more():
     """
 ## instance methods, classmethods, staticmethods
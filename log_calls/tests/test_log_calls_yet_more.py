@@ -3,11 +3,21 @@ __version__ = '0.1.14'
 
 from log_calls import record_history
 
+import os
+import tempfile
 import unittest
 
 from unittest import TestCase
 
+# history_as_DataFrame needs both (pip install log_calls[pandas])
+try:
+    import numpy
+    import pandas as pd
+except ImportError:
+    pd = None
 
+
+@unittest.skipUnless(pd, "requires pandas and numpy")
 class TestDF(TestCase):
 
     def test__history_as_DataFrame(self):
@@ -21,10 +31,137 @@ class TestDF(TestCase):
 
         df = f.stats.history_as_DataFrame
 
-        try:
-            import pandas as pd
-        except ImportError:
-            self.assertEqual(df, None)
-        else:
-            self.assertIsInstance(df, pd.DataFrame)
-            self.assertEqual(len(df.retval), 1000)
+        self.assertIsInstance(df, pd.DataFrame)
+        self.assertEqual(len(df.retval), 1000)
+        self.assertEqual(list(df.columns),
+                         ['a', 'b', 'x', 'retval', 'elapsed_secs', 'timestamp',
+                          'prefixed_fname', 'caller_chain'])
+        self.assertEqual(df.index.name, 'call_num')
+        self.assertEqual(df.x.iloc[999], 999)
+        self.assertEqual(str(df.elapsed_secs.dtype), 'float64')
+        self.assertEqual(str(df.timestamp.dtype), 'datetime64[ns]')
+        self.assertEqual(str(df.prefixed_fname.dtype), 'category')
+        self.assertEqual(list(df.caller_chain.cat.categories), ["['test__history_as_DataFrame']"])
+
+    def test__history_as_DataFrame_generator(self):
+        from log_calls import record_history
+
+        @record_history(max_history=3)
+        def gen(n, *rest, **kw):
+            yield from range(n)
+
+        self.assertEqual(
+            [str(dtype) for dtype in gen.stats.history_as_DataFrame.dtypes],
+            ['object', 'object', 'object', 'object', 'float64', 'Int64', 'float64',
+             'datetime64[ns]', 'category', 'category'])
+
+        for n in range(5):
+            list(gen(n, 'x', k=n))
+        df = gen.stats.history_as_DataFrame
+        self.assertEqual(list(df.index), [3, 4, 5])     # the last max_history
+        self.assertEqual(list(df.n), [2, 3, 4])
+        self.assertEqual(list(df.rest), [('x',)] * 3)
+        self.assertEqual(list(df.kw), [{'k': 2}, {'k': 3}, {'k': 4}])
+        self.assertEqual(list(df.items_yielded), [2, 3, 4])
+        self.assertFalse(df.first_item_secs.isna().any())
+        self.assertEqual(str(df.timestamp.dtype), 'datetime64[ns]')
+
+        list(gen(0))    # yields nothing
+        df = gen.stats.history_as_DataFrame
+        self.assertTrue(numpy.isnan(df.first_item_secs.iloc[-1]))
+
+    def test__history_as_DataFrame_spilled(self):
+        from log_calls import record_history
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            @record_history(max_history=2,
+                            history_spill_file=os.path.join(tmpdir, 'spill.jsonl'))
+            def f(a):
+                return a * 2
+
+            for i in range(5):
+                f(i)
+            df = f.stats.history_as_DataFrame
+            f.stats.clear_history()     # closes the spill file
+        self.assertEqual(list(df.index), [1, 2, 3, 4, 5])
+        self.assertEqual(list(df.a), [0, 1, 2, 3, 4])
+        self.assertEqual(list(df.retval), [0, 2, 4, 6, 8])
+
+    def test__report_as_DataFrame(self):
+        from log_calls import log_calls
+
+        @log_calls(prefix='df_report.', enabled=False)
+        def g(): pass
+
+        g()
+        df = log_calls.report(prefix='df_report.').as_DataFrame
+
+        self.assertIsInstance(df, pd.DataFrame)
+        self.assertEqual(list(df.index), ['df_report.g'])
+        self.assertEqual(df.num_calls_total.iloc[0], 1)
+
+
+@unittest.skipIf(pd, "pandas and numpy are installed")
+class TestNoDF(TestCase):
+
+    def test_no_DataFrames(self):
+        from log_calls import log_calls
+
+        @log_calls(prefix='no_df.', enabled=False)
+        def g(): pass
+
+        g()
+        self.assertIsNone(g.stats.history_as_DataFrame)
+        self.assertIsNone(log_calls.report(prefix='no_df.').as_DataFrame)
+
+
+class TestPrefixedNamesByCode(TestCase):
+
+    def test_code_not_kept_alive(self):
+        import gc
+        from log_calls import log_calls
+
+        # (Not a nested def: its code would live on in the enclosing code's constants)
+        namespace = {'log_calls': log_calls}
+        exec("@log_calls(prefix='gone.', enabled=False)\n"
+             "def f(): pass", namespace)
+        by_code = log_calls._prefixed_names_by_code
+        code = namespace['f'].__wrapped__.__code__
+        self.assertEqual(by_code[code], 'gone.f')
+        del namespace, code
+        gc.collect()
+        self.assertNotIn('gone.f', list(by_code.values()))
+
+
+class TestActiveCallFrames(TestCase):
+
+    def test_task_doesnt_keep_call_alive(self):
+        import asyncio
+        import gc
+        import io
+        import weakref
+        from log_calls import log_calls
+
+        class Payload():
+            pass
+
+        async def forever():
+            await asyncio.Event().wait()
+
+        @log_calls(file=io.StringIO())
+        def start(payload):
+            # The task's context is a copy of this call's, stack and all
+            start.task = asyncio.get_running_loop().create_task(forever())
+            return Payload()
+
+        async def main():
+            payload = Payload()
+            refs = (weakref.ref(payload), weakref.ref(start(payload)))
+            del payload
+            await asyncio.sleep(0)      # the task is running now
+            gc.collect()
+            alive = [ref() is not None for ref in refs]
+            start.task.cancel()
+            return alive
+
+        self.assertEqual(asyncio.run(main()), [False, False])
@@ -0,0 +1,82 @@
+import doctest
+import math
+import random
+from unittest import TestCase
+
+from log_calls import metrics
+from log_calls.metrics import LatencyHistogram, RunningStats
+
+
+class TestLatencyHistogram(TestCase):
+
+    def test_relative_error(self):
+        h = LatencyHistogram()
+        values = sorted(random.randrange(1, 10**10) for _ in range(10000))
+        for ns in values:
+            h.record(ns)
+        for q in (50, 90, 99, 99.9):
+            exact = values[math.ceil(len(values) * q / 100) - 1]
+            self.assertLessEqual(abs(h.percentile(q) - exact) / exact, 1 / 64)
+
+    def test_fixed_memory(self):
+        h = LatencyHistogram()
+        for ns in range(0, 10**9, 10**4):
+            h.record(ns)
+        n = len(h.counts)
+        for ns in range(0, 10**9, 10**3):
+            h.record(ns)
+        self.assertEqual(len(h.counts), n)
+        self.assertLess(n, 2000)
+
+    def test_merge_and_serialize(self):
+        a, b, both = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        for ns in range(1000, 2000):
+            a.record(ns)
+            both.record(ns)
+        for ns in range(10**6, 10**6 + 500):
+            b.record(ns)
+            both.record(ns)
+        a.merge(LatencyHistogram.from_bytes(b.to_bytes()))
+        self.assertEqual(a, both)
+        self.assertEqual(a.min_ns, 1000)
+        self.assertEqual(a.max_ns, 10**6 + 499)
+        self.assertEqual(LatencyHistogram.from_bytes(LatencyHistogram().to_bytes()),
+                         LatencyHistogram())
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            LatencyHistogram().merge(LatencyHistogram(precision=5))
+        with self.assertRaises(ValueError):
+            LatencyHistogram.from_bytes(b'\0' * 40)
+        with self.assertRaises(ValueError):
+            LatencyHistogram().percentile(101)
+        self.assertIsNone(LatencyHistogram().percentile(50))
+
+
+class TestRunningStats(TestCase):
+
+    def test_matches_two_pass(self):
+        rs = RunningStats()
+        values = [1e9 + random.random() for _ in range(1000)]
+        for x in values:
+            rs.add(x)
+        mean = math.fsum(values) / len(values)
+        variance = math.fsum((x - mean) ** 2 for x in values) / len(values)
+        self.assertEqual(rs.count, 1000)
+        self.assertAlmostEqual(rs.mean - 1e9, mean - 1e9, places=5)
+        self.assertAlmostEqual(rs.variance / variance, 1.0, places=6)
+        self.assertEqual((rs.min, rs.max, rs.last), (min(values), max(values), values[-1]))
+
+    def test_empty_and_single(self):
+        rs = RunningStats()
+        self.assertIsNone(rs.variance)
+        self.assertIsNone(rs.stdev)
+        rs.add(3)
+        self.assertEqual((rs.mean, rs.variance, rs.stdev), (3.0, 0.0, 0.0))
+        self.assertIsNone(rs.sample_variance)
+
+
+# For unittest integration
+def load_tests(loader, tests, ignore):
+    tests.addTests(doctest.DocTestSuite(metrics))
+    return tests
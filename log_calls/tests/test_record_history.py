@@ -36,13 +36,17 @@ We'll use the following function in our examples:
     ...     return a * x + b
 
 ## [Keyword Parameters](id:parameters)
-`record_history` has only three keyword parameters:
+`record_history` has only seven keyword parameters:
 
 Keyword parameter | Default value | Description
 ----------------: | :------------ | :------------------
        `enabled`    | `True`          | When true, call history will be recorded
        `prefix`     | ``              | A `str` to prefix the function name with in call records
        `max_history`    | 0           | An `int`. *value* > 0 --> store at most *value*-many records, oldest records overwritten; *value* ≤ 0 --> store unboundedly many records.
+       `history_spill_file` | `None`  | A path. If `max_history` > 0, records pushed out of memory are appended to this file rather than discarded, and remain part of the history.
+       `history_sample` | `None`      | Which calls to record: `None`, 0 or 1 --> all; an `int` *n* > 1 --> every *n*-th; a `float` *p* < 1 --> each with probability *p*; `'reservoir'` --> a uniform random sample of `max_history` records of all calls.
+       `overhead_budget` | `None`     | A `float`: the fraction of the function's own time that recording may add. Calls are then recorded at an adaptive rate, `stats.sample_rate`; `stats.elapsed_secs_estimated` reweights their elapsed time to all calls.
+       `record_retval_stats` | `False` | When true, keep `stats.retval_stats`, a running summary of the return values that are `int`s or `float`s.
 
 Setting `enabled` to true in `record_history` is like setting both `enabled`
 and `record_history` to true in `log_calls`.
@@ -55,13 +59,17 @@ These settings are accessible dynamically through the `record_history_settings`
 attribute of a decorated function.
 
     >>> len(record_me.record_history_settings)
-    3
-    >>> list(record_me.record_history_settings)
-    ['enabled', 'prefix', 'max_history']
-    >>> list(record_me.record_history_settings.items())
-    [('enabled', True), ('prefix', ''), ('max_history', 0)]
+    7
+    >>> list(record_me.record_history_settings)             # doctest: +NORMALIZE_WHITESPACE
+    ['enabled', 'prefix', 'max_history', 'history_spill_file', 'history_sample',
+     'overhead_budget', 'record_retval_stats']
+    >>> list(record_me.record_history_settings.items())     # doctest: +NORMALIZE_WHITESPACE
+    [('enabled', True), ('prefix', ''), ('max_history', 0), ('history_spill_file', None),
+     ('history_sample', None), ('overhead_budget', None), ('record_retval_stats', False)]
     >>> record_me.record_history_settings.as_OrderedDict()  # doctest: +NORMALIZE_WHITESPACE
-    OrderedDict([('enabled', True), ('prefix', ''), ('max_history', 0)])
+    OrderedDict([('enabled', True), ('prefix', ''), ('max_history', 0),
+                 ('history_spill_file', None), ('history_sample', None),
+                 ('overhead_budget', None), ('record_retval_stats', False)])
 
 ## [Call history and statistics for *record_history*](id:Call-history-and-statistics-record_history)
 We'll just give a few examples here to show that the `stats` attribute of `record_history`
@@ -223,6 +231,106 @@ numerical inaccuracy:
     >>> abs(sum(elapsed_col) - slow.stats.elapsed_secs_logged) < 1.0e-15
     True
 
+##[Spilling old records to a file](id:history_spill_file)
+With `max_history` > 0 and a `history_spill_file`, records pushed out of memory
+are appended to the file, and are still part of the history:
+
+    >>> import os, tempfile
+    >>> spill_dir = tempfile.TemporaryDirectory()
+    >>> @record_history(max_history=2,
+    ...                 history_spill_file=os.path.join(spill_dir.name, 'f.jsonl'))
+    ... def f(n): return [n] * n
+    >>> for n in range(5):
+    ...     _ = f(n)
+    >>> len(f.stats.history)
+    5
+    >>> with open(f.record_history_settings.history_spill_file) as fp:
+    ...     len(fp.readlines())
+    3
+    >>> [(rec.argvals, rec.retval) for rec in f.stats.history]
+    [((0,), []), ((1,), [1]), ((2,), [2, 2]), ((3,), [3, 3, 3]), ((4,), [4, 4, 4, 4])]
+    >>> f.stats.clear_history(max_history=2)
+    >>> os.path.getsize(f.record_history_settings.history_spill_file)
+    0
+    >>> spill_dir.cleanup()
+
+##[Sampled history](id:history_sample)
+`history_sample` records only some calls, while the tallies still count them all.
+Every 10th call:
+
+    >>> @record_history(history_sample=10)
+    ... def g(n): return n
+    >>> for n in range(95):
+    ...     _ = g(n)
+    >>> [rec.call_num for rec in g.stats.history]
+    [1, 11, 21, 31, 41, 51, 61, 71, 81, 91]
+    >>> g.stats.num_calls_logged
+    95
+
+A uniform random sample of 5 records of all calls, in the order they were made:
+
+    >>> @record_history(history_sample='reservoir', max_history=5)
+    ... def h(n): return n
+    >>> for n in range(1000):
+    ...     _ = h(n)
+    >>> nums = [rec.call_num for rec in h.stats.history]
+    >>> len(nums), nums == sorted(nums), h.stats.num_calls_logged
+    (5, True, 1000)
+
+A reservoir needs a size:
+
+    >>> h.stats.clear_history(history_sample='reservoir')
+    Traceback (most recent call last):
+        ...
+    ValueError: history_sample='reservoir' requires max_history > 0
+
+##[Streaming call history as CSV](id:write_history_csv)
+`stats.write_history_csv(fp, start=None, stop=None)` writes the CSV to a file,
+a row at a time, optionally for just a slice of the history;
+`stats.iter_history_csv(start=None, stop=None)` generates its lines:
+
+    >>> import io
+    >>> @record_history()
+    ... def echo(s): return s
+    >>> for s in ('a', 'b|c', 'say "hi"'):
+    ...     _ = echo(s)
+    >>> fp = io.StringIO(newline='')
+    >>> echo.stats.write_history_csv(fp, start=1)
+    >>> print(fp.getvalue())                        # doctest: +ELLIPSIS
+    call_num|s|retval|elapsed_secs|timestamp|prefixed_fname|caller_chain
+    2|"'b|c'"|"'b|c'"|...|...|'echo'|['<module>']
+    3|"'say ""hi""'"|"'say ""hi""'"|...|...|'echo'|['<module>']
+    <BLANKLINE>
+    >>> lines = list(echo.stats.iter_history_csv(stop=1))
+    >>> lines[1]                                    # doctest: +ELLIPSIS
+    "1|'a'|'a'|...|...|'echo'|['<module>']\\n"
+    >>> ''.join(echo.stats.iter_history_csv()) == echo.stats.history_as_csv
+    True
+
+The lines are of the records in history when iteration starts, whatever
+calls are made (and recorded) while it's suspended:
+
+    >>> @record_history(max_history=2)
+    ... def ring(n): return n
+    >>> for n in range(3):
+    ...     _ = ring(n)
+    >>> lines = ring.stats.iter_history_csv()
+    >>> _ = next(lines)             # headings
+    >>> for n in range(3, 6):
+    ...     _ = ring(n)
+    >>> [rec.call_num for rec in ring.stats.history]
+    [5, 6]
+    >>> [line.split('|')[1] for line in lines]
+    ['1', '2']
+
+Fields are quoted, as by the csv module, only if they contain the separator,
+quotes or newlines, so the csv module reads them back:
+
+    >>> import csv
+    >>> rows = list(csv.reader(io.StringIO(echo.stats.history_as_csv), delimiter='|'))
+    >>> [row[1] for row in rows]
+    ['s', "'a'", "'b|c'", '\\'say "hi"\\'']
+
     """
     pass
 
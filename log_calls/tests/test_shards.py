@@ -0,0 +1,154 @@
+import doctest
+import io
+import threading
+from unittest import TestCase
+
+from log_calls import log_calls, record_history, shards
+from log_calls.shards import ShardedStats
+
+
+def _run_threads(target, n_threads):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(n_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+class TestShardedStats(TestCase):
+
+    def test_finished_threads_retired(self):
+        stats = ShardedStats()
+        def work(i):
+            shard = stats.shard()
+            shard.num_calls_total += 10
+            shard.pending.append((i,))
+        _run_threads(work, 5)
+        self.assertEqual(stats.sum('num_calls_total'), 50)
+        self.assertEqual(stats._shards, [])
+        self.assertEqual(stats.drain_pending(), [(0,), (1,), (2,), (3,), (4,)])
+        self.assertEqual(stats.drain_pending(), [])
+
+    def test_finished_threads_retired_without_reads(self):
+        stats = ShardedStats()
+        def work(i):
+            stats.shard().num_calls_total += 1
+        for i in range(200):
+            _run_threads(work, 1)
+        self.assertLessEqual(len(stats._shards), 1)
+        self.assertEqual(stats.sum('num_calls_total'), 200)
+
+    def test_state_made_when_needed(self):
+        stats = ShardedStats()
+        self.assertEqual((stats._local, stats._retired), (None, None))
+        self.assertEqual(stats.sum('num_calls_total'), 0)
+        self.assertEqual(stats.merged('latency').count, 0)
+        self.assertEqual(stats.drain_pending(), [])
+        stats.shard().num_calls_total += 1
+        self.assertIsNone(stats._retired)
+        self.assertEqual(stats.sum('num_calls_total'), 1)
+
+    def test_merged_last(self):
+        stats = ShardedStats()
+        def work(i):
+            shard = stats.shard()
+            shard.retval_stats.add(i)
+            shard.last_call_num = [2, 1][i]
+        _run_threads(work, 2)
+        merged = stats.merged('retval_stats')
+        self.assertEqual((merged.count, merged.last), (2, 0))
+
+
+class TestConcurrentCalls(TestCase):
+    n_threads = 8
+    n_calls = 2000
+
+    def test_no_lost_updates(self):
+        @record_history(record_retval_stats=True)
+        def f(x):
+            return x
+
+        _run_threads(lambda i: [f(1) for _ in range(self.n_calls)], self.n_threads)
+
+        total = self.n_threads * self.n_calls
+        self.assertEqual(f.stats.num_calls_total, total)
+        self.assertEqual(f.stats.num_calls_logged, total)
+        self.assertEqual(f.stats.latency_histogram.count, total)
+        self.assertEqual(f.stats.elapsed_stats.count, total)
+        self.assertEqual(f.stats.retval_stats.count, total)
+        self.assertEqual(f.stats.elapsed_ns_logged, sum(
+            int(rec.elapsed_secs * 1e9 + 0.5) for rec in f.stats.history))
+        call_nums = [rec.call_num for rec in f.stats.history]
+        self.assertEqual(sorted(call_nums), list(range(1, total + 1)))
+
+    def test_call_numbers_unique(self):
+        out = io.StringIO()
+
+        @log_calls(file=out, log_call_numbers=True)
+        def g():
+            pass
+
+        _run_threads(lambda i: [g() for _ in range(100)], 4)
+        entries = [line for line in out.getvalue().splitlines() if '<==' in line]
+        self.assertEqual(len(set(entries)), 400)
+        self.assertEqual(g.stats.num_calls_logged, 400)
+
+    def test_short_threads_history_merged_without_reads(self):
+        @record_history()
+        def f(x):
+            return x
+        for i in range(600):
+            _run_threads(f, 1)
+        sharded = f.stats._proxied_instance_._shards
+        self.assertLessEqual(len(sharded._shards), 1)
+        self.assertLess(sharded.num_retired_pending(), sharded.pending_limit)
+        self.assertEqual(f.stats.num_calls_logged, 600)
+        self.assertEqual([rec.call_num for rec in f.stats.history],
+                         list(range(1, 601)))
+
+    def test_generator_finished_in_another_thread(self):
+        @record_history()
+        def gen():
+            yield 1
+            yield 2
+        started = []
+        def start(i):
+            g = gen()
+            next(g)
+            started.append(g)
+        _run_threads(start, 1)
+        self.assertEqual(gen.stats.num_calls_logged, 1)   # retires the shard
+        self.assertEqual(list(started[0]), [2])
+        self.assertEqual(gen.stats.items_yielded, 2)
+        self.assertEqual(gen.stats.elapsed_stats.count, 1)
+
+    def test_max_history(self):
+        @record_history(max_history=10)
+        def f():
+            pass
+
+        _run_threads(lambda i: [f() for _ in range(1000)], 4)
+        history = f.stats.history
+        self.assertEqual(len(history), 10)
+        # The last merge was of records left pending in every thread,
+        # after the others; they're in call number order.
+        call_nums = [rec.call_num for rec in history]
+        self.assertEqual(call_nums, sorted(call_nums))
+
+    def test_clear_history(self):
+        @record_history()
+        def f():
+            pass
+
+        _run_threads(lambda i: [f() for _ in range(10)], 2)
+        f.stats.clear_history()
+        self.assertEqual(f.stats.num_calls_total, 0)
+        self.assertEqual(f.stats.history, ())
+        f()
+        self.assertEqual([rec.call_num for rec in f.stats.history], [1])
+
+
+# For unittest integration
+def load_tests(loader, tests, ignore):
+    tests.addTests(doctest.DocTestSuite(shards))
+    return tests
@@ -0,0 +1,193 @@
+__author__ = "Brian O'Neill"
+__version__ = '0.2.2'
+
+import io
+import os
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from log_calls import log_calls, QueueSink, BufferedFileSink
+
+
+class BlockingStream(io.StringIO):
+    """A stream whose writes wait until `release` is set."""
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.writing = threading.Event()
+
+    def write(self, s):
+        self.writing.set()
+        self.release.wait()
+        return super().write(s)
+
+
+class TestQueueSink(TestCase):
+
+    def test_log_calls_to_queue_sink(self):
+        out = io.StringIO()
+        sink = QueueSink(out)
+
+        @log_calls(file=sink, log_args=False)
+        def f(): pass
+
+        @log_calls(file=sink, log_retval=True)
+        def g(x):
+            f()
+            return x + 1
+
+        g(1)
+        sink.flush()
+        self.assertEqual(out.getvalue(),
+                         "g <== called by test_log_calls_to_queue_sink\n"
+                         "    arguments: x=1\n"
+                         "f <== called by g\n"
+                         "f ==> returning to g\n"
+                         "    g return value: 2\n"
+                         "g ==> returning to test_log_calls_to_queue_sink\n")
+        sink.close()
+        self.assertTrue(sink.closed)
+        self.assertEqual(sink.dropped, 0)
+
+    def test_print_to_queue_sink(self):
+        out = io.StringIO()
+        sink = QueueSink(out, batch_size=2)
+        for i in range(10):
+            print(i, file=sink)
+        sink.close()
+        self.assertEqual(out.getvalue(), ''.join('%d\n' % i for i in range(10)))
+        self.assertRaises(ValueError, sink.write_message, 'too late')
+
+    def test_raw_batches(self):
+        batches = []
+        sink = QueueSink(batches.append, batch_size=3)
+        for i in range(7):
+            sink.write_message('msg %d' % i)
+        sink.flush()
+        self.assertEqual(sum(batches, []), ['msg %d' % i for i in range(7)])
+        self.assertTrue(all(len(batch) <= 3 for batch in batches))
+        sink.close()
+
+    def _fill(self, overflow):
+        """Stall the writer on msg 0, fill the queue (maxsize 2), add 2 more."""
+        stream = BlockingStream()
+        sink = QueueSink(stream, maxsize=2, overflow=overflow, batch_size=1)
+        sink.write_message('0')
+        stream.writing.wait()
+        for i in range(1, 5):
+            sink.write_message(str(i))
+        stream.release.set()
+        sink.close()
+        return sink, stream.getvalue().split()
+
+    def test_overflow_drop_newest(self):
+        sink, written = self._fill(QueueSink.DROP_NEWEST)
+        self.assertEqual(written, ['0', '1', '2'])
+        self.assertEqual(sink.dropped, 2)
+
+    def test_overflow_drop_oldest(self):
+        sink, written = self._fill(QueueSink.DROP_OLDEST)
+        self.assertEqual(written, ['0', '3', '4'])
+        self.assertEqual(sink.dropped, 2)
+
+    def test_overflow_block(self):
+        stream = BlockingStream()
+        sink = QueueSink(stream, maxsize=1, overflow=QueueSink.BLOCK, batch_size=1)
+        sink.write_message('0')
+        stream.writing.wait()
+        sink.write_message('1')     # fills the queue
+        t = threading.Thread(target=sink.write_message, args=('2',))
+        t.start()
+        t.join(0.05)
+        self.assertTrue(t.is_alive())   # blocked: no room
+        stream.release.set()
+        t.join()
+        sink.close()
+        self.assertEqual(stream.getvalue().split(), ['0', '1', '2'])
+        self.assertEqual(sink.dropped, 0)
+
+    def test_overflow_block_then_close(self):
+        stream = BlockingStream()
+        sink = QueueSink(stream, maxsize=1, overflow=QueueSink.BLOCK, batch_size=1)
+        sink.write_message('0')
+        stream.writing.wait()
+        sink.write_message('1')     # fills the queue
+        t = threading.Thread(target=sink.write_message, args=('2',))
+        t.start()
+        t.join(0.05)
+        self.assertTrue(t.is_alive())   # blocked: no room
+        closer = threading.Thread(target=sink.close)
+        closer.start()
+        t.join()                        # woken by close: dropped
+        stream.release.set()
+        closer.join()
+        self.assertEqual(stream.getvalue().split(), ['0', '1'])
+        self.assertEqual(sink.dropped, 1)
+        self.assertRaises(ValueError, sink.write_message, '3')
+
+    def test_bad_overflow(self):
+        self.assertRaises(ValueError, QueueSink, io.StringIO(), overflow='shrug')
+
+
+class TestBufferedFileSink(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'calls.log')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def contents(self, path=None):
+        with open(path or self.path) as fp:
+            return fp.read()
+
+    def test_log_calls_to_buffered_file_sink(self):
+        sink = BufferedFileSink(self.path, buffer_size=1000, flush_interval=None)
+
+        @log_calls(file=sink, log_args=False)
+        def f(): pass
+
+        f()
+        self.assertEqual(self.contents(), '')       # still buffered
+        sink.flush()
+        self.assertEqual(self.contents(),
+                         "f <== called by test_log_calls_to_buffered_file_sink\n"
+                         "f ==> returning to test_log_calls_to_buffered_file_sink\n")
+        sink.close()
+        self.assertTrue(sink.closed)
+
+    def test_flush_by_size(self):
+        sink = BufferedFileSink(self.path, buffer_size=10, flush_interval=None)
+        sink.write_message('12345')
+        self.assertEqual(self.contents(), '')
+        sink.write_message('67890')                 # 12 bytes buffered
+        self.assertEqual(self.contents(), '12345\n67890\n')
+        sink.write_message('x')
+        sink.close()
+        self.assertEqual(self.contents(), '12345\n67890\nx\n')
+
+    def test_flush_by_time(self):
+        sink = BufferedFileSink(self.path, flush_interval=20)
+        sink.write_message('first')
+        deadline = time.monotonic() + 5
+        while not self.contents() and time.monotonic() < deadline:
+            time.sleep(0.01)                        # the timer writes it
+        self.assertEqual(self.contents(), 'first\n')
+        time.sleep(0.03)
+        sink.write_message('second')                # interval's up: written now
+        self.assertEqual(self.contents(), 'first\nsecond\n')
+        sink.close()
+
+    def test_rotation(self):
+        sink = BufferedFileSink(self.path, buffer_size=1, flush_interval=None,
+                                max_bytes=8, backup_count=2)
+        for msg in ('aaaa', 'bbbb', 'cccc', 'dddd'):   # 5 bytes each
+            sink.write_message(msg)
+        sink.close()
+        self.assertEqual(self.contents(), 'dddd\n')
+        self.assertEqual(self.contents(self.path + '.1'), 'cccc\n')
+        self.assertEqual(self.contents(self.path + '.2'), 'bbbb\n')
+        self.assertFalse(os.path.exists(self.path + '.3'))
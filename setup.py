@@ -63,6 +63,8 @@ setup(
     url='http://github.com/Twangist/log_calls',
     packages=['log_calls', 'log_calls/tests'],
     test_suite='log_calls.tests',     # log_calls.tests.run_tests
+    # history_as_DataFrame, and their tests (skipped without them)
+    extras_require={'pandas': ['pandas', 'numpy']},
     scripts=['scripts/log_calls-path-to-docs'],
     include_package_data=True,
     classifiers=[